@@ -0,0 +1,122 @@
+"""Compare task classifier backends on latency, throughput and memory.
+
+    python benchmarks/classifier_backends.py --backends torch quantized onnx onnx-int8 --runs 200
+
+Each backend runs in its own subprocess so its RSS is measured without the
+others' weights loaded. Results are printed as a table and, with --output,
+written as JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLES = [
+    "Create a new HTML page with interactive elements",
+    "Research HTML5 best practices and modern web standards",
+    "Fix the failing unit tests in the payment service and add coverage for refunds",
+    "Compare OAuth2 providers for a small team and summarize pricing and limits",
+    "Implement a REST endpoint that paginates task history",
+    "Find recent papers on retrieval augmented generation for code search"
+]
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def measure(backend: str, model_dir: str, runs: int, batch_size: int, threads: int) -> Dict[str, Any]:
+    """Load one backend and time `runs` forward passes of `batch_size` descriptions."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from classifier_backends import build_inference_model
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    rss_start = _rss_mb()
+    started = time.perf_counter()
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    inference_model = build_inference_model(model, tokenizer, backend, model_dir, threads=threads)
+    del model
+    load_seconds = time.perf_counter() - started
+
+    def run(offset: int) -> None:
+        texts = [SAMPLES[(offset + j) % len(SAMPLES)] for j in range(batch_size)]
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.no_grad():
+            inference_model(**inputs).logits
+
+    for offset in range(min(5, runs)):
+        run(offset)
+    latencies = []
+    for offset in range(runs):
+        begin = time.perf_counter()
+        run(offset)
+        latencies.append(time.perf_counter() - begin)
+
+    total = sum(latencies)
+    return {
+        'backend': backend,
+        'runs': runs,
+        'batch_size': batch_size,
+        'threads': threads or torch.get_num_threads(),
+        'load_seconds': round(load_seconds, 3),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+        'throughput_per_s': round(runs * batch_size / total, 1) if total else None,
+        'rss_mb': round(_rss_mb(), 1),
+        'rss_delta_mb': round(_rss_mb() - rss_start, 1)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark task classifier backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "quantized"])
+    parser.add_argument("--model-dir", default=os.path.join(ROOT, "models", "task_classifier"))
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model_dir, args.runs, args.batch_size, args.threads)))
+        return
+
+    results = []
+    for backend in args.backends:
+        command = [sys.executable, os.path.abspath(__file__), "--child", backend,
+                   "--model-dir", args.model_dir, "--runs", str(args.runs),
+                   "--batch-size", str(args.batch_size), "--threads", str(args.threads)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            results.append({'backend': backend, 'error': completed.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    columns = ['backend', 'p50_ms', 'p95_ms', 'throughput_per_s', 'rss_mb', 'load_seconds']
+    print("  ".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("  ".join(f"{str(result.get(column, result.get('error', ''))):>16}" for column in columns))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Reproducible benchmark suite for the task classifier.
+
+    python benchmarks/classifier_suite.py --model random --output bench.json
+    python benchmarks/classifier_suite.py --model random --compare bench.json --tolerance 10
+
+Times `load_model_and_tokenizer`, the batched forward pass behind
+`classify_task` (`predict_categories`) and `classify_task` itself, over a
+grid of input lengths (in tokens), batch sizes, `torch.set_num_threads`
+values and backends. Each (backend, threads) pair runs in its own
+subprocess so peak memory and thread pools do not leak between them.
+
+Runs offline: `--model cached` uses the weights in models/task_classifier,
+`--model random` saves a randomly initialized DistilBERT (`--size base` has
+the real architecture, `tiny` is a quick smoke test) with a tokenizer built
+from a fixed vocabulary, all seeded. The JSON report carries the commit,
+versions and parameters; `--compare` matches its cases against an earlier
+report and exits non-zero when a p50 regresses by more than `--tolerance`
+percent.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CACHED_MODEL_DIR = os.path.join(ROOT, "models", "task_classifier")
+
+# Inputs are built from these words, so every run tokenizes identical text
+WORDS = ("implement research the api endpoint compare caching library for task history with "
+         "unit tests and summarize recent papers on retrieval build a page fix login bug").split()
+
+SAMPLES = [
+    "Create a new HTML page with interactive elements",
+    "Research HTML5 best practices and modern web standards",
+    "Fix the failing unit tests in the payment service and add coverage for refunds",
+    "Compare OAuth2 providers for a small team and summarize pricing and limits",
+    "Implement a REST endpoint that paginates task history",
+    "Find recent papers on retrieval augmented generation for code search"
+]
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies: List[float], items_per_run: int) -> Dict[str, Any]:
+    """Latency percentiles in ms and items per second for one case."""
+    total = sum(latencies)
+    return {
+        'runs': len(latencies),
+        'mean_ms': round(total / len(latencies) * 1000, 3),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(_percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'throughput_per_s': round(len(latencies) * items_per_run / total, 1) if total else None
+    }
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm", "r") as file:
+        resident_pages = int(file.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def _max_rss_mb() -> float:
+    import resource
+    # Peak RSS of the process so far, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class PeakMemory:
+    """Samples RSS on a background thread to find the peak within one case."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakMemory":
+        self.peak_mb = _rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+def make_text(tokenizer: Any, length: int, offset: int = 0) -> str:
+    """Deterministic text that tokenizes to about `length` tokens, [CLS] and [SEP] included."""
+    words = [WORDS[(offset + i) % len(WORDS)] for i in range(max(1, length - 2))]
+    while len(words) > 1 and len(tokenizer(" ".join(words))["input_ids"]) > length:
+        words.pop()
+    return " ".join(words)
+
+def build_random_model(path: str, size: str, seed: int = 0) -> str:
+    """Save a seeded, randomly initialized DistilBERT classifier and tokenizer to `path`."""
+    import torch
+    from transformers import BertTokenizerFast, DistilBertConfig, DistilBertForSequenceClassification
+
+    vocab = SPECIAL_TOKENS + sorted({word for text in SAMPLES + [" ".join(WORDS)]
+                                     for word in text.lower().replace(",", " ").split()})
+    vocab += [chr(c) for c in range(ord("a"), ord("z") + 1)] + [f"##{chr(c)}" for c in range(ord("a"), ord("z") + 1)]
+    vocab += [str(digit) for digit in range(10)] + [".", ",", "-", "/"]
+    vocab = list(dict.fromkeys(vocab))
+    os.makedirs(path, exist_ok=True)
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as file:
+        file.write("\n".join(vocab) + "\n")
+    tokenizer = BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True)
+    tokenizer.save_pretrained(path)
+
+    if size == "tiny":
+        config = DistilBertConfig(vocab_size=len(vocab), dim=64, hidden_dim=256, n_layers=2, n_heads=2, num_labels=2)
+    else:
+        # distilbert-base-uncased's shape, so compute matches the real model
+        config = DistilBertConfig(vocab_size=30522, num_labels=2)
+    torch.manual_seed(seed)
+    DistilBertForSequenceClassification(config).eval().save_pretrained(path)
+    return path
+
+def _time(fn: Any, runs: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(runs):
+        begin = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - begin)
+    return latencies
+
+def run_child(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark one backend at one thread count, in this process."""
+    import torch
+    import pm_algorithm
+    from classifier_cascade import ClassifierCascade
+
+    backend, requested_threads = args.child, args.threads[0]
+    if requested_threads > 0:
+        torch.set_num_threads(requested_threads)
+    pm_algorithm.MODEL_DIR = args.model_dir
+    pm_algorithm.classifier_backend = backend
+    pm_algorithm._torch_threads = requested_threads
+    # Every classify_task call should reach the cascade and model, not earlier answers
+    pm_algorithm.classifier_cache = None
+    # A cascade without saved weights, so results do not depend on what this checkout has learned
+    pm_algorithm.classifier_cascade = ClassifierCascade(pm_algorithm._transformer_categories)
+
+    rss_start = _rss_mb()
+    with PeakMemory() as load_memory:
+        load_latencies = _time(pm_algorithm.load_model_and_tokenizer, args.load_runs, 0)
+        pm_algorithm._ensure_model()
+    tokenizer = pm_algorithm.tokenizer
+    threads = torch.get_num_threads()
+    report: Dict[str, Any] = {
+        'backend': backend,
+        'effective_backend': pm_algorithm.classifier_backend,
+        'threads': threads,
+        'ensure_model_seconds': pm_algorithm.classifier_state()['load_seconds'],
+        'model_rss_delta_mb': round(_rss_mb() - rss_start, 1),
+        'cases': [{
+            'case': f"load_model_and_tokenizer/{backend}/t{threads}",
+            **summarize(load_latencies, 1),
+            'peak_rss_mb': round(load_memory.peak_mb, 1)
+        }]
+    }
+
+    for length, batch_size in itertools.product(args.lengths, args.batch_sizes):
+        texts = [make_text(tokenizer, length, offset=i) for i in range(batch_size)]
+        with PeakMemory() as memory:
+            latencies = _time(lambda: pm_algorithm.predict_categories(texts), args.runs, args.warmup)
+        report['cases'].append({
+            'case': f"predict_categories/{backend}/t{threads}/len{length}/b{batch_size}",
+            'length': length,
+            'tokens': len(tokenizer(texts[0])["input_ids"]),
+            'batch_size': batch_size,
+            **summarize(latencies, batch_size),
+            'peak_rss_mb': round(memory.peak_mb, 1)
+        })
+
+    calls = itertools.cycle(SAMPLES)
+    with PeakMemory() as memory:
+        latencies = _time(lambda: pm_algorithm.classify_task(next(calls)), args.runs, args.warmup)
+    report['cases'].append({
+        'case': f"classify_task/{backend}/t{threads}",
+        'batch_size': 1,
+        **summarize(latencies, 1),
+        'peak_rss_mb': round(memory.peak_mb, 1),
+        'stages': {stage: values['share'] for stage, values in pm_algorithm.classifier_cascade.stats()['stages'].items()}
+    })
+    report['process_max_rss_mb'] = round(_max_rss_mb(), 1)
+    return report
+
+def environment() -> Dict[str, Any]:
+    """Where and on what the suite ran, so reports from different commits can be told apart."""
+    def _git(*command: str) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *command], cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {}
+    for package in ("torch", "transformers", "onnxruntime"):
+        try:
+            versions[package] = __import__(package).__version__
+        except ImportError:
+            versions[package] = None
+    return {
+        'commit': _git("rev-parse", "HEAD"),
+        'dirty': bool(_git("status", "--porcelain", "--untracked-files=no")),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """p50 change per case present in both reports; `regression` is set past `tolerance` percent."""
+    def cases(report: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        return {case['case']: case for run in report.get('runs', []) for case in run.get('cases', [])}
+
+    before = cases(baseline)
+    rows = []
+    for name, case in cases(current).items():
+        if name not in before or not before[name].get('p50_ms'):
+            continue
+        change = (case['p50_ms'] - before[name]['p50_ms']) / before[name]['p50_ms'] * 100
+        rows.append({'case': name, 'baseline_p50_ms': before[name]['p50_ms'], 'p50_ms': case['p50_ms'],
+                     'change_pct': round(change, 1), 'regression': change > tolerance})
+    return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the task classifier")
+    parser.add_argument("--model", choices=["cached", "random"], default="cached",
+                        help="weights in models/task_classifier, or a seeded random model")
+    parser.add_argument("--size", choices=["base", "tiny"], default="base", help="random model size")
+    parser.add_argument("--model-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--backends", nargs="+", default=["torch", "quantized"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 4], help="0 keeps torch's default")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[16, 64, 256, 512], help="tokens per input")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--load-runs", type=int, default=3)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--compare", help="earlier JSON report to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed p50 regression in percent")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.model == "random":
+            model_dir = build_random_model(os.path.join(scratch, "model"), args.size)
+        else:
+            model_dir = CACHED_MODEL_DIR
+            if not os.path.exists(os.path.join(model_dir, "config.json")):
+                parser.error(f"No cached model in {model_dir}; use --model random")
+        # Nothing may be downloaded: cached or random weights only
+        env = {**os.environ, "HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1"}
+        runs = []
+        for backend, threads in itertools.product(args.backends, args.threads):
+            command = [sys.executable, os.path.abspath(__file__), "--child", backend, "--model-dir", model_dir,
+                       "--threads", str(threads), "--lengths", *map(str, args.lengths),
+                       "--batch-sizes", *map(str, args.batch_sizes), "--runs", str(args.runs),
+                       "--warmup", str(args.warmup), "--load-runs", str(args.load_runs)]
+            completed = subprocess.run(command, capture_output=True, text=True, env=env, cwd=ROOT)
+            if completed.returncode != 0:
+                runs.append({'backend': backend, 'threads': threads,
+                             'error': completed.stderr.strip().splitlines()[-1:]})
+                continue
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    report = {
+        'environment': environment(),
+        'parameters': {key: getattr(args, key) for key in ("model", "size", "backends", "threads", "lengths",
+                                                            "batch_sizes", "runs", "warmup", "load_runs")},
+        'runs': runs
+    }
+
+    print(f"{'case':<48} {'p50_ms':>10} {'p90_ms':>10} {'p99_ms':>10} {'items/s':>10} {'peak_mb':>10}")
+    for run in runs:
+        if 'error' in run:
+            print(f"{run['backend']}/t{run['threads']}: {run['error']}")
+            continue
+        for case in run['cases']:
+            print(f"{case['case']:<48} {case['p50_ms']:>10} {case['p90_ms']:>10} {case['p99_ms']:>10} "
+                  f"{case['throughput_per_s']:>10} {case['peak_rss_mb']:>10}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            rows = compare(report, json.load(file), args.tolerance)
+        for row in rows:
+            flag = "  REGRESSION" if row['regression'] else ""
+            print(f"{row['case']:<48} {row['baseline_p50_ms']:>10} -> {row['p50_ms']:>10} "
+                  f"({row['change_pct']:+.1f}%){flag}")
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
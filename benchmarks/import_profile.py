@@ -0,0 +1,83 @@
+"""Report where `import main` spends its time, so slow imports are caught before release.
+
+    python benchmarks/import_profile.py --top 15 --budget-ms 1000 --output import_profile.json
+
+Runs the import in a fresh interpreter under `-X importtime`. With
+--budget-ms the script exits non-zero when the total import time exceeds
+the budget, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def profile_import(module: str) -> List[Dict[str, Any]]:
+    """Import `module` in a subprocess and return one entry per imported module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                'module': name,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                # importtime indents nested imports by two spaces per level
+                'depth': (len(indent) - 1) // 2
+            })
+    return entries
+
+def summarize(module: str, entries: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    target = next((entry for entry in entries if entry['module'] == module), None)
+    total_ms = target['cumulative_ms'] if target else sum(entry['self_ms'] for entry in entries)
+    slowest = sorted(entries, key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return {
+        'module': module,
+        'total_ms': round(total_ms, 1),
+        'modules_imported': len(entries),
+        'slowest': [
+            {'module': entry['module'], 'cumulative_ms': round(entry['cumulative_ms'], 1),
+             'self_ms': round(entry['self_ms'], 1)}
+            for entry in slowest if entry['module'] != module
+        ][:top],
+        'heavy_modules_loaded': sorted({entry['module'].split('.')[0] for entry in entries}
+                                       & {'torch', 'transformers', 'anthropic', 'onnxruntime'})
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile import time of the application")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="fail if the import takes longer than this")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = summarize(args.module, profile_import(args.module), args.top)
+    print(f"import {report['module']}: {report['total_ms']} ms across {report['modules_imported']} modules")
+    if report['heavy_modules_loaded']:
+        print(f"heavy modules imported eagerly: {', '.join(report['heavy_modules_loaded'])}")
+    for entry in report['slowest']:
+        print(f"{entry['cumulative_ms']:>10.1f} ms  {entry['module']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.budget_ms is not None and report['total_ms'] > args.budget_ms:
+        print(f"import time {report['total_ms']} ms exceeds the budget of {args.budget_ms} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure how much memory each server worker really costs.
+
+    gunicorn -c gunicorn.conf.py main:app &
+    python benchmarks/worker_memory.py --pid <gunicorn master pid>
+
+RSS counts shared pages in full for every process, so it overstates what
+one more worker costs. PSS splits each shared page between the processes
+mapping it, and USS (private pages) is what a worker adds on its own.
+Reads /proc/<pid>/smaps_rollup, so Linux only.
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+
+def _children(pid: int) -> List[int]:
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        path = os.path.join(task_dir, tid, "children")
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                children.extend(int(child) for child in file.read().split())
+    return children
+
+def memory(pid: int) -> Dict[str, Any]:
+    """RSS, PSS, USS and shared memory of one process, in MiB."""
+    fields: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(":") and parts[2] == "kB":
+                fields[parts[0][:-1]] = int(parts[1])
+
+    def mib(kb: int) -> float:
+        return round(kb / 1024, 1)
+
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        'pid': pid,
+        'rss_mb': mib(fields.get("Rss", 0)),
+        'pss_mb': mib(fields.get("Pss", 0)),
+        'uss_mb': mib(private),
+        'shared_mb': mib(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0))
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-worker memory of a pre-fork server")
+    parser.add_argument("--pid", type=int, required=True, help="pid of the gunicorn master")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    master = memory(args.pid)
+    workers = [memory(child) for child in _children(args.pid)]
+    report = {
+        'master': master,
+        'workers': workers,
+        'total_pss_mb': round(master['pss_mb'] + sum(worker['pss_mb'] for worker in workers), 1),
+        'mean_worker_uss_mb': round(sum(w['uss_mb'] for w in workers) / len(workers), 1) if workers else None
+    }
+    print(f"{'pid':>8} {'rss_mb':>10} {'pss_mb':>10} {'uss_mb':>10} {'shared_mb':>10}")
+    for row in [master] + workers:
+        print(f"{row['pid']:>8} {row['rss_mb']:>10} {row['pss_mb']:>10} {row['uss_mb']:>10} {row['shared_mb']:>10}")
+    print(f"total PSS {report['total_pss_mb']} MiB, mean worker USS {report['mean_worker_uss_mb']} MiB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+# bulk_jobs.py
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterator, Tuple
+from xml_utils import store_task_results
+import llm_integration
+from llm_integration import provider_payload, get_session, ANTHROPIC_URL
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API = "https://api.openai.com/v1"
+ANTHROPIC_BATCHES_URL = f"{ANTHROPIC_URL}/batches"
+
+# Normalised batch states shared by every backend
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# (custom_id, response text or None, error message or None)
+BatchResult = Tuple[str, Optional[str], Optional[str]]
+
+def _bulk_settings() -> Dict[str, Any]:
+    """Bulk job settings from the `llm.bulk` section of config.yaml."""
+    return (llm_integration.config.get('llm') or {}).get('bulk') or {}
+
+def read_items(input_path: str) -> List[Dict[str, str]]:
+    """Read bulk items from JSONL.
+
+    Each line needs a `prompt`, or a `title`/`body` pair like requests.jsonl.
+    The item id comes from `custom_id`, `request_id` or `id` (else the line
+    number) and results are stored under `task_id`, defaulting to the item id.
+    """
+    items = []
+    seen = set()
+    with open(input_path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = str(record.get('custom_id') or record.get('request_id') or record.get('id') or f"line-{line_number}")
+            if custom_id in seen:
+                raise ValueError(f"Duplicate item id '{custom_id}' on line {line_number}")
+            seen.add(custom_id)
+            prompt = record.get('prompt') or "\n\n".join(
+                part for part in (record.get('title'), record.get('body')) if part
+            )
+            if not prompt:
+                raise ValueError(f"Item '{custom_id}' on line {line_number} has no prompt")
+            items.append({
+                'custom_id': custom_id,
+                'task_id': str(record.get('task_id') or custom_id),
+                'prompt': prompt
+            })
+    return items
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    # Write-then-rename so a crash never leaves a half-written state file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: upload a JSONL file, create a batch, download the output file."""
+
+    name = "openai"
+    TERMINAL = {"completed": COMPLETED, "failed": FAILED, "expired": FAILED, "cancelled": FAILED}
+
+    def __init__(self, provider: str = "openai"):
+        if provider != "openai":
+            raise ValueError("The OpenAI batch backend only serves the openai provider")
+        self.provider = provider
+
+    def submit(self, items: List[Dict[str, str]]) -> str:
+        lines = [
+            json.dumps({
+                "custom_id": item['custom_id'],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": provider_payload(self.provider, item['prompt'])
+            })
+            for item in items
+        ]
+        session = get_session(self.provider)
+        try:
+            # Drop the session's JSON content type so requests builds the multipart header
+            upload = session.post(
+                f"{OPENAI_API}/files",
+                files={"file": ("batch.jsonl", "\n".join(lines).encode("utf-8"))},
+                data={"purpose": "batch"},
+                headers={"Content-Type": None},
+                timeout=60
+            )
+            upload.raise_for_status()
+            batch = session.post(f"{OPENAI_API}/batches", json={
+                "input_file_id": upload.json()['id'],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            }, timeout=30)
+            batch.raise_for_status()
+            return batch.json()['id']
+        except Exception as e:
+            raise Exception(f"Error calling OpenAI batch API: {str(e)}")
+
+    def _batch(self, batch_id: str) -> Dict[str, Any]:
+        try:
+            response = get_session(self.provider).get(f"{OPENAI_API}/batches/{batch_id}", timeout=30)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise Exception(f"Error calling OpenAI batch API: {str(e)}")
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batch(batch_id)
+        counts = batch.get('request_counts') or {}
+        return {
+            'status': self.TERMINAL.get(batch.get('status'), IN_PROGRESS),
+            'total': counts.get('total', 0),
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0)
+        }
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        batch = self._batch(batch_id)
+        for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+            if not file_id:
+                continue
+            try:
+                response = get_session(self.provider).get(f"{OPENAI_API}/files/{file_id}/content", timeout=120)
+                response.raise_for_status()
+            except Exception as e:
+                raise Exception(f"Error calling OpenAI batch API: {str(e)}")
+            for line in response.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                body = (record.get('response') or {}).get('body') or {}
+                if record.get('error') or 'choices' not in body:
+                    yield record['custom_id'], None, json.dumps(record.get('error') or body.get('error') or body)
+                else:
+                    yield record['custom_id'], body['choices'][0]['message']['content'], None
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(self, provider: str = "anthropic"):
+        if provider != "anthropic":
+            raise ValueError("The Anthropic batch backend only serves the anthropic provider")
+        self.provider = provider
+
+    def _request(self, method: str, url: str, **kwargs) -> Any:
+        try:
+            response = get_session(self.provider).request(method, url, timeout=60, **kwargs)
+            response.raise_for_status()
+            return response
+        except Exception as e:
+            raise Exception(f"Error calling Anthropic batch API: {str(e)}")
+
+    def submit(self, items: List[Dict[str, str]]) -> str:
+        requests_body = [
+            {"custom_id": item['custom_id'], "params": provider_payload(self.provider, item['prompt'])}
+            for item in items
+        ]
+        return self._request("POST", ANTHROPIC_BATCHES_URL, json={"requests": requests_body}).json()['id']
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._request("GET", f"{ANTHROPIC_BATCHES_URL}/{batch_id}").json()
+        counts = batch.get('request_counts') or {}
+        failed = counts.get('errored', 0) + counts.get('canceled', 0) + counts.get('expired', 0)
+        return {
+            'status': COMPLETED if batch.get('processing_status') == "ended" else IN_PROGRESS,
+            'total': counts.get('processing', 0) + counts.get('succeeded', 0) + failed,
+            'completed': counts.get('succeeded', 0),
+            'failed': failed
+        }
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        batch = self._request("GET", f"{ANTHROPIC_BATCHES_URL}/{batch_id}").json()
+        response = self._request("GET", batch['results_url'])
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            result = record.get('result') or {}
+            if result.get('type') == "succeeded":
+                text = "".join(
+                    block.get('text', '') for block in result['message'].get('content', [])
+                    if block.get('type') == "text"
+                )
+                yield record['custom_id'], text, None
+            else:
+                yield record['custom_id'], None, json.dumps(result.get('error') or {"type": result.get('type')})
+
+class LocalBatchBackend:
+    """Stand-in batch server that runs items through the interactive provider calls.
+
+    Each batch lives in `<root>/<batch_id>/` as `input.jsonl` plus an append-only
+    `output.jsonl`. A worker thread processes the items with bounded
+    concurrency; if the process died mid-batch, the next poll restarts the
+    worker and it skips items that already have output.
+    """
+
+    name = "local"
+
+    def __init__(self, provider: str, root: str, concurrency: int = 4,
+                 call: Optional[Callable[[str, str], Awaitable[str]]] = None):
+        self.provider = provider
+        self.root = root
+        self.concurrency = max(1, concurrency)
+        self.call = call or self._call_provider
+        self._workers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    async def _call_provider(self, provider: str, prompt: str) -> str:
+        calls = {
+            "openai": llm_integration.acall_openai,
+            "anthropic": llm_integration.acall_anthropic,
+            "deepseek": llm_integration.acall_deepseek
+        }
+        return await calls[provider](prompt)
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.root, batch_id, name)
+
+    def _read_jsonl(self, path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as file:
+            # A torn final line from a crash is ignored; that item is simply redone
+            records = []
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+            return records
+
+    def submit(self, items: List[Dict[str, str]]) -> str:
+        batch_id = f"local-{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.root, batch_id), exist_ok=True)
+        with open(self._path(batch_id, "input.jsonl"), "w", encoding="utf-8") as file:
+            for item in items:
+                file.write(json.dumps({"custom_id": item['custom_id'], "prompt": item['prompt']}) + "\n")
+        self._ensure_worker(batch_id)
+        return batch_id
+
+    def _ensure_worker(self, batch_id: str) -> None:
+        with self._lock:
+            worker = self._workers.get(batch_id)
+            if worker is not None and worker.is_alive():
+                return
+            worker = threading.Thread(target=lambda: asyncio.run(self._process(batch_id)), daemon=True)
+            self._workers[batch_id] = worker
+            worker.start()
+
+    async def _process(self, batch_id: str) -> None:
+        output_path = self._path(batch_id, "output.jsonl")
+        finished = self._read_jsonl(output_path)
+        if finished:
+            # Rewrite without any torn line so new records start on a clean line
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.writelines(json.dumps(record) + "\n" for record in finished)
+            os.replace(tmp_path, output_path)
+        done = {record['custom_id'] for record in finished}
+        pending = [item for item in self._read_jsonl(self._path(batch_id, "input.jsonl")) if item['custom_id'] not in done]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock()
+
+        async def run(item: Dict[str, str]) -> None:
+            async with semaphore:
+                try:
+                    record = {"custom_id": item['custom_id'], "response": await self.call(self.provider, item['prompt'])}
+                except Exception as e:
+                    record = {"custom_id": item['custom_id'], "error": str(e)}
+            async with write_lock:
+                with open(output_path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(record) + "\n")
+
+        try:
+            await asyncio.gather(*[run(item) for item in pending])
+        finally:
+            await llm_integration.aclose_clients()
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        total = len(self._read_jsonl(self._path(batch_id, "input.jsonl")))
+        if total == 0:
+            return {'status': FAILED, 'total': 0, 'completed': 0, 'failed': 0}
+        output = {record['custom_id']: record for record in self._read_jsonl(self._path(batch_id, "output.jsonl"))}
+        failed = sum(1 for record in output.values() if 'error' in record)
+        if len(output) < total:
+            self._ensure_worker(batch_id)
+        return {
+            'status': COMPLETED if len(output) >= total else IN_PROGRESS,
+            'total': total,
+            'completed': len(output) - failed,
+            'failed': failed
+        }
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        for record in self._read_jsonl(self._path(batch_id, "output.jsonl")):
+            yield record['custom_id'], record.get('response'), record.get('error')
+
+def get_backend(name: str, provider: str, state_dir: Optional[str] = None):
+    """Build the batch backend `name` ("openai", "anthropic" or "local") for `provider`."""
+    settings = _bulk_settings()
+    if name == "openai":
+        return OpenAIBatchBackend(provider)
+    if name == "anthropic":
+        return AnthropicBatchBackend(provider)
+    if name == "local":
+        state_dir = state_dir or settings.get('state_dir', 'data/bulk_jobs')
+        return LocalBatchBackend(provider, os.path.join(state_dir, "local"),
+                                 concurrency=int(settings.get('local_concurrency', 4)))
+    raise ValueError(f"Unknown bulk backend: {name}")
+
+class BulkJob:
+    """A resumable bulk run over a JSONL file.
+
+    Items are split into batches of at most `max_batch_size`, submitted to
+    the backend, polled until they finish and written to the task store.
+    Every step is checkpointed to `<state_dir>/<job_id>.json`, so running the
+    same job id again after a crash picks up where it stopped instead of
+    resubmitting work.
+    """
+
+    def __init__(self, state: Dict[str, Any], backend, state_dir: str,
+                 store: Callable[[List[Tuple[str, str, str]]], bool] = store_task_results):
+        self.state = state
+        self.backend = backend
+        self.state_dir = state_dir
+        self.store = store
+
+    @property
+    def job_id(self) -> str:
+        return self.state['job_id']
+
+    @staticmethod
+    def state_path(state_dir: str, job_id: str) -> str:
+        return os.path.join(state_dir, f"{job_id}.json")
+
+    @classmethod
+    def create(cls, input_path: str, provider: str, backend: str = "local", job_id: Optional[str] = None,
+               state_dir: Optional[str] = None, max_batch_size: Optional[int] = None, backend_impl=None) -> "BulkJob":
+        """Start a job, or resume it if `job_id` already has a state file."""
+        settings = _bulk_settings()
+        state_dir = state_dir or settings.get('state_dir', 'data/bulk_jobs')
+        if job_id and os.path.exists(cls.state_path(state_dir, job_id)):
+            return cls.load(job_id, state_dir, backend_impl=backend_impl)
+
+        os.makedirs(state_dir, exist_ok=True)
+        items = read_items(input_path)
+        batch_size = max(1, int(max_batch_size or settings.get('max_batch_size', 500)))
+        state = {
+            'job_id': job_id or f"bulk-{uuid.uuid4().hex[:12]}",
+            'input_path': input_path,
+            'provider': provider,
+            'backend': backend,
+            'created_at': time.time(),
+            'items': {item['custom_id']: item for item in items},
+            'batches': [
+                {'batch_id': None, 'custom_ids': [item['custom_id'] for item in items[start:start + batch_size]],
+                 'status': "pending", 'stored': False, 'total': 0, 'completed': 0, 'failed': 0}
+                for start in range(0, len(items), batch_size)
+            ],
+            'results': {}
+        }
+        job = cls(state, backend_impl or get_backend(backend, provider, state_dir), state_dir)
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, job_id: str, state_dir: Optional[str] = None, backend_impl=None) -> "BulkJob":
+        state_dir = state_dir or _bulk_settings().get('state_dir', 'data/bulk_jobs')
+        with open(cls.state_path(state_dir, job_id), "r", encoding="utf-8") as file:
+            state = json.load(file)
+        return cls(state, backend_impl or get_backend(state['backend'], state['provider'], state_dir), state_dir)
+
+    def save(self) -> None:
+        _write_json_atomic(self.state_path(self.state_dir, self.job_id), self.state)
+
+    def progress(self) -> Dict[str, Any]:
+        """Counts across the whole job; `done` once every batch is stored."""
+        results = self.state['results'].values()
+        completed = sum(1 for status in results if status == "completed")
+        failed = sum(1 for status in results if status == "failed")
+        batches = self.state['batches']
+        return {
+            'job_id': self.job_id,
+            'total': len(self.state['items']),
+            'completed': completed,
+            'failed': failed,
+            # Items the backend has finished but that are not stored yet
+            'processed': completed + failed + sum(
+                batch['completed'] + batch['failed'] for batch in batches if not batch['stored']
+            ),
+            'batches': len(batches),
+            'batches_done': sum(1 for batch in batches if batch['stored']),
+            'done': all(batch['stored'] for batch in batches)
+        }
+
+    def _submit_pending(self) -> None:
+        for batch in self.state['batches']:
+            if batch['batch_id'] is None:
+                items = [self.state['items'][custom_id] for custom_id in batch['custom_ids']]
+                batch['batch_id'] = self.backend.submit(items)
+                batch['status'] = IN_PROGRESS
+                self.save()
+                logger.info(f"Bulk job {self.job_id}: submitted batch {batch['batch_id']} ({len(items)} items)")
+
+    def _store_batch(self, batch: Dict[str, Any]) -> None:
+        task_ids = {custom_id: self.state['items'][custom_id]['task_id'] for custom_id in batch['custom_ids']}
+        rows = []
+        statuses = {}
+        for custom_id, response, error in self.backend.results(batch['batch_id']):
+            if custom_id not in task_ids:
+                continue
+            status = "completed" if error is None else "failed"
+            statuses[custom_id] = status
+            rows.append((task_ids[custom_id], status, response if error is None else f"Failure: {error}"))
+        # Items the backend never answered (expired/cancelled batches) count as failed
+        for custom_id in batch['custom_ids']:
+            if custom_id not in statuses:
+                statuses[custom_id] = "failed"
+                rows.append((task_ids[custom_id], "failed", f"Failure: no result from batch {batch['batch_id']}"))
+        if not self.store(rows):
+            raise Exception(f"Error storing results for batch {batch['batch_id']}")
+        self.state['results'].update(statuses)
+        batch['stored'] = True
+        self.save()
+
+    def step(self) -> Dict[str, Any]:
+        """Submit what is pending, poll unfinished batches, store finished ones."""
+        self._submit_pending()
+        for batch in self.state['batches']:
+            if batch['stored']:
+                continue
+            if batch['status'] not in (COMPLETED, FAILED):
+                status = self.backend.poll(batch['batch_id'])
+                batch.update(status)
+                self.save()
+            if batch['status'] in (COMPLETED, FAILED):
+                self._store_batch(batch)
+        return self.progress()
+
+    def run(self, poll_interval: Optional[float] = None,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Drive the job to completion, reporting progress after every poll."""
+        if poll_interval is None:
+            poll_interval = float(_bulk_settings().get('poll_interval', 30))
+        while True:
+            progress = self.step()
+            if on_progress:
+                on_progress(progress)
+            if progress['done']:
+                return progress
+            time.sleep(poll_interval)
+
+def _print_progress(progress: Dict[str, Any]) -> None:
+    print(f"[{progress['job_id']}] {progress['processed']}/{progress['total']} processed, "
+          f"{progress['completed']} stored, {progress['failed']} failed, "
+          f"{progress['batches_done']}/{progress['batches']} batches done")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run prompts from a JSONL file through provider batch APIs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="start a job, or resume it when --job-id already exists")
+    run_parser.add_argument("input", help="JSONL file of prompts")
+    run_parser.add_argument("--provider", default="openai", choices=["openai", "anthropic", "deepseek"])
+    run_parser.add_argument("--backend", default=None, choices=["openai", "anthropic", "local"])
+    run_parser.add_argument("--job-id", default=None)
+    run_parser.add_argument("--poll-interval", type=float, default=None)
+    status_parser = subparsers.add_parser("status", help="show progress of a job")
+    status_parser.add_argument("job_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(json.dumps(BulkJob.load(args.job_id).progress(), indent=2))
+        return
+    backend = args.backend or _bulk_settings().get('backend', 'local')
+    job = BulkJob.create(args.input, args.provider, backend=backend, job_id=args.job_id)
+    print(f"Bulk job {job.job_id} ({backend}/{job.state['provider']})")
+    job.run(args.poll_interval, on_progress=_print_progress)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# classifier_backends.py
+import os
+from types import SimpleNamespace
+from typing import Any
+import torch
+
+# torch: the fp32 model as loaded; quantized: int8 dynamic quantization of its Linear layers;
+# onnx / onnx-int8: an ONNX Runtime session over an export cached next to the weights
+BACKENDS = ("torch", "quantized", "onnx", "onnx-int8")
+
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx"
+}
+
+class _LogitsOnly(torch.nn.Module):
+    """Exposes just the logits so the exported graph has one plain tensor output."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+class OnnxClassifier:
+    """ONNX Runtime session called like the transformers model: `model(**inputs).logits`."""
+
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def __call__(self, **inputs: torch.Tensor) -> SimpleNamespace:
+        feeds = {name: inputs[name].numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """int8 dynamic quantization of the Linear layers, where nearly all of DistilBERT's FLOPs are."""
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _weights_mtime(model_dir: str) -> float:
+    mtimes = [
+        os.path.getmtime(os.path.join(model_dir, name))
+        for name in ("model.safetensors", "pytorch_model.bin", "config.json")
+        if os.path.exists(os.path.join(model_dir, name))
+    ]
+    return max(mtimes) if mtimes else 0.0
+
+def _is_fresh(path: str, model_dir: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= _weights_mtime(model_dir)
+
+def export_onnx(model: torch.nn.Module, tokenizer: Any, path: str) -> str:
+    """Export the classifier with dynamic batch and sequence axes."""
+    model.eval()
+    sample = tokenizer(["export the task classifier"], return_tensors="pt")
+    tmp_path = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"}
+            },
+            opset_version=14
+        )
+    os.replace(tmp_path, path)
+    return path
+
+def cached_onnx_model(model: torch.nn.Module, tokenizer: Any, model_dir: str, quantized: bool = False) -> str:
+    """Path of the ONNX export in `model_dir`, re-exporting when the weights are newer."""
+    fp32_path = os.path.join(model_dir, ONNX_FILES["onnx"])
+    if not _is_fresh(fp32_path, model_dir):
+        export_onnx(model, tokenizer, fp32_path)
+    if not quantized:
+        return fp32_path
+    int8_path = os.path.join(model_dir, ONNX_FILES["onnx-int8"])
+    if not _is_fresh(int8_path, model_dir) or os.path.getmtime(int8_path) < os.path.getmtime(fp32_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+def build_inference_model(model: torch.nn.Module, tokenizer: Any, backend: str, model_dir: str,
+                          threads: int = 0) -> Any:
+    """Return a callable with the model's `model(**inputs).logits` interface for `backend`."""
+    if backend == "torch":
+        return model
+    if backend == "quantized":
+        return quantize_model(model)
+    if backend in ONNX_FILES:
+        path = cached_onnx_model(model, tokenizer, model_dir, quantized=backend == "onnx-int8")
+        return OnnxClassifier(path, threads=threads)
+    raise ValueError(f"Unknown classifier backend '{backend}'; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,136 @@
+# classifier_batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+class MicroBatcher:
+    """Groups concurrent single-item calls into one call of a batch function.
+
+    `submit` returns a future at once. A background thread takes the first
+    waiting item, keeps collecting for up to `max_wait` seconds or until
+    `max_batch_size` items are in hand, then calls `batch_fn` once with the
+    whole list and resolves each caller's future with its own result. If
+    `batch_fn` raises, every future in that batch gets the exception; a
+    BaseException such as SystemExit is wrapped in a RuntimeError so the
+    thread keeps serving. `result` waits at most `result_timeout` seconds.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 16,
+                 max_wait: float = 0.005, name: str = "micro-batcher", result_timeout: Optional[float] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self.result_timeout = result_timeout
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]],
+                    batch_fn: Callable[[List[Any]], Sequence[Any]]) -> "MicroBatcher":
+        settings = settings or {}
+        return cls(batch_fn,
+                   max_batch_size=int(settings.get('max_batch_size', 16)),
+                   max_wait=float(settings.get('max_wait_ms', 5)) / 1000,
+                   result_timeout=float(settings['result_timeout']) if settings.get('result_timeout') else None)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the future resolves to `batch_fn`'s result for it."""
+        self._ensure_started()
+        future: Future = Future()
+        self._pending.put((item, future))
+        return future
+
+    def map(self, items: Sequence[Any]) -> List[Future]:
+        """Queue several items at once so they share batches with concurrent callers."""
+        return [self.submit(item) for item in items]
+
+    def result(self, future: Future) -> Any:
+        """Wait for a submitted item's result, raising TimeoutError after `result_timeout` seconds.
+
+        A timed-out item is dropped if its batch has not started yet; if it
+        has, `batch_fn` may still process it.
+        """
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"{self.name} gave no result within {self.result_timeout}s")
+
+    def _collect(self, first: tuple) -> List[tuple]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._pending.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._pending.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            # Callers may have cancelled while waiting; skip their items
+            live = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            items = [item for item, _ in live]
+            futures = [future for _, future in live]
+            with self._lock:
+                self.batches += 1
+                self.items += len(items)
+                self.largest_batch = max(self.largest_batch, len(items))
+            try:
+                results = list(self.batch_fn(items))
+                if len(results) != len(items):
+                    raise ValueError(f"Batch function returned {len(results)} results for {len(items)} items")
+            except BaseException as e:
+                error = e if isinstance(e, Exception) else RuntimeError(f"{self.name} batch failed: {e!r}")
+                for future in futures:
+                    future.set_exception(error)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000
+            }
+
+    def close(self) -> None:
+        """Stop the batching thread after the items already queued."""
+        with self._lock:
+            self._closed = True
+            if self._thread is None:
+                return
+        self._pending.put(None)
+        self._thread.join()
@@ -0,0 +1,114 @@
+# classifier_cache.py
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+from llm_cache import ResponseCache
+
+# Files that determine the model's answers: weights, config and tokenizer
+MODEL_FILE_SUFFIXES = (".json", ".safetensors", ".bin", ".txt", ".model")
+
+def normalize_description(text: str) -> str:
+    """Fold case and surrounding whitespace so resubmissions differing only in those share a key.
+
+    The uncased tokenizer lowercases its input and drops surrounding
+    whitespace, so the model sees both forms as the same text. Nothing else
+    (punctuation, Unicode width) is folded, since it can change the tokens
+    and so the answer.
+    """
+    return text.strip().lower()
+
+def model_fingerprint(model_dir: str, backend: str = "") -> str:
+    """Hash of the model files' names, sizes and mtimes plus the backend serving them."""
+    digest = hashlib.sha256(backend.encode("utf-8"))
+    if os.path.isdir(model_dir):
+        for name in sorted(os.listdir(model_dir)):
+            # Derived ONNX exports are rebuilt from the weights, so they are not included
+            if not name.endswith(MODEL_FILE_SUFFIXES):
+                continue
+            stat = os.stat(os.path.join(model_dir, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class ClassificationCache:
+    """Memoizes model classifications by normalized description.
+
+    Entries live in a ResponseCache (bounded LRU, optional SQLite tier) and
+    their keys include the model fingerprint, so answers from an older model
+    in `model_dir` are never served. The fingerprint is re-checked at most
+    every `check_interval` seconds; when it changes the cache is cleared.
+    """
+
+    def __init__(self, model_dir: str, backend: str = "", max_entries: int = 10000, ttl: float = 0,
+                 path: Optional[str] = None, max_disk_entries: int = 100000, check_interval: float = 5.0):
+        self.model_dir = model_dir
+        self.backend = backend
+        self.check_interval = check_interval
+        self.cache = ResponseCache(max_entries=max_entries, ttl=ttl, max_bytes=64 * max_entries,
+                                   path=path, max_disk_entries=max_disk_entries)
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._fingerprint = model_fingerprint(model_dir, backend)
+        self._checked_at = time.monotonic()
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]], model_dir: str,
+                    backend: str = "") -> Optional["ClassificationCache"]:
+        settings = settings or {}
+        if not settings.get('enabled', True):
+            return None
+        return cls(model_dir, backend,
+                   max_entries=int(settings.get('max_entries', 10000)),
+                   ttl=float(settings.get('ttl_seconds', 0)),
+                   path=settings.get('persist_path') or None,
+                   max_disk_entries=int(settings.get('max_disk_entries', 100000)))
+
+    def _current_fingerprint(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._fingerprint
+            self._checked_at = now
+        fingerprint = model_fingerprint(self.model_dir, self.backend)
+        with self._lock:
+            changed = fingerprint != self._fingerprint
+            self._fingerprint = fingerprint
+        if changed:
+            self.cache.clear()
+            with self._lock:
+                self.invalidations += 1
+        return fingerprint
+
+    def _key(self, text: str, fingerprint: str) -> str:
+        material = f"{fingerprint}\0{normalize_description(text)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_or_classify(self, texts: List[str],
+                        classify: Callable[[List[str]], List[Optional[str]]]) -> List[Optional[str]]:
+        """Serve cached categories and send only the misses to `classify`, caching its answers."""
+        fingerprint = self._current_fingerprint()
+        keys = [self._key(text, fingerprint) for text in texts]
+        categories: List[Optional[str]] = [self.cache.get(key) for key in keys]
+        # Near-duplicates inside one call are classified once
+        misses: Dict[str, List[int]] = {}
+        for index, category in enumerate(categories):
+            if category is None:
+                misses.setdefault(keys[index], []).append(index)
+        if misses:
+            first_indexes = [indexes[0] for indexes in misses.values()]
+            answers = classify([texts[index] for index in first_indexes])
+            for (key, indexes), category in zip(misses.items(), answers):
+                if category is None:
+                    continue
+                self.cache.set(key, category)
+                for index in indexes:
+                    categories[index] = category
+        return categories
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        with self._lock:
+            stats['invalidations'] = self.invalidations
+            stats['model_fingerprint'] = self._fingerprint
+        return stats
@@ -0,0 +1,234 @@
+# classifier_cascade.py
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+CODING = "coding"
+RESEARCH = "research"
+
+# Stages, cheapest first; the stage that answered is reported with each result
+KEYWORDS = "keywords"
+LINEAR = "linear"
+TRANSFORMER = "transformer"
+STAGES = (KEYWORDS, LINEAR, TRANSFORMER)
+
+CODING_KEYWORDS = {
+    "implement", "code", "build", "create", "fix", "bug", "refactor", "function", "class", "endpoint",
+    "api", "html", "css", "javascript", "python", "script", "debug", "deploy", "compile", "unit",
+    "test", "tests", "page", "component", "migrate", "optimize", "sql", "query", "frontend", "backend"
+}
+RESEARCH_KEYWORDS = {
+    "research", "investigate", "compare", "comparison", "analyze", "analyse", "survey", "study",
+    "evaluate", "summarize", "summarise", "papers", "literature", "trends", "market", "competitors",
+    "alternatives", "tradeoffs", "pros", "cons", "why", "explain", "overview", "report", "find"
+}
+
+# Labelled examples the linear stage starts from before it learns from transformer answers
+SEED_EXAMPLES = [
+    ("Create a new HTML page with interactive elements", CODING),
+    ("Implement a REST endpoint that paginates results", CODING),
+    ("Fix the failing unit tests in the payment service", CODING),
+    ("Refactor the storage module into smaller functions", CODING),
+    ("Write a Python script to rename files in bulk", CODING),
+    ("Add a login form with client side validation", CODING),
+    ("Research HTML5 best practices and modern web standards", RESEARCH),
+    ("Compare OAuth2 providers and summarize their pricing", RESEARCH),
+    ("Find recent papers on retrieval augmented generation", RESEARCH),
+    ("Investigate why competitors adopted a subscription model", RESEARCH),
+    ("Summarize the tradeoffs of SQLite WAL mode", RESEARCH),
+    ("Survey the market for hosted vector databases", RESEARCH)
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+class HashedLinearModel:
+    """Logistic regression over hashed unigram and bigram features.
+
+    Features are hashed with CRC32 into `n_features` buckets, so the model
+    needs no vocabulary and its weights mean the same thing in every
+    process. `predict` returns P(coding).
+    """
+
+    def __init__(self, n_features: int = 1 << 16, learning_rate: float = 0.5):
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.weights = [0.0] * n_features
+        self.bias = 0.0
+
+    def features(self, text: str) -> List[int]:
+        tokens = tokenize(text)
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return sorted({zlib.crc32(gram.encode("utf-8")) % self.n_features for gram in grams})
+
+    def _score(self, indexes: List[int]) -> float:
+        if not indexes:
+            return self.bias
+        scale = 1 / math.sqrt(len(indexes))
+        return self.bias + scale * sum(self.weights[index] for index in indexes)
+
+    def predict(self, text: str) -> float:
+        score = max(-30.0, min(30.0, self._score(self.features(text))))
+        return 1 / (1 + math.exp(-score))
+
+    def partial_fit(self, text: str, category: str) -> None:
+        """One SGD step towards `category` for `text`."""
+        indexes = self.features(text)
+        target = 1.0 if category == CODING else 0.0
+        error = target - self.predict(text)
+        scale = 1 / math.sqrt(len(indexes)) if indexes else 0.0
+        for index in indexes:
+            self.weights[index] += self.learning_rate * error * scale
+        self.bias += self.learning_rate * error * 0.1
+
+    def fit(self, examples: List[Tuple[str, str]], epochs: int = 20) -> None:
+        for _ in range(epochs):
+            for text, category in examples:
+                self.partial_fit(text, category)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        nonzero = {str(index): weight for index, weight in enumerate(self.weights) if weight}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"n_features": self.n_features, "bias": self.bias, "weights": nonzero}, file)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Replace the weights with a saved model; False if the file is missing or incompatible."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("n_features") != self.n_features:
+            return False
+        self.weights = [0.0] * self.n_features
+        for index, weight in data.get("weights", {}).items():
+            self.weights[int(index)] = weight
+        self.bias = data.get("bias", 0.0)
+        return True
+
+class ClassifierCascade:
+    """Answers obvious descriptions cheaply and sends the rest to the transformer.
+
+    Stage one is a keyword rule: at least `keyword_min_hits` keywords of one
+    category and none of the other. Stage two is a hashed-feature linear
+    model, trusted when its probability for either category reaches
+    `threshold`. Anything else goes to `fallback` (the DistilBERT batcher).
+    With `learn` set, transformer answers are fed back to the linear model
+    so more traffic is answered cheaply over time.
+    """
+
+    def __init__(self, fallback: Callable[[List[str]], List[Optional[str]]], threshold: float = 0.9,
+                 keyword_min_hits: int = 2, learn: bool = True, weights_path: Optional[str] = None,
+                 enabled: bool = True):
+        self.fallback = fallback
+        self.threshold = threshold
+        self.keyword_min_hits = keyword_min_hits
+        self.learn = learn
+        self.weights_path = weights_path or None
+        self.enabled = enabled
+        self.model = HashedLinearModel()
+        if not (self.weights_path and self.model.load(self.weights_path)):
+            self.model.fit(SEED_EXAMPLES)
+        self._lock = threading.Lock()
+        self._counts = {stage: 0 for stage in STAGES}
+        self._seconds = {stage: 0.0 for stage in STAGES}
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]],
+                    fallback: Callable[[List[str]], List[Optional[str]]]) -> "ClassifierCascade":
+        settings = settings or {}
+        return cls(fallback,
+                   threshold=float(settings.get('threshold', 0.9)),
+                   keyword_min_hits=int(settings.get('keyword_min_hits', 2)),
+                   learn=bool(settings.get('learn', True)),
+                   weights_path=settings.get('weights_path') or None,
+                   enabled=bool(settings.get('enabled', True)))
+
+    def _keywords(self, text: str) -> Optional[Dict[str, Any]]:
+        tokens = set(tokenize(text))
+        coding = len(tokens & CODING_KEYWORDS)
+        research = len(tokens & RESEARCH_KEYWORDS)
+        if coding >= self.keyword_min_hits and research == 0:
+            return {"category": CODING, "stage": KEYWORDS, "confidence": 1.0}
+        if research >= self.keyword_min_hits and coding == 0:
+            return {"category": RESEARCH, "stage": KEYWORDS, "confidence": 1.0}
+        return None
+
+    def _linear(self, text: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            probability = self.model.predict(text)
+        confidence = max(probability, 1 - probability)
+        if confidence < self.threshold:
+            return None
+        return {"category": CODING if probability >= 0.5 else RESEARCH, "stage": LINEAR,
+                "confidence": round(confidence, 4)}
+
+    def _record(self, stage: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            self._counts[stage] += count
+            self._seconds[stage] += seconds
+
+    def _cheap(self, text: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        result = self._keywords(text)
+        if result is not None:
+            self._record(KEYWORDS, time.perf_counter() - started)
+            return result
+        result = self._linear(text)
+        if result is not None:
+            self._record(LINEAR, time.perf_counter() - started)
+        return result
+
+    def classify_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Classify each text; every result carries `category`, `stage` and `confidence`."""
+        results: List[Optional[Dict[str, Any]]] = [self._cheap(text) for text in texts]
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            started = time.perf_counter()
+            categories = self.fallback([texts[index] for index in pending])
+            self._record(TRANSFORMER, time.perf_counter() - started, len(pending))
+            for index, category in zip(pending, categories):
+                results[index] = {"category": category, "stage": TRANSFORMER, "confidence": None}
+                if self.learn and category in (CODING, RESEARCH):
+                    with self._lock:
+                        self.model.partial_fit(texts[index], category)
+        return results
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        return self.classify_many([text])[0]
+
+    def save(self) -> None:
+        """Persist the linear stage's weights when `weights_path` is set."""
+        if self.weights_path:
+            with self._lock:
+                self.model.save(self.weights_path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                'enabled': self.enabled,
+                'threshold': self.threshold,
+                'total': total,
+                'stages': {
+                    stage: {
+                        'count': self._counts[stage],
+                        'share': self._counts[stage] / total if total else 0.0,
+                        'mean_ms': self._seconds[stage] * 1000 / self._counts[stage] if self._counts[stage] else 0.0
+                    }
+                    for stage in STAGES
+                }
+            }
@@ -0,0 +1,43 @@
+# gunicorn.conf.py
+"""Pre-fork serving: load the task classifier once and share it with every worker.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+With `preload_app` the master imports main.py and loads the classifier
+before forking, so the workers share its weights copy-on-write instead of
+each holding a private copy. Everything that owns threads or SQLite
+connections (task pipeline, batcher, caches) is created or reopened per
+worker after the fork.
+"""
+import logging
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# PRELOAD_APP=false gives every worker its own copy, e.g. to measure what preloading saves
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+def on_starting(server):
+    if not preload_app:
+        return
+    try:
+        from pm_algorithm import preload_classifier
+        preload_classifier()
+        server.log.info("Task classifier preloaded for copy-on-write sharing")
+    except (Exception, SystemExit) as e:
+        # Workers fall back to loading their own copy; a failed download must not stop the master
+        server.log.warning(f"Could not preload task classifier: {e}")
+
+def post_fork(server, worker):
+    try:
+        from pm_algorithm import after_fork
+        after_fork()
+    except Exception as e:
+        server.log.warning(f"Classifier post-fork setup failed: {e}")
+    try:
+        from llm_integration import response_cache
+        response_cache.reopen()
+    except Exception as e:
+        logging.getLogger(__name__).debug(f"No LLM response cache to reopen: {e}")
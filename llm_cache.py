@@ -0,0 +1,181 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize chat messages so trivially different prompts share a cache key."""
+    normalized = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            content = content.replace("\r\n", "\n").strip()
+        normalized.append({**message, 'content': content})
+    return normalized
+
+def make_cache_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Build a stable key from provider, model, normalized messages and sampling params."""
+    material = json.dumps(
+        {
+            'provider': provider,
+            'model': model,
+            'messages': normalize_messages(messages),
+            'params': params
+        },
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Two-tier completion cache: an in-memory LRU in front of an optional SQLite file.
+
+    Entries expire after `ttl` seconds. The memory tier is bounded by entry
+    count and total bytes, the disk tier by entry count; both evict least
+    recently used entries first.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, max_bytes: int = 16 * 1024 * 1024,
+                 path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self.path = path or None
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path:
+            self._open_db()
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]]) -> "ResponseCache":
+        settings = settings or {}
+        return cls(
+            max_entries=int(settings.get('max_entries', 1024)),
+            ttl=float(settings.get('ttl_seconds', 3600)),
+            max_bytes=int(settings.get('max_bytes', 16 * 1024 * 1024)),
+            path=settings.get('persist_path') or None,
+            max_disk_entries=int(settings.get('max_disk_entries', 10000))
+        )
+
+    def _open_db(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._db.commit()
+
+    def reopen(self) -> None:
+        """Open a fresh SQLite connection, e.g. in a forked worker; connections must not cross a fork."""
+        if self.path:
+            with self._lock:
+                self._open_db()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._insert(key, value, created)
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store `value` in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._insert(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                if count > self.max_disk_entries:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (count - self.max_disk_entries,)
+                    )
+                self._db.commit()
+
+    def _insert(self, key: str, value: str, created: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, created)
+        self._bytes += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'persistent': self._db is not None
+            }
+            if self._db is not None:
+                stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return stats
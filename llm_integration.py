@@ -1,67 +1,514 @@
 # llm_integration.py
+import asyncio
+import time
+import importlib.util
 import requests
+import httpx
 import json
-import anthropic
-from typing import Dict, Any
+from typing import Dict, Any, Tuple, AsyncIterator, Awaitable, Callable, Optional
+from requests.adapters import HTTPAdapter
 from utils import load_configuration
+from llm_cache import ResponseCache, make_cache_key
+from llm_singleflight import SingleFlight
+from llm_limits import LimiterRegistry
+from llm_resilience import RetryPolicy, BreakerRegistry, CircuitOpenError, is_retryable
+from llm_prompts import PrefixStats, role_prefix, normalize_usage
 
 config = load_configuration()
 
-def call_openai(prompt: str) -> str:
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+DEEPSEEK_URL = "https://api.deepseek.com/chat/completions"
+ANTHROPIC_VERSION = "2023-06-01"
+# HTTP status equivalents for errors Anthropic reports inside an open stream
+ANTHROPIC_STREAM_ERROR_STATUSES = {"rate_limit_error": 429, "api_error": 500, "overloaded_error": 529}
+
+class ProviderError(Exception):
+    """A failed provider call, carrying the upstream HTTP status when there was one."""
+
+    def __init__(self, message: str, provider: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+
+def _provider_error(provider: str, label: str, error: Exception) -> ProviderError:
+    status_code = error.response.status_code if isinstance(error, httpx.HTTPStatusError) else None
+    return ProviderError(f"Error calling {label} API: {str(error)}", provider, status_code)
+
+# One long-lived pooled client per provider and event loop, with the task that closes it on loop shutdown
+_async_clients: Dict[Tuple[str, asyncio.AbstractEventLoop], Tuple[httpx.AsyncClient, "asyncio.Task[None]"]] = {}
+_sessions: Dict[str, requests.Session] = {}
+
+def _cache_settings() -> Dict[str, Any]:
+    """Response cache settings from the `llm.cache` section of config.yaml."""
+    return (config.get('llm') or {}).get('cache') or {}
+
+response_cache = ResponseCache.from_config(_cache_settings())
+single_flight = SingleFlight()
+limiters = LimiterRegistry((config.get('llm') or {}).get('limits'))
+retry_policy = RetryPolicy.from_config((config.get('llm') or {}).get('retry'))
+breakers = BreakerRegistry((config.get('llm') or {}).get('circuit_breaker'))
+prefix_stats = PrefixStats()
+
+def _coalescing_enabled() -> bool:
+    return bool(((config.get('llm') or {}).get('coalesce') or {}).get('enabled', True))
+
+def _http_settings() -> Dict[str, Any]:
+    """HTTP pool settings from the `llm.http` section of config.yaml."""
+    return (config.get('llm') or {}).get('http') or {}
+
+def _http2_enabled() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    return bool(_http_settings().get('http2', True)) and importlib.util.find_spec("h2") is not None
+
+def _provider_headers(provider: str) -> Dict[str, str]:
+    if provider == "anthropic":
+        return {
+            "Content-Type": "application/json",
+            "x-api-key": config.get('anthropic_api_key') or "",
+            "anthropic-version": ANTHROPIC_VERSION
+        }
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {config.get(f'{provider}_api_key') or ''}"
+    }
+
+async def _close_on_shutdown(client: httpx.AsyncClient) -> None:
+    """Wait until cancelled, then close `client` while its event loop is still running.
+
+    asyncio.run cancels outstanding tasks before closing the loop, so a
+    client is closed with its loop even if aclose_clients is never called.
+    """
     try:
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {config['openai_api_key']}"
-            },
-            json={
-                "model": "gpt-3.5-turbo",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7
-            },
-            timeout=30
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+def get_async_client(provider: str) -> httpx.AsyncClient:
+    """Return the pooled async client for a provider on the running event loop, creating it on first use.
+
+    Connections belong to the loop that opened them, so each loop gets its
+    own client rather than one loop replacing (and leaking) another's.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get((provider, loop))
+    if entry is not None and not entry[0].is_closed:
+        return entry[0]
+    if entry is not None:
+        entry[1].cancel()
+    # Clients of finished loops were closed by their shutdown tasks; drop them
+    for key in [key for key in _async_clients if key[1].is_closed()]:
+        del _async_clients[key]
+
+    settings = _http_settings()
+    client = httpx.AsyncClient(
+        headers=_provider_headers(provider),
+        http2=_http2_enabled(),
+        limits=httpx.Limits(
+            max_connections=int(settings.get('max_connections', 20)),
+            max_keepalive_connections=int(settings.get('max_keepalive_connections', 10)),
+            keepalive_expiry=float(settings.get('keepalive_expiry', 30))
+        ),
+        timeout=httpx.Timeout(
+            float(settings.get('read_timeout', 30)),
+            connect=float(settings.get('connect_timeout', 5))
+        )
+    )
+    _async_clients[(provider, loop)] = (client, loop.create_task(_close_on_shutdown(client)))
+    return client
+
+async def aclose_clients() -> None:
+    """Close every pooled async client owned by the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key, (client, closer) in list(_async_clients.items()):
+        if key[1] is loop:
+            del _async_clients[key]
+            closer.cancel()
+            await client.aclose()
+
+def get_session(provider: str) -> requests.Session:
+    """Return a keep-alive session for the synchronous call_* functions."""
+    session = _sessions.get(provider)
+    if session is None:
+        pool_size = int(_http_settings().get('max_connections', 20))
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        session.headers.update(_provider_headers(provider))
+        _sessions[provider] = session
+    return session
+
+def _role_prefix(role: Optional[str]) -> str:
+    return role_prefix(role, config.get('roles'))
+
+def _anthropic_system(text: str) -> Any:
+    """System prompt marked as a cacheable prefix when `llm.prompt_cache.enabled`."""
+    if not ((config.get('llm') or {}).get('prompt_cache') or {}).get('enabled', True):
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+# The role's system text always comes first so providers can reuse it as a cached prefix
+def _openai_payload(prompt: str, role: Optional[str] = None) -> Dict[str, Any]:
+    messages = [{"role": "user", "content": prompt}]
+    if role is not None:
+        messages.insert(0, {"role": "system", "content": _role_prefix(role)})
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": messages,
+        "temperature": 0.7
+    }
+
+def _anthropic_payload(prompt: str, role: Optional[str] = None) -> Dict[str, Any]:
+    payload = {
+        "model": "claude-3-5-sonnet-20240620",
+        "max_tokens": 1000,
+        "temperature": 0,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    if role is not None:
+        payload["system"] = _anthropic_system(_role_prefix(role))
+    return payload
+
+def _deepseek_payload(prompt: str, role: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "model": "deepseek-chat",
+        "messages": [
+            {"role": "system", "content": _role_prefix(role)},
+            {"role": "user", "content": prompt}
+        ],
+        "stream": False
+    }
+
+def provider_payload(provider: str, prompt: str, role: Optional[str] = None) -> Dict[str, Any]:
+    """Chat request body the provider functions send for `prompt`."""
+    builders = {"openai": _openai_payload, "anthropic": _anthropic_payload, "deepseek": _deepseek_payload}
+    if provider not in builders:
+        raise ValueError(f"Unknown provider: {provider}")
+    return builders[provider](prompt, role)
+
+def _estimate_tokens(payload: Dict[str, Any]) -> int:
+    """Rough token cost of a request (about 4 characters per token plus the output budget)."""
+    text = json.dumps(payload.get('messages', [])) + json.dumps(payload.get('system', ''))
+    output_budget = payload.get('max_tokens', (config.get('llm') or {}).get('max_tokens', 1000))
+    return len(text) // 4 + int(output_budget)
+
+def _request_key(provider: str, payload: Dict[str, Any]) -> str:
+    params = {k: v for k, v in payload.items() if k not in ('model', 'messages', 'stream')}
+    return make_cache_key(provider, payload['model'], payload['messages'], params)
+
+def _cache_key(provider: str, payload: Dict[str, Any], use_cache: bool) -> Optional[str]:
+    """Cache key for a request, or None when it has to go upstream.
+
+    Only deterministic (temperature 0) requests are cached unless
+    `llm.cache.cache_sampled` is enabled.
+    """
+    settings = _cache_settings()
+    if not use_cache or not settings.get('enabled', True):
+        return None
+    if payload.get('temperature', 1.0) != 0 and not settings.get('cache_sampled', False):
+        return None
+    return _request_key(provider, payload)
+
+def _breaker_outcome(error: Exception) -> Optional[bool]:
+    """Breaker signal for a failed call: False for provider trouble, None for our own request errors."""
+    return False if is_retryable(error) else None
+
+def _cached(provider: str, payload: Dict[str, Any], use_cache: bool, fetch: Callable[[], str]) -> str:
+    key = _cache_key(provider, payload, use_cache)
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    breaker = breakers.get(provider)
+
+    def attempt() -> str:
+        if not breaker.allow():
+            raise CircuitOpenError(provider, breaker.retry_in())
+        ok: Optional[bool] = None
+        try:
+            # Same rate budget and concurrency slots as the async path
+            with limiters.get(provider).slot_sync(_estimate_tokens(payload)):
+                result = fetch()
+            ok = True
+            return result
+        except Exception as e:
+            ok = _breaker_outcome(e)
+            raise
+        finally:
+            breaker.record(ok)
+
+    result = retry_policy.run_sync(attempt)
+    if key is not None:
+        response_cache.set(key, result)
+    return result
+
+async def _guarded(provider: str, payload: Dict[str, Any], fetch: Callable[[], Awaitable[str]]) -> str:
+    """One upstream attempt behind the provider's circuit breaker, rate limits and attempt deadline."""
+    breaker = breakers.get(provider)
+    if not breaker.allow():
+        raise CircuitOpenError(provider, breaker.retry_in())
+    ok: Optional[bool] = None
+    try:
+        async with limiters.get(provider).slot(_estimate_tokens(payload)):
+            if retry_policy.attempt_timeout:
+                try:
+                    result = await asyncio.wait_for(fetch(), retry_policy.attempt_timeout)
+                except asyncio.TimeoutError:
+                    raise ProviderError(
+                        f"Error calling {provider} API: no response within {retry_policy.attempt_timeout}s",
+                        provider
+                    )
+            else:
+                result = await fetch()
+        ok = True
+        return result
+    except Exception as e:
+        ok = _breaker_outcome(e)
+        raise
+    finally:
+        breaker.record(ok)
+
+async def _acached(provider: str, payload: Dict[str, Any], use_cache: bool,
+                   fetch: Callable[[], Awaitable[str]]) -> str:
+    """Serve from the cache, else share one upstream call among identical concurrent requests.
+
+    The upstream call is retried with jittered backoff on retryable errors.
+    """
+    key = _cache_key(provider, payload, use_cache)
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def fetch_and_store() -> str:
+        result = await retry_policy.run(lambda: _guarded(provider, payload, fetch))
+        if key is not None:
+            response_cache.set(key, result)
+        return result
+
+    if _coalescing_enabled():
+        return await single_flight.do(_request_key(provider, payload), fetch_and_store)
+    return await fetch_and_store()
+
+async def _cached_stream(provider: str, payload: Dict[str, Any], use_cache: bool,
+                         stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Replay a cached completion as one chunk, or stream (shared with identical
+    concurrent requests) and cache the complete answer."""
+    key = _cache_key(provider, payload, use_cache)
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    async def stream_and_store() -> AsyncIterator[str]:
+        breaker = breakers.get(provider)
+        chunks = []
+        for attempt in range(retry_policy.max_attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(provider, breaker.retry_in())
+            ok: Optional[bool] = None
+            try:
+                async with limiters.get(provider).slot(_estimate_tokens(payload)):
+                    upstream = stream()
+                    try:
+                        async for chunk in upstream:
+                            chunks.append(chunk)
+                            yield chunk
+                    finally:
+                        await upstream.aclose()
+                ok = True
+            except Exception as e:
+                ok = _breaker_outcome(e)
+                # Once text has reached the client a retry would repeat it
+                if chunks or attempt + 1 >= retry_policy.max_attempts or not is_retryable(e):
+                    raise
+            finally:
+                breaker.record(ok)
+            if ok:
+                break
+            retry_policy.retries += 1
+            await asyncio.sleep(retry_policy.delay(attempt))
+        if key is not None:
+            response_cache.set(key, "".join(chunks))
+
+    if _coalescing_enabled():
+        source = single_flight.stream(_request_key(provider, payload), stream_and_store)
+    else:
+        source = stream_and_store()
+    try:
+        async for chunk in source:
+            yield chunk
+    finally:
+        await source.aclose()
+
+def _record_usage(provider: str, role: Optional[str], usage: Optional[Dict[str, Any]],
+                  latency: Optional[float] = None, ttft: Optional[float] = None) -> None:
+    if usage:
+        prefix_stats.record(provider, role, normalize_usage(provider, usage), latency=latency, ttft=ttft)
+
+def _post_chat_completion(provider: str, url: str, payload: Dict[str, Any], label: str,
+                          role: Optional[str] = None) -> str:
+    started = time.monotonic()
+    try:
+        response = get_session(provider).post(
+            url,
+            json=payload,
+            timeout=(
+                float(_http_settings().get('connect_timeout', 5)),
+                float(_http_settings().get('read_timeout', 30))
+            )
         )
         response.raise_for_status()
         response_data = response.json()
+        _record_usage(provider, role, response_data.get('usage'), latency=time.monotonic() - started)
         return response_data['choices'][0]['message']['content']
     except requests.RequestException as e:
-        raise Exception(f"Error calling OpenAI API: {str(e)}")
+        status_code = e.response.status_code if e.response is not None else None
+        raise ProviderError(f"Error calling {label} API: {str(e)}", provider, status_code)
 
-def call_anthropic(prompt: str) -> str:
+def _post_anthropic_message(payload: Dict[str, Any], role: Optional[str] = None) -> str:
+    started = time.monotonic()
     try:
-        client = anthropic.Client(config['anthropic_api_key'])
-        response = client.completions.create(
-            model="claude-3-5-sonnet-20240620",
-            max_tokens_to_sample=1000,
-            temperature=0,
-            prompt=f"\n\nHuman: {prompt}\n\nAssistant:",
-            stop_sequences=["\n\nHuman:"]
+        response = get_session("anthropic").post(
+            ANTHROPIC_URL,
+            json=payload,
+            timeout=(
+                float(_http_settings().get('connect_timeout', 5)),
+                float(_http_settings().get('read_timeout', 30))
+            )
         )
-        return response.completion
-    except anthropic.APIError as e:
-        raise Exception(f"Error calling Anthropic API: {str(e)}")
+        response.raise_for_status()
+        response_data = response.json()
+        _record_usage("anthropic", role, response_data.get('usage'), latency=time.monotonic() - started)
+        return "".join(block.get('text', '') for block in response_data['content'] if block.get('type') == 'text')
+    except requests.RequestException as e:
+        status_code = e.response.status_code if e.response is not None else None
+        raise ProviderError(f"Error calling Anthropic API: {str(e)}", "anthropic", status_code)
+
+def call_openai(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _openai_payload(prompt, role)
+    return _cached("openai", payload, use_cache,
+                   lambda: _post_chat_completion("openai", OPENAI_URL, payload, "OpenAI", role))
+
+def call_anthropic(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _anthropic_payload(prompt, role)
+    return _cached("anthropic", payload, use_cache, lambda: _post_anthropic_message(payload, role))
+
+def call_deepseek(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _deepseek_payload(prompt, role)
+    return _cached("deepseek", payload, use_cache,
+                   lambda: _post_chat_completion("deepseek", DEEPSEEK_URL, payload, "DeepSeek", role))
 
-def call_deepseek(prompt: str) -> str:
+async def _apost_chat_completion(provider: str, url: str, payload: Dict[str, Any], label: str,
+                                 role: Optional[str] = None) -> str:
+    started = time.monotonic()
     try:
-        response = requests.post(
-            "https://api.deepseek.com/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {config['deepseek_api_key']}"
-            },
-            json={
-                "model": "deepseek-chat",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                "stream": False
-            },
-            timeout=30
-        )
+        response = await get_async_client(provider).post(url, json=payload)
         response.raise_for_status()
         response_data = response.json()
+        _record_usage(provider, role, response_data.get('usage'), latency=time.monotonic() - started)
         return response_data['choices'][0]['message']['content']
-    except requests.RequestException as e:
-        raise Exception(f"Error calling DeepSeek API: {str(e)}")
+    except httpx.HTTPError as e:
+        raise _provider_error(provider, label, e)
+
+async def _apost_anthropic_message(payload: Dict[str, Any], role: Optional[str] = None) -> str:
+    started = time.monotonic()
+    try:
+        response = await get_async_client("anthropic").post(ANTHROPIC_URL, json=payload)
+        response.raise_for_status()
+        response_data = response.json()
+        _record_usage("anthropic", role, response_data.get('usage'), latency=time.monotonic() - started)
+        return "".join(block.get('text', '') for block in response_data['content'] if block.get('type') == 'text')
+    except httpx.HTTPError as e:
+        raise _provider_error("anthropic", "Anthropic", e)
+
+async def acall_openai(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _openai_payload(prompt, role)
+    return await _acached("openai", payload, use_cache,
+                          lambda: _apost_chat_completion("openai", OPENAI_URL, payload, "OpenAI", role))
+
+async def acall_anthropic(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _anthropic_payload(prompt, role)
+    return await _acached("anthropic", payload, use_cache, lambda: _apost_anthropic_message(payload, role))
+
+async def acall_deepseek(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> str:
+    payload = _deepseek_payload(prompt, role)
+    return await _acached("deepseek", payload, use_cache,
+                          lambda: _apost_chat_completion("deepseek", DEEPSEEK_URL, payload, "DeepSeek", role))
+
+async def _iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the `data:` payloads of a server-sent event stream."""
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            yield line[5:].strip()
+
+async def _stream_chat_completion(provider: str, url: str, payload: Dict[str, Any], label: str,
+                                  role: Optional[str] = None) -> AsyncIterator[str]:
+    """Stream content deltas from an OpenAI-compatible chat completions endpoint."""
+    body = {**payload, "stream": True}
+    if provider == "openai":
+        # OpenAI only reports usage (and cached tokens) for streams when asked
+        body["stream_options"] = {"include_usage": True}
+    started = time.monotonic()
+    ttft = None
+    usage = None
+    try:
+        async with get_async_client(provider).stream("POST", url, json=body) as response:
+            response.raise_for_status()
+            async for data in _iter_sse_data(response):
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get('usage') or usage
+                choices = event.get('choices') or [{}]
+                delta = (choices[0].get('delta') or {}).get('content')
+                if delta:
+                    if ttft is None:
+                        ttft = time.monotonic() - started
+                    yield delta
+    except httpx.HTTPError as e:
+        raise _provider_error(provider, label, e)
+    _record_usage(provider, role, usage, latency=time.monotonic() - started, ttft=ttft)
+
+async def _stream_anthropic_message(payload: Dict[str, Any], role: Optional[str] = None) -> AsyncIterator[str]:
+    started = time.monotonic()
+    ttft = None
+    usage = None
+    try:
+        async with get_async_client("anthropic").stream("POST", ANTHROPIC_URL, json={**payload, "stream": True}) as response:
+            response.raise_for_status()
+            async for data in _iter_sse_data(response):
+                event = json.loads(data)
+                if event.get('type') == 'message_start':
+                    # Input and prompt-cache token counts arrive up front
+                    usage = (event.get('message') or {}).get('usage')
+                elif event.get('type') == 'content_block_delta':
+                    text = (event.get('delta') or {}).get('text')
+                    if text:
+                        if ttft is None:
+                            ttft = time.monotonic() - started
+                        yield text
+                elif event.get('type') == 'message_stop':
+                    break
+                elif event.get('type') == 'error':
+                    error = event.get('error') or {}
+                    raise ProviderError(f"Error calling Anthropic API: {error}", "anthropic",
+                                        ANTHROPIC_STREAM_ERROR_STATUSES.get(error.get('type')))
+    except httpx.HTTPError as e:
+        raise _provider_error("anthropic", "Anthropic", e)
+    _record_usage("anthropic", role, usage, latency=time.monotonic() - started, ttft=ttft)
+
+def astream_openai(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> AsyncIterator[str]:
+    payload = _openai_payload(prompt, role)
+    return _cached_stream("openai", payload, use_cache,
+                          lambda: _stream_chat_completion("openai", OPENAI_URL, payload, "OpenAI", role))
+
+def astream_anthropic(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> AsyncIterator[str]:
+    payload = _anthropic_payload(prompt, role)
+    return _cached_stream("anthropic", payload, use_cache, lambda: _stream_anthropic_message(payload, role))
+
+def astream_deepseek(prompt: str, use_cache: bool = True, role: Optional[str] = None) -> AsyncIterator[str]:
+    payload = _deepseek_payload(prompt, role)
+    return _cached_stream("deepseek", payload, use_cache,
+                          lambda: _stream_chat_completion("deepseek", DEEPSEEK_URL, payload, "DeepSeek", role))
@@ -0,0 +1,276 @@
+# llm_limits.py
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional, AsyncIterator, Iterator
+
+# Upstream statuses that mean "slow down" rather than "your request is wrong"
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504, 529}
+
+class TokenBucket:
+    """Refills `rate_per_minute` tokens per minute up to `capacity`.
+
+    Waiters are served in arrival order. A request larger than the bucket
+    is clamped to the capacity so it cannot wait forever. Async and blocking
+    callers (`acquire_sync`) draw from the same tokens.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._sync_lock = threading.Lock()
+        # Guards `tokens` between the event loop and threads calling acquire_sync
+        self._mutex = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_minute / 60)
+        self._updated = now
+
+    def _take(self, amount: float) -> float:
+        """Take `amount` tokens and return 0, or return the seconds until they will be there."""
+        with self._mutex:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) * 60 / self.rate_per_minute
+
+    def available(self) -> float:
+        with self._mutex:
+            self._refill()
+            return self.tokens
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(float(amount), self.capacity)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self._take(amount)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def acquire_sync(self, amount: float = 1.0) -> None:
+        """Blocking acquire for callers outside an event loop."""
+        amount = min(float(amount), self.capacity)
+        with self._sync_lock:
+            while True:
+                wait = self._take(amount)
+                if not wait:
+                    return
+                time.sleep(wait)
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease.
+
+    Each success raises the limit by `increase / limit` (about +`increase`
+    per full window of calls); each overload response multiplies it by
+    `decrease`, at most once per `cooldown` seconds so one burst of 429s
+    counts as one signal. Blocking callers (`acquire_sync`) share the same
+    slots, and a release on either side wakes waiters on both.
+    """
+
+    def __init__(self, initial: float = 8, min_limit: float = 1, max_limit: float = 64,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.waiting = 0
+        self._last_decrease = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._condition: Optional[asyncio.Condition] = None
+        # Guards the counters between the event loop and threads calling acquire_sync
+        self._mutex = threading.Lock()
+        self._sync_condition = threading.Condition()
+
+    def _bound_condition(self) -> asyncio.Condition:
+        # asyncio primitives belong to one event loop; rebuild them if the loop changes
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._condition = loop, asyncio.Condition()
+        return self._condition
+
+    def _count_waiting(self, delta: int) -> None:
+        with self._mutex:
+            self.waiting += delta
+
+    def _try_enter(self) -> bool:
+        with self._mutex:
+            if self.in_flight < max(1, int(self.limit)):
+                self.in_flight += 1
+                return True
+            return False
+
+    def _leave(self, overloaded: Optional[bool]) -> None:
+        with self._mutex:
+            self.in_flight -= 1
+            if overloaded is True:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif overloaded is False:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+
+    async def _notify_async(self) -> None:
+        async with self._bound_condition():
+            self._condition.notify_all()
+
+    def _notify_sync(self) -> None:
+        with self._sync_condition:
+            self._sync_condition.notify_all()
+
+    async def acquire(self) -> None:
+        async with self._bound_condition():
+            self._count_waiting(1)
+            try:
+                await self._condition.wait_for(self._try_enter)
+            finally:
+                self._count_waiting(-1)
+
+    async def release(self, overloaded: Optional[bool]) -> None:
+        """Return a slot; `overloaded` is True/False for a clear signal, None for no signal."""
+        self._leave(overloaded)
+        await self._notify_async()
+        self._notify_sync()
+
+    def acquire_sync(self) -> None:
+        """Blocking acquire for callers outside an event loop."""
+        with self._sync_condition:
+            self._count_waiting(1)
+            try:
+                self._sync_condition.wait_for(self._try_enter)
+            finally:
+                self._count_waiting(-1)
+
+    def release_sync(self, overloaded: Optional[bool]) -> None:
+        """Blocking counterpart of `release`."""
+        self._leave(overloaded)
+        self._notify_sync()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            # Async waiters can only be woken from their own loop
+            asyncio.run_coroutine_threadsafe(self._notify_async(), loop)
+
+class ProviderLimiter:
+    """Requests/min and tokens/min buckets plus AIMD concurrency for one provider."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 initial_concurrency: float = 8, min_concurrency: float = 1, max_concurrency: float = 64):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AIMDLimiter(initial_concurrency, min_concurrency, max_concurrency)
+        self.queued = 0
+        self.throttled = 0
+        self._counter_lock = threading.Lock()
+
+    def _count_queued(self, delta: int) -> None:
+        with self._counter_lock:
+            self.queued += delta
+
+    def _overloaded(self, error: Exception) -> bool:
+        if getattr(error, 'status_code', None) in OVERLOAD_STATUSES:
+            with self._counter_lock:
+                self.throttled += 1
+            return True
+        return False
+
+    @classmethod
+    def from_config(cls, settings: Dict[str, Any]) -> "ProviderLimiter":
+        return cls(
+            requests_per_minute=settings.get('requests_per_minute'),
+            tokens_per_minute=settings.get('tokens_per_minute'),
+            initial_concurrency=float(settings.get('initial_concurrency', 8)),
+            min_concurrency=float(settings.get('min_concurrency', 1)),
+            max_concurrency=float(settings.get('max_concurrency', 64))
+        )
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """Wait for rate budget and a concurrency slot, then feed the outcome back."""
+        self._count_queued(1)
+        try:
+            if self.requests is not None:
+                await self.requests.acquire(1)
+            if self.tokens is not None and estimated_tokens:
+                await self.tokens.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+        finally:
+            self._count_queued(-1)
+
+        overloaded: Optional[bool] = None
+        try:
+            yield
+            overloaded = False
+        except Exception as e:
+            overloaded = self._overloaded(e) or None
+            raise
+        finally:
+            await self.concurrency.release(overloaded)
+
+    @contextmanager
+    def slot_sync(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """Blocking `slot` for the synchronous provider calls; both draw on the same budget."""
+        self._count_queued(1)
+        try:
+            if self.requests is not None:
+                self.requests.acquire_sync(1)
+            if self.tokens is not None and estimated_tokens:
+                self.tokens.acquire_sync(estimated_tokens)
+            self.concurrency.acquire_sync()
+        finally:
+            self._count_queued(-1)
+
+        overloaded: Optional[bool] = None
+        try:
+            yield
+            overloaded = False
+        except Exception as e:
+            overloaded = self._overloaded(e) or None
+            raise
+        finally:
+            self.concurrency.release_sync(overloaded)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests_per_minute': self.requests.rate_per_minute if self.requests else None,
+            'requests_available': round(self.requests.available(), 2) if self.requests else None,
+            'tokens_per_minute': self.tokens.rate_per_minute if self.tokens else None,
+            'tokens_available': round(self.tokens.available(), 2) if self.tokens else None,
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'in_flight': self.concurrency.in_flight,
+            'queue_depth': self.queued,
+            'throttled': self.throttled
+        }
+
+class LimiterRegistry:
+    """Per-provider limiters built lazily from the `llm.limits` config section.
+
+    Settings under `default` apply to every provider and are overridden by
+    a section named after the provider.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = settings or {}
+        self._limiters: Dict[str, ProviderLimiter] = {}
+
+    def get(self, provider: str) -> ProviderLimiter:
+        if provider not in self._limiters:
+            merged = {**(self.settings.get('default') or {}), **(self.settings.get(provider) or {})}
+            self._limiters[provider] = ProviderLimiter.from_config(merged)
+        return self._limiters[provider]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {provider: limiter.snapshot() for provider, limiter in self._limiters.items()}
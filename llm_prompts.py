@@ -0,0 +1,107 @@
+# llm_prompts.py
+import threading
+from typing import Dict, Any, Optional
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+def role_prefix(role: Optional[str], roles: Optional[Dict[str, Any]] = None) -> str:
+    """Stable system text for a role from the `roles` config section.
+
+    A role's `system_prompt` is used verbatim; otherwise the persona is built
+    from its name and description. Without a role the generic assistant
+    prompt is returned. The text must not vary per request, or providers
+    cannot reuse the cached prefix.
+    """
+    if role is None:
+        return DEFAULT_SYSTEM_PROMPT
+    roles = roles or {}
+    if role not in roles:
+        raise ValueError(f"Unknown role: {role}")
+    settings = roles[role] or {}
+    if settings.get('system_prompt'):
+        return settings['system_prompt'].strip()
+    name = settings.get('name', role)
+    description = settings.get('description', '').rstrip('.')
+    return f"You are the {name} in the ChipCliff Collaborative Framework. {description}."
+
+def normalize_usage(provider: str, usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Input token counts from a provider `usage` block.
+
+    Returns total input tokens, tokens read from the provider's prompt cache
+    and tokens written to it (Anthropic only).
+    """
+    usage = usage or {}
+    if provider == "anthropic":
+        cached = usage.get('cache_read_input_tokens') or 0
+        written = usage.get('cache_creation_input_tokens') or 0
+        return {
+            'input_tokens': (usage.get('input_tokens') or 0) + cached + written,
+            'cached_tokens': cached,
+            'cache_write_tokens': written
+        }
+    if provider == "deepseek":
+        cached = usage.get('prompt_cache_hit_tokens') or 0
+    else:
+        cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+    return {'input_tokens': usage.get('prompt_tokens') or 0, 'cached_tokens': cached, 'cache_write_tokens': 0}
+
+class PrefixStats:
+    """Per provider/role prompt-cache counters.
+
+    A call is a prefix hit when the provider reports cached input tokens.
+    Latency (whole call) and TTFT (streams) are averaged separately for hits
+    and misses so the savings can be compared directly.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, role: Optional[str], usage: Dict[str, int],
+               latency: Optional[float] = None, ttft: Optional[float] = None) -> None:
+        key = f"{provider}:{role or 'default'}"
+        hit = usage.get('cached_tokens', 0) > 0
+        outcome = 'hit' if hit else 'miss'
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                'calls': 0, 'hits': 0, 'input_tokens': 0, 'cached_tokens': 0, 'cache_write_tokens': 0,
+                'latency_hit': 0.0, 'latency_hit_n': 0, 'latency_miss': 0.0, 'latency_miss_n': 0,
+                'ttft_hit': 0.0, 'ttft_hit_n': 0, 'ttft_miss': 0.0, 'ttft_miss_n': 0
+            })
+            stats['calls'] += 1
+            stats['hits'] += int(hit)
+            for field in ('input_tokens', 'cached_tokens', 'cache_write_tokens'):
+                stats[field] += usage.get(field, 0)
+            if latency is not None:
+                stats[f'latency_{outcome}'] += latency
+                stats[f'latency_{outcome}_n'] += 1
+            if ttft is not None:
+                stats[f'ttft_{outcome}'] += ttft
+                stats[f'ttft_{outcome}_n'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        def mean(stats: Dict[str, float], name: str) -> Optional[float]:
+            count = stats[f'{name}_n']
+            return round(stats[name] / count, 4) if count else None
+
+        with self._lock:
+            return {
+                key: {
+                    'calls': stats['calls'],
+                    'prefix_hits': stats['hits'],
+                    'hit_ratio': stats['hits'] / stats['calls'],
+                    'input_tokens': stats['input_tokens'],
+                    'cached_tokens': stats['cached_tokens'],
+                    'cache_write_tokens': stats['cache_write_tokens'],
+                    'cached_token_ratio': stats['cached_tokens'] / stats['input_tokens'] if stats['input_tokens'] else 0.0,
+                    'avg_latency_hit': mean(stats, 'latency_hit'),
+                    'avg_latency_miss': mean(stats, 'latency_miss'),
+                    'avg_ttft_hit': mean(stats, 'ttft_hit'),
+                    'avg_ttft_miss': mean(stats, 'ttft_miss')
+                }
+                for key, stats in self._stats.items()
+            }
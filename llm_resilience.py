@@ -0,0 +1,189 @@
+# llm_resilience.py
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+
+T = TypeVar('T')
+
+# Statuses worth another attempt: timeouts, throttling and server-side failures
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_in: float = 0.0):
+        super().__init__(f"Circuit breaker open for {provider}; retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.status_code = None
+        self.retry_in = retry_in
+
+def is_retryable(error: BaseException) -> bool:
+    """True for transport failures and throttling/server statuses, False for request errors."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if not hasattr(error, 'status_code'):
+        return False
+    # A provider error without a status never got a response (connect/read failure)
+    return error.status_code is None or error.status_code in RETRYABLE_STATUSES
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep uniform(0, min(max_delay, base * 2**attempt)).
+
+    `attempt_timeout` is the deadline callers put on each individual attempt.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 4.0,
+                 attempt_timeout: Optional[float] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        settings = settings or {}
+        return cls(
+            max_attempts=int(settings.get('max_attempts', 3)),
+            base_delay=float(settings.get('base_delay_ms', 200)) / 1000,
+            max_delay=float(settings.get('max_delay_ms', 4000)) / 1000,
+            attempt_timeout=float(settings['attempt_timeout']) if settings.get('attempt_timeout') else None
+        )
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn` until it succeeds, fails with a non-retryable error or attempts run out."""
+        for attempt in range(self.max_attempts):
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.delay(attempt))
+
+    def run_sync(self, fn: Callable[[], T]) -> T:
+        """Blocking variant of `run` for the synchronous provider calls."""
+        for attempt in range(self.max_attempts):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                    raise
+                self.retries += 1
+                time.sleep(self.delay(attempt))
+
+class CircuitBreaker:
+    """Closed → open when the failure rate over the last `window` calls crosses
+    `failure_threshold` (after at least `min_calls`); open → half-open after
+    `open_seconds`; half-open lets `half_open_probes` calls through and closes
+    once they all succeed, or reopens on the first failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int = 20, min_calls: int = 10, failure_threshold: float = 0.5,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.state = self.CLOSED
+        self.outcomes: deque = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def retry_in(self) -> float:
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)) if self.state == self.OPEN else 0.0
+
+    def record(self, ok: Optional[bool]) -> None:
+        """Record a call outcome; None means the call says nothing about provider health."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok is False:
+                    self._trip()
+                elif ok is True:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.state = self.CLOSED
+                        self.outcomes.clear()
+                return
+            if ok is None or self.state == self.OPEN:
+                return
+            self.outcomes.append(ok)
+            failures = sum(1 for outcome in self.outcomes if not outcome)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(1 for outcome in self.outcomes if not outcome)
+            return {
+                'state': self.state,
+                'failure_rate': failures / len(self.outcomes) if self.outcomes else 0.0,
+                'calls_in_window': len(self.outcomes),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'retry_in': round(self.retry_in(), 2)
+            }
+
+class BreakerRegistry:
+    """One circuit breaker per provider, configured from `llm.circuit_breaker`."""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = settings or {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(
+                window=int(self.settings.get('window', 20)),
+                min_calls=int(self.settings.get('min_calls', 10)),
+                failure_threshold=float(self.settings.get('failure_threshold', 0.5)),
+                open_seconds=float(self.settings.get('open_seconds', 30)),
+                half_open_probes=int(self.settings.get('half_open_probes', 1))
+            )
+        return self._breakers[provider]
+
+    def is_open(self, provider: str) -> bool:
+        return provider in self._breakers and self._breakers[provider].state == CircuitBreaker.OPEN \
+            and self._breakers[provider].retry_in() > 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {provider: breaker.snapshot() for provider, breaker in self._breakers.items()}
@@ -0,0 +1,239 @@
+# llm_router.py
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, AsyncIterator
+
+class ProviderStats:
+    """Rolling window of call outcomes for one provider."""
+
+    def __init__(self, window: int = 200):
+        self.samples: deque = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.samples.append((latency, ok))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over successful calls in the window."""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        # Nearest-rank percentile
+        index = max(0, math.ceil(q * len(latencies)) - 1)
+        return latencies[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'samples': len(self.samples),
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'error_rate': self.error_rate
+        }
+
+class LatencyRouter:
+    """Sends each request to the provider with the best recent tail latency.
+
+    Providers are scored by p95 latency inflated by their error rate. A
+    provider with fewer than `min_samples` observations scores zero so it
+    gets explored; ties go to the configured default provider. With hedging
+    enabled, a backup request goes to the next provider if the first has
+    not answered within `hedge_delay` seconds, and the first answer wins.
+    Failed attempts fail over to the next provider in rank order. Streams
+    (`route_stream`) race the same way for their first chunk.
+    """
+
+    def __init__(self, default_provider: Optional[str] = None, window: int = 200, min_samples: int = 5,
+                 error_penalty: float = 4.0, hedge: bool = False, hedge_delay: float = 0.75):
+        self.default_provider = default_provider
+        self.window = window
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.stats: Dict[str, ProviderStats] = {}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    @classmethod
+    def from_config(cls, llm_settings: Optional[Dict[str, Any]]) -> "LatencyRouter":
+        llm_settings = llm_settings or {}
+        settings = llm_settings.get('router') or {}
+        return cls(
+            default_provider=llm_settings.get('default_provider'),
+            window=int(settings.get('window', 200)),
+            min_samples=int(settings.get('min_samples', 5)),
+            error_penalty=float(settings.get('error_penalty', 4.0)),
+            hedge=bool(settings.get('hedge', False)),
+            hedge_delay=float(settings.get('hedge_delay_ms', 750)) / 1000
+        )
+
+    def _stats_for(self, provider: str) -> ProviderStats:
+        if provider not in self.stats:
+            self.stats[provider] = ProviderStats(self.window)
+        return self.stats[provider]
+
+    def observe(self, provider: str, latency: float, ok: bool) -> None:
+        """Record the outcome of a call made to `provider`."""
+        self._stats_for(provider).record(latency, ok)
+
+    def score(self, provider: str) -> float:
+        stats = self.stats.get(provider)
+        if stats is None or len(stats.samples) < self.min_samples:
+            return 0.0
+        p95 = stats.percentile(0.95)
+        if p95 is None:
+            return float('inf')
+        return p95 * (1 + self.error_penalty * stats.error_rate)
+
+    def rank(self, providers: List[str]) -> List[str]:
+        """Providers ordered best first."""
+        return sorted(providers, key=lambda name: (self.score(name), name != self.default_provider, name))
+
+    async def _attempt(self, provider: str, call: Callable[[], Awaitable[str]]) -> str:
+        started = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # A hedge that lost the race says nothing about provider health
+            raise
+        except Exception:
+            self.observe(provider, time.monotonic() - started, False)
+            raise
+        self.observe(provider, time.monotonic() - started, True)
+        return result
+
+    async def _first_chunk(self, provider: str, open_stream: Callable[[], AsyncIterator[str]]
+                           ) -> Tuple[AsyncIterator[str], List[str], float]:
+        """Open a stream and wait for its first chunk; return the stream, that chunk (if any) and the wait."""
+        started = time.monotonic()
+        chunks = open_stream()
+        try:
+            first = [await chunks.__anext__()]
+        except StopAsyncIteration:
+            first = []
+        except asyncio.CancelledError:
+            await chunks.aclose()
+            raise
+        except Exception:
+            self.observe(provider, time.monotonic() - started, False)
+            await chunks.aclose()
+            raise
+        return chunks, first, time.monotonic() - started
+
+    async def _race(self, providers: List[str], attempt: Callable[[str], Awaitable[Any]],
+                    discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Tuple[str, Any]:
+        """Run `attempt` on providers in rank order, hedging and failing over; return the first success.
+
+        `discard` is awaited on any other success that finished in the same
+        wakeup, so whatever it holds open can be released.
+        """
+        if not providers:
+            raise ValueError("No providers available for routing")
+
+        candidates = iter(self.rank(providers))
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> bool:
+            provider = next(candidates, None)
+            if provider is None:
+                return False
+            task = asyncio.ensure_future(attempt(provider))
+            pending[task] = provider
+            return True
+
+        launch()
+        first_provider = next(iter(pending.values()))
+        exhausted = len(providers) == 1
+        hedged = False
+        try:
+            while pending:
+                can_hedge = self.hedge and len(pending) == 1 and not exhausted
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if launch():
+                        self.hedges_fired += 1
+                        hedged = True
+                    else:
+                        exhausted = True
+                    continue
+
+                finished = [(pending.pop(task), task, task.exception()) for task in done]
+                succeeded = [(provider, task.result()) for provider, task, error in finished if error is None]
+                if succeeded:
+                    if discard:
+                        for _, result in succeeded[1:]:
+                            await discard(result)
+                    provider, result = succeeded[0]
+                    if hedged and provider != first_provider:
+                        self.hedges_won += 1
+                    return provider, result
+                last_error = finished[-1][2]
+
+                if not pending and not launch():
+                    exhausted = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    async def route(self, calls: Dict[str, Callable[..., Awaitable[str]]], prompt: str, **kwargs) -> Tuple[str, str]:
+        """Call the best provider for `prompt`; return (provider, response)."""
+        return await self._race(
+            list(calls), lambda provider: self._attempt(provider, lambda: calls[provider](prompt, **kwargs))
+        )
+
+    async def route_stream(self, streams: Dict[str, Callable[..., AsyncIterator[str]]], prompt: str,
+                           **kwargs) -> Tuple[str, AsyncIterator[str]]:
+        """Open the best provider's stream for `prompt`; return (provider, chunks).
+
+        The winner's time to first token is observed when the returned
+        stream ends, as a failure if the provider errored mid-stream.
+        """
+        async def close(opened: Tuple[AsyncIterator[str], List[str], float]) -> None:
+            await opened[0].aclose()
+
+        provider, (chunks, first, ttft) = await self._race(
+            list(streams), lambda provider: self._first_chunk(provider, lambda: streams[provider](prompt, **kwargs)),
+            discard=close
+        )
+
+        async def relay() -> AsyncIterator[str]:
+            ok = True
+            try:
+                for chunk in first:
+                    yield chunk
+                async for chunk in chunks:
+                    yield chunk
+            except Exception:
+                ok = False
+                raise
+            finally:
+                self.observe(provider, ttft, ok)
+                await chunks.aclose()
+
+        return provider, relay()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-provider latency/error stats plus hedging counters."""
+        return {
+            'providers': {
+                name: {**stats.snapshot(), 'score': None if self.score(name) == float('inf') else self.score(name)}
+                for name, stats in self.stats.items()
+            },
+            'hedge': self.hedge,
+            'hedge_delay_ms': self.hedge_delay * 1000,
+            'hedges_fired': self.hedges_fired,
+            'hedges_won': self.hedges_won
+        }
@@ -0,0 +1,131 @@
+# llm_singleflight.py
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _SharedStream:
+    """Buffers chunks from one upstream stream and replays them to every subscriber."""
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.source = source
+        self.chunks: List[str] = []
+        self.done = False
+        self.closing = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.get_running_loop().create_future()
+        self.pump = asyncio.ensure_future(self._run())
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.get_running_loop().create_future()
+        changed.set_result(None)
+
+    async def _run(self) -> None:
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            await self.source.aclose()
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    index += 1
+                    yield self.chunks[index - 1]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await asyncio.shield(self._changed)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Nobody is listening any more; stop paying for the upstream call
+                self.closing = True
+                self.pump.cancel()
+
+class SingleFlight:
+    """Coalesce concurrent identical calls onto one in-flight upstream call.
+
+    The upstream call runs in its own task, so one caller going away does not
+    cancel it for the others; it is only cancelled once every caller has left.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` once for all concurrent callers with the same key."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Share one upstream stream between concurrent callers with the same key.
+
+        Callers that join late first receive the chunks already produced.
+        """
+        shared = self._streams.get(key)
+        if shared is None or shared.done or shared.closing:
+            shared = _SharedStream(factory())
+            self._streams[key] = shared
+            shared.pump.add_done_callback(lambda _: self._forget(self._streams, key, shared))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        subscription = shared.subscribe()
+        try:
+            async for chunk in subscription:
+                yield chunk
+        finally:
+            await subscription.aclose()
+
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, entry: Any) -> None:
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Leader/follower counters and the number of calls in flight."""
+        total = self.leaders + self.followers
+        return {
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'coalesced_ratio': self.followers / total if total else 0.0,
+            'in_flight': len(self._calls) + len(self._streams)
+        }
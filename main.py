@@ -2,32 +2,64 @@
 Main application with improved error handling and configuration.
 """
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, Field, ValidationError
 import logging
+import asyncio
+import json
 import os
+import time
 import uvicorn
-from typing import Optional
+from typing import Optional, Literal, AsyncIterator, Dict, Any, List, Callable
 
 # Import modules with error handling
 try:
-    from llm_integration import call_openai, call_anthropic, call_deepseek
+    from llm_integration import acall_openai, acall_anthropic, acall_deepseek, aclose_clients
+    from llm_integration import astream_openai, astream_anthropic, astream_deepseek
+    from llm_integration import response_cache, single_flight, limiters, retry_policy, breakers, prefix_stats
+    from llm_resilience import CircuitOpenError
 except ImportError as e:
     logging.warning(f"LLM integration modules not available: {e}")
-    call_openai = call_anthropic = call_deepseek = None
+    acall_openai = acall_anthropic = acall_deepseek = aclose_clients = None
+    astream_openai = astream_anthropic = astream_deepseek = None
+    response_cache = single_flight = limiters = retry_policy = breakers = prefix_stats = None
+    CircuitOpenError = None
 
 try:
-    from xml_utils import create_xml_schema
+    from llm_router import LatencyRouter
+except ImportError as e:
+    logging.warning(f"LLM router not available: {e}")
+    LatencyRouter = None
+
+try:
+    from xml_utils import create_xml_schema, get_task_record, close_task_stores, task_store_stats
 except ImportError as e:
     logging.warning(f"XML utils not available: {e}")
-    create_xml_schema = None
+    create_xml_schema = get_task_record = close_task_stores = task_store_stats = None
 
 try:
-    from pm_algorithm import classify_task, assign_task, update_status
+    from pm_algorithm import classify_task, classify_task_detailed, assign_task, execute_task, update_status
+    from pm_algorithm import classifier_batcher, get_classifier_cascade, get_classifier_cache
+    from pm_algorithm import warm_up, classifier_state, plan_task
 except ImportError as e:
     logging.warning(f"PM algorithm not available: {e}")
-    classify_task = assign_task = update_status = None
+    classify_task = classify_task_detailed = assign_task = execute_task = update_status = None
+    plan_task = None
+    classifier_batcher = get_classifier_cascade = get_classifier_cache = None
+    warm_up = classifier_state = None
+
+try:
+    from task_pipeline import TaskPipeline, QueueFullError, task_status
+except ImportError as e:
+    logging.warning(f"Task pipeline not available: {e}")
+    TaskPipeline = QueueFullError = task_status = None
+
+try:
+    from task_graph import TaskGraphExecutor, GraphError
+except ImportError as e:
+    logging.warning(f"Task graph not available: {e}")
+    TaskGraphExecutor = GraphError = None
 
 try:
     from coder_algorithm import generate_code, send_feedback
@@ -86,6 +118,28 @@ if load_configuration:
 # Define data models
 class ChatRequest(BaseModel):
     prompt: str
+    stream: Optional[Literal["sse", "ndjson"]] = None
+    role: Optional[str] = None
+    
+    class Config:
+        str_strip_whitespace = True
+
+class BatchItem(BaseModel):
+    prompt: str
+    model: str = "auto"
+    role: Optional[str] = None
+    
+    class Config:
+        str_strip_whitespace = True
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchItem]
+    max_concurrency: Optional[int] = None
+    stream: Optional[Literal["sse", "ndjson"]] = None
+
+class TaskGraphRequest(BaseModel):
+    description: str
+    plan_only: bool = False  # return the decomposition without executing it
     
     class Config:
         str_strip_whitespace = True
@@ -93,18 +147,114 @@ class ChatRequest(BaseModel):
 class TaskRequest(BaseModel):
     description: str
     context: Optional[str] = None
+    priority: int = Field(0, ge=0, le=9)  # higher runs first
     
     class Config:
         str_strip_whitespace = True
 
-# Configuration for models
+# Configuration for models (awaitable provider calls sharing pooled clients)
 models_config = {}
-if call_openai:
-    models_config["openai"] = call_openai
-if call_anthropic:
-    models_config["anthropic"] = call_anthropic
-if call_deepseek:
-    models_config["deepseek"] = call_deepseek
+if acall_openai:
+    models_config["openai"] = acall_openai
+if acall_anthropic:
+    models_config["anthropic"] = acall_anthropic
+if acall_deepseek:
+    models_config["deepseek"] = acall_deepseek
+
+# Token streams for the same providers, used when ChatRequest.stream is set
+stream_models_config = {}
+if astream_openai:
+    stream_models_config["openai"] = astream_openai
+if astream_anthropic:
+    stream_models_config["anthropic"] = astream_anthropic
+if astream_deepseek:
+    stream_models_config["deepseek"] = astream_deepseek
+
+def _cache_allowed(http_request: Request) -> bool:
+    """Honour `Cache-Control: no-cache`/`no-store` and `X-Cache-Bypass` request headers."""
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return False
+    return http_request.headers.get("x-cache-bypass", "").lower() not in ("1", "true", "yes")
+
+def _call_options(http_request: Request, role: Optional[str] = None) -> Dict[str, Any]:
+    """Keyword arguments for a provider call; `role` selects a cached system prompt prefix."""
+    if role is not None and role not in (config.get('roles') or {}):
+        raise HTTPException(status_code=400, detail=f"Unknown role '{role}'")
+    options: Dict[str, Any] = {"use_cache": _cache_allowed(http_request)}
+    if role is not None:
+        options["role"] = role
+    return options
+
+# Per-role worker pools for /task over a durable queue: classify → assign → store off the request path.
+# Started with the app rather than at import, so each pre-forked worker owns its threads and queue connection.
+task_pipeline = None
+
+def _start_task_pipeline() -> None:
+    global task_pipeline
+    if task_pipeline is None and TaskPipeline and classify_task_detailed and execute_task:
+        task_pipeline = TaskPipeline.from_config(config.get('tasks'), classify_task_detailed, execute_task,
+                                                 config.get('roles'))
+
+# Runs decomposed multi-role tasks; created per worker at startup like the pipeline
+graph_executor = None
+
+def _start_task_graph() -> None:
+    global graph_executor
+    if graph_executor is None and TaskGraphExecutor and execute_task:
+        graph_executor = TaskGraphExecutor.from_config((config.get('tasks') or {}).get('graph'), execute_task,
+                                                       config.get('roles'))
+
+def _warm_up_enabled() -> bool:
+    return bool(warm_up) and bool((config.get('classifier') or {}).get('warm_up', True))
+
+# Set if the background classifier warm-up fails; readiness then stays at 503
+warm_up_error: Optional[str] = None
+
+def _warm_up_classifier() -> None:
+    global warm_up_error
+    started = time.monotonic()
+    try:
+        warm_up()
+        logger.info(f"Classifier warm after {time.monotonic() - started:.2f}s")
+    except (Exception, SystemExit) as e:
+        # SystemExit from a failed model download must not take the server down
+        warm_up_error = str(e)
+        logger.error(f"Classifier warm-up failed: {e}")
+
+# Latency-aware routing for /chat/auto; learns from every provider call
+router = LatencyRouter.from_config(config.get('llm')) if LatencyRouter else None
+
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+def _encode_stream_event(fmt: str, event: str, payload: Dict[str, Any]) -> str:
+    """Encode one stream event as an SSE frame or an NDJSON line."""
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+async def _relay_stream(http_request: Request, chunks: AsyncIterator[str], fmt: str, model_name: str) -> AsyncIterator[str]:
+    """Forward provider chunks to the client as they arrive.
+
+    The response pulls one chunk at a time, so a slow client applies
+    backpressure all the way to the provider connection. The upstream
+    stream is closed as soon as the client goes away.
+    """
+    try:
+        async for chunk in chunks:
+            if await http_request.is_disconnected():
+                logger.info(f"Client disconnected from {model_name} stream")
+                return
+            yield _encode_stream_event(fmt, "delta", {"delta": chunk, "model": model_name})
+        yield _encode_stream_event(fmt, "done", {"model": model_name, "status": "success"})
+    except Exception as err:
+        logger.error(f"Error streaming from {model_name}: {err}")
+        yield _encode_stream_event(fmt, "error", {"model": model_name, "detail": str(err)})
+    finally:
+        await chunks.aclose()
 
 @app.get("/")
 async def read_root():
@@ -116,17 +266,199 @@ async def read_root():
         "status": "running"
     }
 
+def _classifier_stats(getter: Optional[Callable[..., Any]], key: Optional[str] = None) -> Any:
+    """Stats of a lazily built classifier component, without building it just to report on it."""
+    component = getter(create=False) if getter else None
+    if not component:
+        return None
+    stats = component.stats()
+    return stats[key] if key else stats
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
+    circuit_breakers = breakers.snapshot() if breakers else {}
+    degraded = any(state['state'] != 'closed' for state in circuit_breakers.values())
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "models_available": len(models_config),
-        "configuration_loaded": bool(config)
+        "configuration_loaded": bool(config),
+        "circuit_breakers": circuit_breakers,
+        "classifier_cache_hit_ratio": _classifier_stats(get_classifier_cache, 'hit_ratio')
+    }
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 503 until the classifier has been loaded and warmed up."""
+    classifier = classifier_state() if classifier_state else None
+    ready = not _warm_up_enabled() or classifier is None or classifier['warm']
+    body = {
+        "status": "ready" if ready else "starting",
+        "configuration_loaded": bool(config),
+        "classifier": classifier,
+        # A request that loaded the model since then makes an earlier warm-up failure moot
+        "warm_up_error": None if ready else warm_up_error
     }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for the performance subsystems."""
+    return {
+        "llm_cache": response_cache.stats() if response_cache else None,
+        "llm_coalescing": single_flight.stats() if single_flight else None,
+        "llm_router": router.snapshot() if router else None,
+        "llm_limits": limiters.snapshot() if limiters else None,
+        "llm_retries": retry_policy.retries if retry_policy else None,
+        "llm_prompt_prefix": prefix_stats.snapshot() if prefix_stats else None,
+        "tasks": task_pipeline.stats() if task_pipeline else None,
+        "task_graph": graph_executor.stats() if graph_executor else None,
+        "task_store": task_store_stats() if task_store_stats else None,
+        "classifier_batching": classifier_batcher.stats() if classifier_batcher else None,
+        "classifier": classifier_state() if classifier_state else None,
+        "classifier_cascade": _classifier_stats(get_classifier_cascade),
+        "classifier_cache": _classifier_stats(get_classifier_cache)
+    }
+
+def _healthy_models(configs: Dict[str, Any]) -> Dict[str, Any]:
+    """Models whose circuit breaker is not open; all of them if every breaker is open."""
+    if not breakers:
+        return configs
+    healthy = {name: fn for name, fn in configs.items() if not breakers.is_open(name)}
+    return healthy or configs
+
+def _stream_response(http_request: Request, chunks: AsyncIterator[str], fmt: str, model_name: str) -> StreamingResponse:
+    return StreamingResponse(
+        _relay_stream(http_request, chunks, fmt, model_name),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _streaming_chat_response(model_name: str, request: ChatRequest, http_request: Request) -> StreamingResponse:
+    if model_name not in stream_models_config:
+        raise HTTPException(status_code=400, detail=f"Model '{model_name}' does not support streaming")
+    chunks = stream_models_config[model_name](request.prompt, **_call_options(http_request, request.role))
+    return _stream_response(http_request, chunks, request.stream, model_name)
+
+@app.post("/chat/auto")
+async def chat_auto(request: ChatRequest, http_request: Request):
+    """Chat endpoint that picks the provider with the best recent latency."""
+    if not router or not models_config:
+        raise HTTPException(status_code=503, detail="No models available for routing")
+    
+    options = _call_options(http_request, request.role)
+    if request.stream:
+        if not stream_models_config:
+            raise HTTPException(status_code=503, detail="No streaming models available for routing")
+        # Providers race for the first chunk; failures before it fail over like unstreamed calls
+        try:
+            model_name, chunks = await router.route_stream(
+                _healthy_models(stream_models_config), request.prompt, **options
+            )
+        except Exception as err:
+            logger.error(f"Error in routed chat stream: {err}")
+            raise HTTPException(status_code=500, detail=f"Error calling auto: {str(err)}")
+        return _stream_response(http_request, chunks, request.stream, model_name)
+    
+    try:
+        model_name, response = await router.route(_healthy_models(models_config), request.prompt, **options)
+        logger.info(f"Successful routed chat response from {model_name}")
+        return JSONResponse(content={
+            "response": response,
+            "model": model_name,
+            "status": "success"
+        })
+    except Exception as err:
+        logger.error(f"Error in routed chat: {err}")
+        raise HTTPException(status_code=500, detail=f"Error calling auto: {str(err)}")
+
+def _batch_settings() -> Dict[str, Any]:
+    """Batch limits from the `llm.batch` section of config.yaml."""
+    return (config.get('llm') or {}).get('batch') or {}
+
+async def _run_batch_item(index: int, item: BatchItem, http_request: Request,
+                          semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Run one batch prompt; failures become an error result instead of failing the batch."""
+    model_name = item.model
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            options = _call_options(http_request, item.role)
+            if model_name == "auto":
+                if not router or not models_config:
+                    raise Exception("No models available for routing")
+                model_name, response = await router.route(
+                    _healthy_models(models_config), item.prompt, **options
+                )
+            elif model_name not in models_config:
+                raise Exception(f"Model '{model_name}' not found")
+            else:
+                response = await models_config[model_name](item.prompt, **options)
+                if router:
+                    router.observe(model_name, time.monotonic() - started, True)
+            return {"index": index, "model": model_name, "status": "success", "response": response}
+        except Exception as err:
+            if router and model_name in models_config:
+                router.observe(model_name, time.monotonic() - started, False)
+            logger.error(f"Error in batch item {index} with {model_name}: {err}")
+            detail = err.detail if isinstance(err, HTTPException) else str(err)
+            return {"index": index, "model": model_name, "status": "error", "detail": detail}
+
+async def _relay_batch(http_request: Request, tasks: List[asyncio.Task], fmt: str) -> AsyncIterator[str]:
+    """Emit each item as it finishes, then every result in request order."""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected from batch stream")
+                return
+            results[result["index"]] = result
+            yield _encode_stream_event(fmt, "item", result)
+        yield _encode_stream_event(fmt, "done", _batch_summary(results))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _batch_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    failed = sum(1 for result in results if result["status"] != "success")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed, "status": "success"}
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """Run many prompts concurrently over the shared provider clients."""
+    settings = _batch_settings()
+    max_items = int(settings.get('max_items', 100))
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item")
+    if len(request.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {max_items} items")
+    
+    max_concurrency = int(settings.get('max_concurrency', 8))
+    concurrency = min(request.max_concurrency or max_concurrency, max_concurrency)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.ensure_future(_run_batch_item(index, item, http_request, semaphore))
+        for index, item in enumerate(request.items)
+    ]
+    
+    if request.stream:
+        return StreamingResponse(
+            _relay_batch(http_request, tasks, request.stream),
+            media_type=STREAM_MEDIA_TYPES[request.stream],
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    results = await asyncio.gather(*tasks)
+    return JSONResponse(content=_batch_summary(list(results)))
 
 @app.post("/chat/{model_name}")
-async def chat(model_name: str, request: ChatRequest):
+async def chat(model_name: str, request: ChatRequest, http_request: Request):
     """Chat endpoint for LLM interaction."""
     if model_name not in models_config:
         available_models = ", ".join(models_config.keys()) if models_config else "none"
@@ -135,9 +467,16 @@ async def chat(model_name: str, request: ChatRequest):
             detail=f"Model '{model_name}' not found. Available models: {available_models}"
         )
     
+    if request.stream:
+        return _streaming_chat_response(model_name, request, http_request)
+    
+    options = _call_options(http_request, request.role)
+    started = time.monotonic()
     try:
         call_model = models_config[model_name]
-        response = call_model(request.prompt)
+        response = await call_model(request.prompt, **options)
+        if router:
+            router.observe(model_name, time.monotonic() - started, True)
         logger.info(f"Successful chat response from {model_name}")
         return JSONResponse(content={
             "response": response, 
@@ -145,53 +484,87 @@ async def chat(model_name: str, request: ChatRequest):
             "status": "success"
         })
     except Exception as err:
+        if router:
+            router.observe(model_name, time.monotonic() - started, False)
+        if CircuitOpenError and isinstance(err, CircuitOpenError):
+            logger.warning(f"Rejected chat with {model_name}: {err}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Error calling {model_name}: {str(err)}",
+                headers={"Retry-After": str(max(1, int(err.retry_in + 0.5)))}
+            )
         logger.error(f"Error in chat with {model_name}: {err}")
         raise HTTPException(status_code=500, detail=f"Error calling {model_name}: {str(err)}")
 
-@app.post("/task")
+@app.post("/task", status_code=202)
 async def handle_task(request: TaskRequest):
-    """Handle task classification and assignment."""
-    if not classify_task or not assign_task:
+    """Queue a task for classification and assignment; poll its status URL for the outcome."""
+    if not task_pipeline:
         raise HTTPException(
             status_code=503, 
             detail="Task handling services not available"
         )
     
     try:
-        # Use local LLM for classification
-        category = classify_task(request.description)
-        if not category:
-            raise HTTPException(status_code=500, detail="Failed to classify task")
-        
-        task_id = assign_task(category, request.description)
-        if not task_id:
-            raise HTTPException(status_code=500, detail="Failed to assign task")
-        
-        return JSONResponse(content={
-            "task_id": task_id, 
-            "category": category,
-            "status": "assigned",
-            "description": request.description
-        })
-    except ValueError as e:
-        logger.error(f"Task handling error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+        # Recording the queued task is a blocking XML write; keep it off the event loop
+        task_id = await asyncio.get_running_loop().run_in_executor(
+            None, task_pipeline.submit, request.description, request.context, request.priority
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejected task: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as err:
-        logger.error(f"Unexpected error handling task: {err}")
+        logger.error(f"Unexpected error queueing task: {err}")
         if handle_error:
             handle_error(err, "task handling")
         raise HTTPException(status_code=500, detail="Internal server error")
+    
+    return JSONResponse(status_code=202, content={
+        "task_id": task_id,
+        "status": "queued",
+        "priority": request.priority,
+        "description": request.description,
+        "status_url": f"/tasks/{task_id}/status"
+    })
 
-@app.get("/tasks/{task_id}/status")
-async def get_task_status(task_id: str):
-    """Get status of a specific task."""
-    # This would need to be implemented with proper data retrieval
+@app.post("/tasks/graph")
+async def handle_task_graph(request: TaskGraphRequest):
+    """Split a task into dependent subtasks and run them across the coder and researcher roles."""
+    if not plan_task or not graph_executor:
+        raise HTTPException(status_code=503, detail="Task graph services not available")
+    
+    loop = asyncio.get_running_loop()
+    try:
+        nodes = await loop.run_in_executor(None, plan_task, request.description)
+        if request.plan_only:
+            return JSONResponse(content={"nodes": nodes})
+        results = await loop.run_in_executor(None, graph_executor.run, nodes)
+    except GraphError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as err:
+        logger.error(f"Unexpected error running task graph: {err}")
+        if handle_error:
+            handle_error(err, "task graph")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    statuses = [result["status"] for result in results.values()]
     return JSONResponse(content={
-        "task_id": task_id,
-        "status": "pending",  # Placeholder
-        "message": "Task status retrieval not fully implemented"
+        "status": "completed" if all(status == "completed" for status in statuses) else "failed",
+        "nodes": nodes,
+        "results": results
     })
 
+@app.get("/tasks/{task_id}/status")
+async def get_task_status(task_id: str):
+    """Get status, timings and results of a specific task."""
+    if not get_task_record:
+        raise HTTPException(status_code=503, detail="Task store not available")
+    
+    record = await asyncio.get_running_loop().run_in_executor(None, get_task_record, task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Task '{task_id}' not found")
+    return JSONResponse(content=task_status(task_id, record))
+
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request: Request, exc: ValidationError):
     """Handle Pydantic validation errors."""
@@ -227,6 +600,20 @@ async def startup_event():
         except Exception as e:
             logger.warning(f"Could not initialize XML schema: {e}")
     
+    try:
+        _start_task_pipeline()
+    except Exception as e:
+        logger.warning(f"Could not start task pipeline: {e}")
+    
+    try:
+        _start_task_graph()
+    except Exception as e:
+        logger.warning(f"Could not start task graph executor: {e}")
+    
+    # Load and warm the classifier off the event loop; /health/ready flips once it is done
+    if _warm_up_enabled():
+        app.state.classifier_warm_up = asyncio.get_running_loop().run_in_executor(None, _warm_up_classifier)
+    
     # Initialize UI components if available
     if create_ui and setup_dashboards and setup_notifications:
         try:
@@ -240,6 +627,30 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event."""
     logger.info("Shutting down ChipCliff Role-Based LLM Framework")
+    
+    # Release pooled provider connections
+    if aclose_clients:
+        try:
+            await aclose_clients()
+        except Exception as e:
+            logger.warning(f"Could not close LLM clients: {e}")
+    
+    # Stop the worker pools; unfinished jobs stay in the queue and resume on the next start
+    if task_pipeline:
+        task_pipeline.shutdown(wait=False)
+    
+    # Keep what the cascade's linear stage learned from transformer answers
+    cascade = get_classifier_cascade(create=False) if get_classifier_cascade else None
+    if cascade:
+        try:
+            cascade.save()
+        except Exception as e:
+            logger.warning(f"Could not save classifier cascade weights: {e}")
+    
+    # Write task changes still held by the write-behind store
+    if close_task_stores:
+        close_task_stores()
+
 def main():
     """Main function for direct execution."""
     
@@ -260,6 +671,7 @@ def main():
         "main:app",
         host=host,
         port=port,
+        workers=int(os.getenv("WORKERS", "1")),
         reload=os.getenv("DEBUG", "false").lower() == "true"
     )
 
@@ -1,17 +1,30 @@
+import gc
+import logging
 import os
+import threading
+import time
 import uuid
-from typing import Optional, Tuple
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import torch
-from xml_utils import update_task_status, log_error, log_success
+from typing import Optional, Tuple, Dict, List, Any
+from xml_utils import update_task_status, log_error, log_success, task_transaction
 from coder_algorithm import generate_code, send_feedback
 from researcher_algorithm import generate_queries, store_results
+from classifier_batching import MicroBatcher
+from classifier_cascade import ClassifierCascade
+from classifier_cache import ClassificationCache
+from task_graph import decompose
+from utils import load_configuration
+
+# torch and transformers take seconds to import, so they are only imported once the
+# classifier is first needed (or warmed up), keeping `import pm_algorithm` fast
+
+logger = logging.getLogger(__name__)
 
 # Directory to store the model and tokenizer
 MODEL_DIR = "models/task_classifier"
 MODEL_NAME = "distilbert-base-uncased"
 
-def load_model_and_tokenizer() -> Tuple[AutoModelForSequenceClassification, AutoTokenizer]:
+def load_model_and_tokenizer() -> Tuple[Any, Any]:
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
     if not os.path.exists(MODEL_DIR):
         try:
             os.makedirs(MODEL_DIR)
@@ -20,42 +33,222 @@ def load_model_and_tokenizer() -> Tuple[AutoModelForSequenceClassification, Auto
             model.save_pretrained(MODEL_DIR)
             tokenizer.save_pretrained(MODEL_DIR)
         except Exception as e:
-            log_error(f"Failed to download or save model/tokenizer: {str(e)}")
+            # Not log_error: this can run in the pre-fork master, which must not open the task store
+            logger.error(f"Failed to download or save model/tokenizer: {str(e)}")
             raise SystemExit(e)
     else:
         model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
         tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
     return model, tokenizer
 
-model, tokenizer = load_model_and_tokenizer()
+try:
+    config = load_configuration()
+except Exception:
+    config = {}
 
-def classify_task(user_input: str) -> Optional[str]:
+def _classifier_settings() -> Dict[str, Any]:
+    """Classifier settings from the `classifier` section of config.yaml."""
+    return config.get('classifier') or {}
+
+# Inference threads per process; 0 keeps torch's default (one per core)
+_torch_threads = int(_classifier_settings().get('torch_threads') or 0)
+
+def load_inference_model(model: Any, tokenizer: Any, backend: str) -> Tuple[Any, str]:
+    """Wrap the loaded model in the configured backend, falling back to fp32 torch if that fails."""
     try:
-        # This function uses a local LLM (DistilBERT) for classification
-        inputs = tokenizer(user_input, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        predictions = torch.argmax(outputs.logits, dim=-1)
-        category = "coding" if predictions.item() == 0 else "research"
-        return category
+        from classifier_backends import build_inference_model
+        return build_inference_model(model, tokenizer, backend, MODEL_DIR, threads=_torch_threads), backend
     except Exception as e:
-        log_error(f"Error during task classification: {str(e)}")
-        return None
+        log_error(f"Classifier backend '{backend}' unavailable, using torch: {str(e)}")
+        return model, "torch"
+
+# Loaded on first use by _ensure_model; tests may patch either one directly
+model = None
+tokenizer = None
+classifier_backend = _classifier_settings().get('backend', 'torch')
+_model_lock = threading.Lock()
+_load_seconds: Optional[float] = None
+_warm = False
+
+# The result cache (its SQLite file) and the cascade (its weights) are built on first use, like the
+# model; None means disabled, and tests may patch either one directly
+_UNLOADED: Any = object()
+classifier_cache: Any = _UNLOADED
+classifier_cascade: Any = _UNLOADED
+_components_lock = threading.Lock()
+
+def _ensure_model() -> None:
+    """Load the classifier once, on the first classification or warm-up."""
+    global model, tokenizer, classifier_backend, _load_seconds
+    if model is not None and tokenizer is not None:
+        return
+    with _model_lock:
+        if model is not None and tokenizer is not None:
+            return
+        started = time.monotonic()
+        import torch
+        if _torch_threads > 0:
+            torch.set_num_threads(_torch_threads)
+        try:
+            loaded_model, loaded_tokenizer = load_model_and_tokenizer()
+        except SystemExit as e:
+            # On the batcher thread a SystemExit would end the thread and leave every caller waiting
+            raise RuntimeError(f"Failed to load the task classifier: {e}") from e
+        loaded_model, classifier_backend = load_inference_model(loaded_model, loaded_tokenizer, classifier_backend)
+        if tokenizer is None:
+            tokenizer = loaded_tokenizer
+        if model is None:
+            model = loaded_model
+        cache = get_classifier_cache(create=False)
+        if cache:
+            # A backend fallback changes the fingerprint, so earlier answers are dropped
+            cache.backend = classifier_backend
+        _load_seconds = round(time.monotonic() - started, 3)
+
+def predict_categories(texts: List[str]) -> List[str]:
+    """Classify several descriptions in one forward pass, padded to the longest of them."""
+    global _warm
+    import torch
+    _ensure_model()
+    # This function uses a local LLM (DistilBERT) for classification
+    inputs = tokenizer(list(texts), return_tensors="pt", padding=True, truncation=True, max_length=512)
+    with torch.no_grad():
+        outputs = model(**inputs)
+    # Any successful forward pass warms the model, so readiness recovers after a failed warm-up
+    _warm = True
+    predictions = torch.argmax(outputs.logits, dim=-1)
+    return ["coding" if label == 0 else "research" for label in predictions.tolist()]
+
+def warm_up() -> None:
+    """Load the classifier and run one forward pass so the first real request is not slow."""
+    _ensure_model()
+    predict_categories(["warm up the task classifier"])
+
+def preload_classifier() -> None:
+    """Load the classifier in a pre-fork server parent so forked workers share its weights.
+
+    Weight tensors are never written after loading, so their pages stay
+    shared copy-on-write between workers. No forward pass runs here: torch's
+    thread pools are not fork-safe once started. ONNX Runtime sessions are
+    not fork-safe either, so those backends are left to load per worker.
+    """
+    if classifier_backend in ("onnx", "onnx-int8"):
+        # Not log_error: opening the task store here would start its threads and file lock before the fork
+        logger.warning(f"Classifier backend '{classifier_backend}' cannot be shared across forks; loading per worker")
+        return
+    _ensure_model()
+    # Move everything loaded so far out of the GC's reach, so collections in the
+    # workers do not write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+def after_fork() -> None:
+    """Per-worker setup after a fork: thread counts and SQLite connections are not inherited safely."""
+    if model is not None and _torch_threads > 0:
+        import torch
+        torch.set_num_threads(_torch_threads)
+    cache = get_classifier_cache(create=False)
+    if cache:
+        cache.cache.reopen()
+
+def classifier_state() -> Dict[str, Any]:
+    """Whether the classifier is loaded and warm, for readiness checks and /metrics."""
+    return {
+        'loaded': model is not None and tokenizer is not None,
+        'warm': _warm,
+        'backend': classifier_backend,
+        'load_seconds': _load_seconds
+    }
+
+# Concurrent classify_task calls (e.g. from the pm worker pool) share forward passes
+classifier_batcher = MicroBatcher.from_config(_classifier_settings().get('batching'), predict_categories)
+
+def _model_categories(user_inputs: List[str]) -> List[Optional[str]]:
+    """Classify with DistilBERT through the batcher; an entry is None where classification failed."""
+    categories: List[Optional[str]] = []
+    for future in classifier_batcher.map(user_inputs):
+        try:
+            categories.append(classifier_batcher.result(future))
+        except Exception as e:
+            log_error(f"Error during task classification: {str(e)}")
+            categories.append(None)
+    return categories
+
+def get_classifier_cache(create: bool = True) -> Optional[ClassificationCache]:
+    """Model answers keyed by normalized description, cleared when the files in MODEL_DIR change.
+
+    Opened on first use, since that creates its SQLite file; None when the
+    cache is disabled, or not opened yet and `create` is False.
+    """
+    global classifier_cache
+    if classifier_cache is _UNLOADED:
+        if not create:
+            return None
+        with _components_lock:
+            if classifier_cache is _UNLOADED:
+                classifier_cache = ClassificationCache.from_config(_classifier_settings().get('cache'), MODEL_DIR,
+                                                                   classifier_backend)
+    return classifier_cache
+
+def _transformer_categories(user_inputs: List[str]) -> List[Optional[str]]:
+    cache = get_classifier_cache()
+    if cache:
+        return cache.get_or_classify(user_inputs, _model_categories)
+    return _model_categories(user_inputs)
+
+def get_classifier_cascade(create: bool = True) -> Optional[ClassifierCascade]:
+    """Keywords and a hashed linear model that answer confident inputs; the rest go to DistilBERT.
+
+    Built on first use, since that loads the linear stage's weights; None
+    if not built yet and `create` is False.
+    """
+    global classifier_cascade
+    if classifier_cascade is _UNLOADED:
+        if not create:
+            return None
+        with _components_lock:
+            if classifier_cascade is _UNLOADED:
+                classifier_cascade = ClassifierCascade.from_config(_classifier_settings().get('cascade'),
+                                                                   _transformer_categories)
+    return classifier_cascade
+
+def classify_task_detailed(user_input: str) -> Dict[str, Any]:
+    """Category plus the cascade stage that answered (`keywords`, `linear` or `transformer`)."""
+    return get_classifier_cascade().classify(user_input)
+
+def classify_task(user_input: str) -> Optional[str]:
+    return classify_task_detailed(user_input)["category"]
+
+def classify_tasks(user_inputs: List[str]) -> List[Optional[str]]:
+    """Classify many descriptions at once; an entry is None where classification failed."""
+    return [result["category"] for result in get_classifier_cascade().classify_many(user_inputs)]
+
+def plan_task(task_description: str) -> List[Dict[str, Any]]:
+    """Split a description into classified subtasks with dependencies (see task_graph.decompose)."""
+    return decompose(task_description, classify_task)
+
+def execute_task(category: str, task_description: str) -> Dict[str, str]:
+    """Run the role workflow for a category and return its output."""
+    if category == 'coding':
+        code, test_result = generate_code(task_description)
+        send_feedback(test_result)
+        return {"output": code, "test_result": test_result}
+    elif category == 'research':
+        summary = generate_queries(task_description)
+        store_results(summary)
+        return {"output": summary}
+    else:
+        raise ValueError(f"Unknown category: {category}")
 
-def assign_task(category: str, task_description: str) -> Optional[str]:
-    task_id = str(uuid.uuid4())
+def assign_task(category: str, task_description: str, task_id: Optional[str] = None) -> Optional[str]:
+    task_id = task_id or str(uuid.uuid4())
     try:
-        if category == 'coding':
-            code, test_result = generate_code(task_description)
-            send_feedback(test_result)
-        elif category == 'research':
-            summary = generate_queries(task_description)
-            store_results(summary)
-        else:
-            raise ValueError(f"Unknown category: {category}")
-        
-        update_status(task_id, "completed")
-        log_success(task_id)
+        execute_task(category, task_description)
+        # Status and success log of one task reach the store as a single commit; execution stays
+        # outside so its error logs are written even when it raises
+        with task_transaction():
+            update_status(task_id, "completed")
+            log_success(task_id)
         return task_id
     except Exception as e:
         log_error(f"Error assigning task {task_id}: {str(e)}")
@@ -0,0 +1,194 @@
+# task_graph.py
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Callable
+from llm_cache import ResponseCache
+from task_pipeline import CATEGORY_ROLES
+
+# Sequencing words that start a new stage; parts of one stage can run in parallel
+_STAGE_BREAK = re.compile(r"\n+|;|\b(?:and then|then|after that|afterwards|finally)\b", re.IGNORECASE)
+_LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+# Upstream output passed to a node is truncated to keep its prompt bounded
+MAX_UPSTREAM_CHARS = 2000
+
+class GraphError(ValueError):
+    """Raised for graphs with unknown dependencies or cycles."""
+
+def decompose(description: str, classify: Callable[[str], Any]) -> List[Dict[str, Any]]:
+    """Split a description into subtask nodes with dependencies.
+
+    Stages are separated by newlines, semicolons and words like "then";
+    every node of a stage depends on every node of the stage before it.
+    Sentences within a stage are independent, except that coding nodes
+    wait for the research nodes of their own stage. `classify` is the PM
+    classifier (a category or a dict with `category`).
+    """
+    stages = []
+    for chunk in _STAGE_BREAK.split(description):
+        chunk = _LIST_MARKER.sub("", chunk).strip(" ,.")
+        if chunk:
+            stages.append([part.strip(" ,.") for part in _SENTENCE.split(chunk) if part.strip(" ,.")])
+
+    nodes: List[Dict[str, Any]] = []
+    previous: List[str] = []
+    for parts in stages:
+        stage_nodes = []
+        for part in parts:
+            result = classify(part)
+            category = result.get("category") if isinstance(result, dict) else result
+            stage_nodes.append({
+                "id": f"n{len(nodes) + len(stage_nodes) + 1}",
+                "description": part,
+                "category": category,
+                "depends_on": list(previous)
+            })
+        research = [node["id"] for node in stage_nodes if node["category"] == "research"]
+        for node in stage_nodes:
+            if node["category"] == "coding":
+                node["depends_on"].extend(research)
+        nodes.extend(stage_nodes)
+        previous = [node["id"] for node in stage_nodes]
+    return nodes
+
+def topological_order(nodes: List[Dict[str, Any]]) -> List[str]:
+    """Node ids in dependency order; raises GraphError for unknown ids or cycles."""
+    by_id = {node["id"]: node for node in nodes}
+    if len(by_id) != len(nodes):
+        raise GraphError("Duplicate node ids")
+    for node in nodes:
+        for dependency in node.get("depends_on", []):
+            if dependency not in by_id:
+                raise GraphError(f"Node {node['id']} depends on unknown node {dependency}")
+    order: List[str] = []
+    state: Dict[str, str] = {}
+
+    def visit(node_id: str) -> None:
+        if state.get(node_id) == "done":
+            return
+        if state.get(node_id) == "visiting":
+            raise GraphError(f"Cycle through node {node_id}")
+        state[node_id] = "visiting"
+        for dependency in by_id[node_id].get("depends_on", []):
+            visit(dependency)
+        state[node_id] = "done"
+        order.append(node_id)
+
+    for node in nodes:
+        visit(node["id"])
+    return order
+
+def node_input(node: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> str:
+    """The node's description followed by the outputs of the nodes it depends on."""
+    sections = [node["description"]]
+    for dependency in node.get("depends_on", []):
+        upstream = results[dependency]
+        output = str(upstream.get("output") or "")[:MAX_UPSTREAM_CHARS]
+        sections.append(f"Input from {dependency} ({upstream.get('category')}):\n{output}")
+    return "\n\n".join(sections)
+
+class TaskGraphExecutor:
+    """Runs a task graph, starting each node as soon as its dependencies complete.
+
+    Ready nodes run concurrently on a thread pool, at most the role's
+    `workers` (from the `roles` config) at a time per role. Each node gets
+    its upstream outputs appended to its description. Results are cached by
+    category and that full input, so re-running a graph only executes the
+    nodes whose description or upstream output changed. A failed node skips
+    everything downstream of it.
+    """
+
+    def __init__(self, execute: Callable[[str, str], Dict[str, Any]], max_workers: int = 4,
+                 role_limits: Optional[Dict[str, int]] = None, cache: Optional[ResponseCache] = None):
+        self.execute = execute
+        self.max_workers = max(1, max_workers)
+        self.cache = cache
+        self.role_limits = {role: max(1, limit) for role, limit in (role_limits or {}).items()}
+        self._role_slots = {role: threading.BoundedSemaphore(limit) for role, limit in self.role_limits.items()}
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]], execute: Callable[[str, str], Dict[str, Any]],
+                    roles: Optional[Dict[str, Any]] = None) -> "TaskGraphExecutor":
+        settings = settings or {}
+        role_limits = {
+            role: int(role_settings['workers'])
+            for role, role_settings in (roles or {}).items()
+            if role_settings and role_settings.get('workers')
+        }
+        cache_settings = settings.get('cache') or {}
+        cache = None
+        if cache_settings.get('enabled', True):
+            cache = ResponseCache(max_entries=int(cache_settings.get('max_entries', 1000)), ttl=0,
+                                  max_bytes=int(cache_settings.get('max_bytes', 16 * 1024 * 1024)),
+                                  path=cache_settings.get('persist_path') or None,
+                                  max_disk_entries=int(cache_settings.get('max_disk_entries', 10000)))
+        return cls(execute, max_workers=int(settings.get('max_workers', 4)), role_limits=role_limits, cache=cache)
+
+    def _cache_key(self, category: str, text: str) -> str:
+        return hashlib.sha256(f"{category}\0{text}".encode("utf-8")).hexdigest()
+
+    def _run_node(self, node: Dict[str, Any], text: str) -> Dict[str, Any]:
+        category = node["category"]
+        key = self._cache_key(category, text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**json.loads(cached), "cached": True}
+        role = CATEGORY_ROLES.get(category)
+        slot = self._role_slots.get(role)
+        if slot is not None:
+            slot.acquire()
+        try:
+            output = self.execute(category, text) or {}
+        finally:
+            if slot is not None:
+                slot.release()
+        result = {"output": output.get("output"), "test_result": output.get("test_result")}
+        if self.cache is not None:
+            self.cache.set(key, json.dumps(result))
+        return {**result, "cached": False}
+
+    def run(self, nodes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Execute the graph and return each node's result keyed by node id."""
+        topological_order(nodes)
+        by_id = {node["id"]: node for node in nodes}
+        results: Dict[str, Dict[str, Any]] = {}
+        waiting = dict(by_id)
+        running: Dict[Any, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="graph-node") as pool:
+            while waiting or running:
+                for node_id, node in list(waiting.items()):
+                    dependencies = node.get("depends_on", [])
+                    if any(results.get(dep, {}).get("status") in ("failed", "skipped") for dep in dependencies):
+                        results[node_id] = {"id": node_id, "category": node["category"], "status": "skipped",
+                                            "error": "An upstream node did not complete"}
+                        del waiting[node_id]
+                    elif all(results.get(dep, {}).get("status") == "completed" for dep in dependencies):
+                        text = node_input(node, results)
+                        running[pool.submit(self._run_node, node, text)] = node_id
+                        del waiting[node_id]
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id = running.pop(future)
+                    node = by_id[node_id]
+                    try:
+                        results[node_id] = {"id": node_id, "category": node["category"], "status": "completed",
+                                            **future.result()}
+                    except Exception as e:
+                        results[node_id] = {"id": node_id, "category": node["category"], "status": "failed",
+                                            "error": str(e)}
+        return {node["id"]: results[node["id"]] for node in nodes}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'role_limits': dict(self.role_limits),
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
@@ -0,0 +1,188 @@
+# task_pipeline.py
+import datetime
+import threading
+import uuid
+from typing import Dict, Any, Optional, Callable, Union
+from xml_utils import update_task_fields, log_success, log_failure, task_transaction
+from work_queue import WorkQueue, RoleWorkerPool, DEAD
+
+class QueueFullError(Exception):
+    """Raised when the pipeline already holds `max_pending` unfinished tasks."""
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+def _seconds_between(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    if not start or not end:
+        return None
+    delta = datetime.datetime.fromisoformat(end) - datetime.datetime.fromisoformat(start)
+    return round(delta.total_seconds(), 3)
+
+# Returns a category, or a dict with `category` and the `stage` that answered
+Classifier = Callable[[str], Union[Optional[str], Dict[str, Any]]]
+
+# Role whose pool runs each classified category
+CATEGORY_ROLES = {
+    "coding": "coder",
+    "research": "researcher"
+}
+
+class TaskPipeline:
+    """Runs classify → assign → store for submitted tasks through a durable work queue.
+
+    `submit` records the task as queued in the store and enqueues a job for
+    the `pm` pool, which classifies it and hands it to the coder or
+    researcher pool. Each role has its own worker threads, visibility
+    timeout and attempt limit (from the `roles` config), so research
+    scraping and code validation scale separately. Higher priorities are
+    claimed first. With a file-backed queue, tasks left queued or running by
+    a crash are picked up again once their lease runs out.
+    """
+
+    def __init__(self, classify: Classifier, execute: Callable[[str, str], Dict[str, str]],
+                 workers: int = 4, max_pending: int = 100,
+                 store: Callable[[str, Dict[str, Optional[str]]], bool] = update_task_fields,
+                 queue: Optional[WorkQueue] = None, roles: Optional[Dict[str, Any]] = None,
+                 visibility_timeout: float = 300, poll_interval: float = 0.5):
+        self.classify = classify
+        self.execute = execute
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.store = store
+        self.queue = queue or WorkQueue()
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        roles = roles or {}
+        self.pools: Dict[str, RoleWorkerPool] = {}
+        for role, handler in (("pm", self._classify_job), ("coder", self._execute_job),
+                              ("researcher", self._execute_job)):
+            settings = roles.get(role) or {}
+            self.pools[role] = RoleWorkerPool(
+                self.queue, role, handler,
+                workers=int(settings.get('workers', self.workers)),
+                visibility_timeout=float(settings.get('visibility_timeout', visibility_timeout)),
+                max_attempts=int(settings.get('max_attempts', 1)),
+                retry_delay=float(settings.get('retry_delay', 0)),
+                poll_interval=poll_interval,
+                on_failure=self._job_failed
+            )
+        for pool in self.pools.values():
+            pool.start()
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]], classify: Classifier,
+                    execute: Callable[[str, str], Dict[str, str]],
+                    roles: Optional[Dict[str, Any]] = None) -> "TaskPipeline":
+        settings = settings or {}
+        return cls(classify, execute,
+                   workers=int(settings.get('workers', 4)),
+                   max_pending=int(settings.get('max_pending', 100)),
+                   queue=WorkQueue(settings.get('queue_path') or ":memory:"),
+                   roles=roles,
+                   visibility_timeout=float(settings.get('visibility_timeout', 300)))
+
+    def submit(self, description: str, context: Optional[str] = None, priority: int = 0) -> str:
+        """Queue a task and return its id without waiting for it to run."""
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            if self.queue.pending() >= self.max_pending:
+                raise QueueFullError(f"Task queue is full ({self.max_pending} pending)")
+            if not self.store(task_id, {"Description": description, "Context": context, "Status": "queued",
+                                        "Priority": str(priority), "QueuedAt": _now()}):
+                raise Exception(f"Could not record task {task_id}")
+            self.queue.enqueue("pm", {"task_id": task_id, "description": description},
+                               priority=priority, job_id=task_id)
+        self.pools["pm"].notify()
+        return task_id
+
+    def _classify_job(self, job: Dict[str, Any]) -> None:
+        task_id = job['payload']['task_id']
+        description = job['payload']['description']
+        self.store(task_id, {"Status": "running", "StartedAt": _now()})
+        result = self.classify(description)
+        # A cascade classifier also reports which stage answered
+        if isinstance(result, dict):
+            category, stage = result.get("category"), result.get("stage")
+        else:
+            category, stage = result, None
+        if not category:
+            raise Exception("Failed to classify task")
+        role = CATEGORY_ROLES.get(category)
+        if role is None:
+            raise ValueError(f"Unknown category: {category}")
+        self.store(task_id, {"Category": category, "ClassifierStage": stage, "Role": role})
+        # Keyed by task so a replayed classification does not queue the work twice
+        self.queue.enqueue(role, {**job['payload'], "category": category},
+                           priority=job['priority'], job_id=f"{task_id}:{role}")
+        self.pools[role].notify()
+
+    def _execute_job(self, job: Dict[str, Any]) -> None:
+        task_id = job['payload']['task_id']
+        self.store(task_id, {"Status": "running", "Attempts": str(job['attempts'])})
+        result = self.execute(job['payload']['category'], job['payload']['description']) or {}
+        with self._lock:
+            self.completed += 1
+        with task_transaction():
+            self.store(task_id, {
+                "Status": "completed",
+                "FinishedAt": _now(),
+                "Result": result.get("output"),
+                "TestResult": result.get("test_result"),
+                "Error": None
+            })
+            log_success(task_id)
+
+    def _job_failed(self, job: Dict[str, Any], error: str, state: str) -> None:
+        task_id = job['payload']['task_id']
+        if state != DEAD:
+            self.store(task_id, {"Status": "queued", "Error": error})
+            return
+        with self._lock:
+            self.failed += 1
+        with task_transaction():
+            self.store(task_id, {"Status": "failed", "FinishedAt": _now(), "Error": error})
+            log_failure(task_id, error)
+
+    def stats(self) -> Dict[str, Any]:
+        pending = self.queue.pending()
+        roles = {role: pool.stats() for role, pool in self.pools.items()}
+        running = sum(role['running'] for role in roles.values())
+        with self._lock:
+            return {
+                'workers': sum(pool.workers for pool in self.pools.values()),
+                'max_pending': self.max_pending,
+                'queued': pending - running,
+                'running': running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'roles': roles
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the role pools; unfinished jobs stay in the queue for the next start."""
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+
+def task_status(task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """API view of a stored task record."""
+    return {
+        "task_id": task_id,
+        "status": record.get("Status") or "unknown",
+        "category": record.get("Category"),
+        "classifier_stage": record.get("ClassifierStage"),
+        "role": record.get("Role"),
+        "priority": int(record["Priority"]) if record.get("Priority") else 0,
+        "description": record.get("Description"),
+        "timings": {
+            "queued_at": record.get("QueuedAt"),
+            "started_at": record.get("StartedAt"),
+            "finished_at": record.get("FinishedAt"),
+            "queue_seconds": _seconds_between(record.get("QueuedAt"), record.get("StartedAt")),
+            "run_seconds": _seconds_between(record.get("StartedAt"), record.get("FinishedAt"))
+        },
+        "result": record.get("Result"),
+        "test_result": record.get("TestResult"),
+        "error": record.get("Error"),
+        "logs": record.get("Logs", [])
+    }
@@ -0,0 +1,1117 @@
+# task_store.py
+import bisect
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Optional, List, Tuple, Dict, Any, Iterator, Callable
+from classifier_batching import MicroBatcher
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): stores cannot be shared between processes
+    fcntl = None
+
+BACKENDS = ("xml", "sqlite", "journal")
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write `data` to a temporary file next to `path`, fsync it and rename it over `path`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _file_stamp(stat: os.stat_result) -> Tuple[int, int, int]:
+    # Every atomic write renames a new inode into place, so this changes whenever any process writes
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+class ConflictError(RuntimeError):
+    """A compare-and-set update kept losing to concurrent writers."""
+
+class FileLock:
+    """An exclusive advisory lock (flock) on a sidecar file, shared by every process on the host.
+
+    Not reentrant, and one holder per instance at a time; callers serialize
+    their own threads. Hold times are tracked so they can be kept short.
+    """
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("Cross-process file locks need fcntl, which this platform lacks")
+        self.path = path
+        self.acquisitions = 0
+        self.wait_seconds = 0.0
+        self.max_hold_seconds = 0.0
+        self._fd: Optional[int] = None
+        self._acquired = 0.0
+
+    def __enter__(self) -> "FileLock":
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Opened per acquisition: a descriptor inherited across fork would share the lock with the parent
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        started = time.monotonic()
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd, self._acquired = fd, time.monotonic()
+        self.acquisitions += 1
+        self.wait_seconds += self._acquired - started
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        fd, self._fd = self._fd, None
+        self.max_hold_seconds = max(self.max_hold_seconds, time.monotonic() - self._acquired)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'acquisitions': self.acquisitions,
+            'wait_seconds': round(self.wait_seconds, 6),
+            'max_hold_seconds': round(self.max_hold_seconds, 6)
+        }
+
+# Store mutations, applied as (name, *args) tuples; each is also a TaskStore method of the same name
+MUTATIONS = ("set_fields", "append_log", "append_entry", "store_task_results", "compare_and_set")
+
+class CommitStats:
+    """Durable writes per second and how many mutations each one carried."""
+
+    # Upper bounds of the batch size histogram; larger batches count under "more"
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.commits = 0
+        self.mutations = 0
+        self.largest_batch = 0
+        self._histogram = [0] * (len(self.BUCKETS) + 1)
+        self._recent: "deque[float]" = deque()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, batch_size: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.commits += 1
+            self.mutations += batch_size
+            self.largest_batch = max(self.largest_batch, batch_size)
+            self._histogram[bisect.bisect_left(self.BUCKETS, batch_size)] += 1
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - self.window:
+                self._recent.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] < now - self.window:
+                self._recent.popleft()
+            span = min(self.window, now - self._started) or 1.0
+            labels = [f"<={bound}" for bound in self.BUCKETS] + ["more"]
+            return {
+                'commits': self.commits,
+                'mutations': self.mutations,
+                'commits_per_second': round(len(self._recent) / span, 3),
+                'mean_batch_size': round(self.mutations / self.commits, 3) if self.commits else 0.0,
+                'largest_batch': self.largest_batch,
+                'batch_sizes': {label: count for label, count in zip(labels, self._histogram) if count}
+            }
+
+class TaskStore:
+    """Storage interface behind xml_utils: task fields and logs plus top-level Errors/Results entries.
+
+    A task record is a dict of field name to text with its log entries
+    under `Logs`, as returned by `get_task`. Backends implement `apply`,
+    which takes mutations as (name, *args) tuples and applies them as one
+    atomic commit; the single-mutation methods are built on it. Every
+    durable write is counted in `commit_stats`.
+
+    Each task carries a version stamp, starting at 0 for an unknown task
+    and bumped by every change to it. `get_versioned` reads a record with
+    its version and `compare_and_set` writes only if the version is
+    unchanged, which `update_task` wraps into a retrying read-modify-write.
+    """
+
+    def __init__(self):
+        self.commit_stats = CommitStats()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def has_task(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_versioned(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        """A task's record and version, read together."""
+        raise NotImplementedError
+
+    def apply(self, ops: List[Tuple[Any, ...]], sync: bool = False) -> List[Any]:
+        """Apply mutations atomically and return each one's result; with `sync`, durable on return."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _check(ops: List[Tuple[Any, ...]]) -> None:
+        for op in ops:
+            if not op or op[0] not in MUTATIONS:
+                raise ValueError(f"Unknown task store mutation: {op[0] if op else op!r}")
+
+    def set_fields(self, task_id: str, fields: Dict[str, Optional[str]]) -> None:
+        """Set fields of a task, creating the task if needed; None removes a field."""
+        self.apply([("set_fields", task_id, fields)])
+
+    def append_log(self, task_id: str, text: str) -> bool:
+        """Add a log entry to an existing task; False if the task is unknown."""
+        return self.apply([("append_log", task_id, text)])[0]
+
+    def append_entry(self, section: str, tag: str, text: str, timestamp: str) -> None:
+        """Add a timestamped entry under a top-level section such as Errors or Results."""
+        self.apply([("append_entry", section, tag, text, timestamp)])
+
+    def store_task_results(self, results: List[Tuple[str, str, str]]) -> None:
+        """Set Status and Result for many tasks in one change."""
+        self.apply([("store_task_results", results)])
+
+    def compare_and_set(self, task_id: str, expected_version: int, fields: Dict[str, Optional[str]]) -> bool:
+        """Set fields only if the task is still at `expected_version`; False if another writer got there first."""
+        return self.apply([("compare_and_set", task_id, expected_version, fields)])[0]
+
+    def update_task(self, task_id: str, change: Callable[[Optional[Dict[str, Any]]], Dict[str, Optional[str]]],
+                    attempts: int = 50) -> Dict[str, Optional[str]]:
+        """Read-modify-write a task: `change` maps the current record (None if unknown) to fields to set.
+
+        Retried with a fresh read whenever another writer changed the task
+        in between; raises ConflictError after `attempts` lost races.
+        Returns the fields that were written.
+        """
+        for attempt in range(attempts):
+            record, version = self.get_versioned(task_id)
+            fields = change(record)
+            if self.compare_and_set(task_id, version, fields):
+                return fields
+            # Jittered backoff so contending writers stop colliding in lockstep
+            time.sleep(random.uniform(0, 0.001 * (attempt + 1)))
+        raise ConflictError(f"Task {task_id} changed under {attempts} consecutive updates")
+
+    def flush(self) -> bool:
+        """Make pending changes durable; returns True if anything was written."""
+        return False
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {'commits': self.commit_stats.stats()}
+
+class XmlTaskStore(TaskStore):
+    """The project XML document held in memory, with a TaskID index and write-behind flushing.
+
+    Reads and writes touch only the in-memory tree; a background thread
+    writes the whole document at most `flush_interval` seconds after the
+    first unflushed change, to a temporary file that is fsynced and renamed
+    over `path`, so readers never see a torn file. A `flush_interval` of 0
+    writes through on every change.
+
+    With `shared`, several processes can use the same file. Every write
+    takes an exclusive lock on `path` + ".lock", reloads the document if
+    another process replaced it, replays this process's unflushed changes
+    on top, writes and releases, so the lock is held for one parse and one
+    write at most and no process overwrites another's changes. Reads
+    reload lazily when the file has changed. `compare_and_set` and sync
+    commits run under the lock against the latest document. Task versions
+    are kept in a `version` attribute on each Task element.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5, shared: bool = False):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self.file_lock = FileLock(path + ".lock") if shared else None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._index: Dict[str, ET.Element] = {}
+        self._root = self._load()
+        # Changes not yet in the file, replayed onto the newer document of another process
+        self._pending: List[Tuple[Any, ...]] = []
+        self._dirty = False
+        self._changes = 0
+        self._unflushed = 0
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.flush_errors = 0
+        self.reloads = 0
+        self.last_flush_seconds: Optional[float] = None
+
+    def _load(self) -> ET.Element:
+        root = ET.Element("Projects")
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as file:
+                self._stamp = _file_stamp(os.fstat(file.fileno()))
+                root = ET.parse(file).getroot()
+        self._index = {}
+        for task in root.iter("Task"):
+            self._index.setdefault(task.findtext("TaskID"), task)
+        return root
+
+    def _refresh(self) -> None:
+        """Reload a document another process replaced, keeping our unflushed changes; call with _lock held."""
+        if not self.shared:
+            return
+        try:
+            stamp = _file_stamp(os.stat(self.path))
+        except FileNotFoundError:
+            return
+        if stamp == self._stamp:
+            return
+        self._root = self._load()
+        for name, *args in self._pending:
+            getattr(self, f"_{name}")(*args)
+        self.reloads += 1
+
+    # Reads
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """A task's fields as a dict (log entries under `Logs`), or None if unknown."""
+        return self.get_versioned(task_id)[0]
+
+    def get_versioned(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        with self._lock:
+            self._refresh()
+            task = self._index.get(task_id)
+            if task is None:
+                return None, 0
+            record: Dict[str, Any] = {"Logs": []}
+            for child in task:
+                if child.tag == "Log":
+                    record["Logs"].append(child.text)
+                else:
+                    record[child.tag] = child.text
+            return record, int(task.get("version", "0"))
+
+    def has_task(self, task_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return task_id in self._index
+
+    # Mutations
+
+    def _task(self, task_id: str) -> ET.Element:
+        task = self._index.get(task_id)
+        if task is None:
+            task = ET.SubElement(self._root, "Task")
+            ET.SubElement(task, "TaskID").text = task_id
+            self._index[task_id] = task
+        task.set("version", str(int(task.get("version", "0")) + 1))
+        return task
+
+    def _set_fields(self, task_id: str, fields: Dict[str, Optional[str]]) -> None:
+        task = self._task(task_id)
+        for name, value in fields.items():
+            elem = task.find(name)
+            if value is None:
+                if elem is not None:
+                    task.remove(elem)
+                continue
+            if elem is None:
+                elem = ET.SubElement(task, name)
+            elem.text = value
+
+    def _append_log(self, task_id: str, text: str) -> bool:
+        if task_id not in self._index:
+            return False
+        ET.SubElement(self._task(task_id), "Log").text = text
+        return True
+
+    def _append_entry(self, section: str, tag: str, text: str, timestamp: str) -> None:
+        parent = self._root.find(section)
+        if parent is None:
+            parent = ET.SubElement(self._root, section)
+        entry = ET.SubElement(parent, tag)
+        entry.text = text
+        ET.SubElement(entry, "Timestamp").text = timestamp
+
+    def _store_task_results(self, results: List[Tuple[str, str, str]]) -> None:
+        for task_id, status, result in results:
+            self._set_fields(task_id, {"Status": status, "Result": result})
+
+    def _compare_and_set(self, task_id: str, expected_version: int, fields: Dict[str, Optional[str]]) -> bool:
+        task = self._index.get(task_id)
+        if (int(task.get("version", "0")) if task is not None else 0) != expected_version:
+            return False
+        self._set_fields(task_id, fields)
+        return True
+
+    def _apply_ops(self, ops: List[Tuple[Any, ...]]) -> List[Any]:
+        """Apply mutations to the tree and note them as unflushed; call with _lock held."""
+        results = []
+        for name, *args in ops:
+            result = getattr(self, f"_{name}")(*args)
+            results.append(result)
+            if name == "compare_and_set":
+                if not result:
+                    continue
+                # Decided against this document; a replay onto a newer one must not decide again
+                name, args = "set_fields", [args[0], args[2]]
+            if self.shared:
+                self._pending.append((name, *args))
+            self._dirty = True
+            self._changes += 1
+            self._unflushed += 1
+        return results
+
+    def apply(self, ops: List[Tuple[Any, ...]], sync: bool = False) -> List[Any]:
+        """Change the tree under one lock; with `sync` the document is written before returning."""
+        self._check(ops)
+        if self.shared and (sync or any(name == "compare_and_set" for name, *_ in ops)):
+            # Decide against the latest document, under the file lock
+            return self._write(ops)[0]
+        with self._lock:
+            results = self._apply_ops(ops)
+        # Outside _lock: flush() takes _write_lock before _lock
+        if sync:
+            self.flush()
+        else:
+            self._schedule_flush()
+        return results
+
+    # Persistence
+
+    def _schedule_flush(self) -> None:
+        if self.flush_interval <= 0 or self._stop.is_set():
+            self.flush()
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="task-store-flush", daemon=True)
+                self._flusher.start()
+        self._changed.set()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._changed.wait()
+            # Let changes accumulate, but never hold them longer than flush_interval
+            self._stop.wait(self.flush_interval)
+            self._changed.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing task store to {self.path}: {e}")
+
+    def flush(self) -> bool:
+        """Write the document now if it has unflushed changes; returns True if it wrote."""
+        return self._write([])[1]
+
+    def _write(self, ops: List[Tuple[Any, ...]]) -> Tuple[List[Any], bool]:
+        """Apply `ops` and write the document if anything is unflushed; returns the results and whether it wrote."""
+        with self._write_lock:
+            if self.file_lock is not None:
+                with self.file_lock:
+                    return self._write_locked(ops)
+            return self._write_locked(ops)
+
+    def _write_locked(self, ops: List[Tuple[Any, ...]]) -> Tuple[List[Any], bool]:
+        with self._lock:
+            self._refresh()
+            results = self._apply_ops(ops)
+            if not self._dirty:
+                return results, False
+            data = ET.tostring(self._root, encoding="utf-8", xml_declaration=True)
+            self._dirty = False
+            batch_size, self._unflushed = self._unflushed, 0
+            pending, self._pending = self._pending, []
+        started = time.monotonic()
+        try:
+            _atomic_write(self.path, data)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+                self._unflushed += batch_size
+                self._pending[:0] = pending
+                self.flush_errors += 1
+            raise
+        if self.shared:
+            # Still under the file lock, so the file is the one just written
+            with self._lock:
+                self._stamp = _file_stamp(os.stat(self.path))
+        self.commit_stats.record(batch_size)
+        self.flushes += 1
+        self.last_flush_seconds = round(time.monotonic() - started, 6)
+        return results, True
+
+    def close(self) -> None:
+        """Stop the flusher and write any pending changes."""
+        self._stop.set()
+        self._changed.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'path': self.path,
+                'tasks': len(self._index),
+                'changes': self._changes,
+                'dirty': self._dirty,
+                'flushes': self.flushes,
+                'flush_errors': self.flush_errors,
+                'flush_interval': self.flush_interval,
+                'last_flush_seconds': self.last_flush_seconds,
+                'shared': self.shared,
+                'reloads': self.reloads,
+                'file_lock': self.file_lock.stats() if self.file_lock is not None else None,
+                'commits': self.commit_stats.stats()
+            }
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    status TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks (updated_at);
+CREATE TABLE IF NOT EXISTS task_fields (
+    task_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (task_id, name)
+);
+CREATE TABLE IF NOT EXISTS task_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    message TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_logs_task ON task_logs (task_id, id);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    section TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    message TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_section ON entries (section, timestamp);
+"""
+
+# Statements are fixed strings so sqlite3's per-connection statement cache reuses their prepared form
+_UPSERT_TASK = ("INSERT INTO tasks (task_id, status, created_at, updated_at, version) VALUES (?, NULL, ?, ?, 1) "
+                "ON CONFLICT (task_id) DO UPDATE SET updated_at = excluded.updated_at, version = version + 1")
+_SET_STATUS = "UPDATE tasks SET status = ? WHERE task_id = ?"
+_SET_FIELD = ("INSERT INTO task_fields (task_id, name, value) VALUES (?, ?, ?) "
+              "ON CONFLICT (task_id, name) DO UPDATE SET value = excluded.value")
+_DELETE_FIELD = "DELETE FROM task_fields WHERE task_id = ? AND name = ?"
+_TOUCH_TASK = "UPDATE tasks SET updated_at = ?, version = version + 1 WHERE task_id = ?"
+_SELECT_VERSION = "SELECT version FROM tasks WHERE task_id = ?"
+_INSERT_LOG = "INSERT INTO task_logs (task_id, message, created_at) VALUES (?, ?, ?)"
+_INSERT_ENTRY = "INSERT INTO entries (section, tag, message, timestamp) VALUES (?, ?, ?, ?)"
+_SELECT_TASK = "SELECT status FROM tasks WHERE task_id = ?"
+_SELECT_FIELDS = "SELECT name, value FROM task_fields WHERE task_id = ?"
+_SELECT_LOGS = "SELECT message FROM task_logs WHERE task_id = ? ORDER BY id"
+
+class SqliteTaskStore(TaskStore):
+    """Task records in a SQLite database in WAL mode, safe for concurrent writers.
+
+    Status and timestamps are indexed columns of `tasks`; other fields are
+    rows of `task_fields`. Each thread gets its own connection (reopened
+    after a fork), and every `apply` is one transaction.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        super().__init__()
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+        self.transactions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        db.executescript(_SCHEMA)
+        # Databases created before version stamps; checked under the write lock so processes do not race
+        db.execute("BEGIN IMMEDIATE")
+        if "version" not in [row[1] for row in db.execute("PRAGMA table_info(tasks)")]:
+            db.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        db.execute("COMMIT")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Connections must not cross a fork; drop the parent's without closing them
+            self._local = threading.local()
+            with self._connections_lock:
+                self._connections = []
+            self._pid = os.getpid()
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, cached_statements=64)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            with self._connections_lock:
+                self._connections.append(db)
+        return db
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        db = self._connection()
+        row = db.execute(_SELECT_TASK, (task_id,)).fetchone()
+        if row is None:
+            return None
+        record: Dict[str, Any] = {"TaskID": task_id}
+        if row[0] is not None:
+            record["Status"] = row[0]
+        record.update(dict(db.execute(_SELECT_FIELDS, (task_id,)).fetchall()))
+        record["Logs"] = [message for (message,) in db.execute(_SELECT_LOGS, (task_id,))]
+        return record
+
+    def has_task(self, task_id: str) -> bool:
+        return self._connection().execute(_SELECT_TASK, (task_id,)).fetchone() is not None
+
+    def get_versioned(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        db = self._connection()
+        # One read transaction, so the record and its version come from the same snapshot
+        db.execute("BEGIN")
+        try:
+            row = db.execute(_SELECT_VERSION, (task_id,)).fetchone()
+            return self.get_task(task_id), row[0] if row else 0
+        finally:
+            db.execute("COMMIT")
+
+    def _set_fields(self, db: sqlite3.Connection, now: float, task_id: str, fields: Dict[str, Optional[str]]) -> None:
+        db.execute(_UPSERT_TASK, (task_id, now, now))
+        for name, value in fields.items():
+            if name == "TaskID":
+                continue
+            if name == "Status":
+                db.execute(_SET_STATUS, (value, task_id))
+            elif value is None:
+                db.execute(_DELETE_FIELD, (task_id, name))
+            else:
+                db.execute(_SET_FIELD, (task_id, name, value))
+
+    def _append_log(self, db: sqlite3.Connection, now: float, task_id: str, text: str) -> bool:
+        if db.execute(_TOUCH_TASK, (now, task_id)).rowcount == 0:
+            return False
+        db.execute(_INSERT_LOG, (task_id, text, now))
+        return True
+
+    def _append_entry(self, db: sqlite3.Connection, now: float, section: str, tag: str, text: str,
+                      timestamp: str) -> None:
+        db.execute(_INSERT_ENTRY, (section, tag, text, timestamp))
+
+    def _store_task_results(self, db: sqlite3.Connection, now: float, results: List[Tuple[str, str, str]]) -> None:
+        for task_id, status, result in results:
+            self._set_fields(db, now, task_id, {"Status": status, "Result": result})
+
+    def _compare_and_set(self, db: sqlite3.Connection, now: float, task_id: str, expected_version: int,
+                         fields: Dict[str, Optional[str]]) -> bool:
+        # BEGIN IMMEDIATE holds the write lock, so nobody can change the version between check and set
+        row = db.execute(_SELECT_VERSION, (task_id,)).fetchone()
+        if (row[0] if row else 0) != expected_version:
+            return False
+        self._set_fields(db, now, task_id, fields)
+        return True
+
+    def apply(self, ops: List[Tuple[Any, ...]], sync: bool = False) -> List[Any]:
+        """Run every mutation in one transaction; with `sync` that commit is fsynced (synchronous=FULL)."""
+        self._check(ops)
+        now = time.time()
+        db = self._connection()
+        if sync:
+            # WAL commits under synchronous=NORMAL are durable only at the next checkpoint
+            db.execute("PRAGMA synchronous=FULL")
+        try:
+            with _Transaction(self, db, len(ops)):
+                return [getattr(self, f"_{name}")(db, now, *args) for name, *args in ops]
+        finally:
+            if sync:
+                db.execute("PRAGMA synchronous=NORMAL")
+
+    def import_records(self, tasks: List[Dict[str, Any]], entries: List[Tuple[str, str, str, str]]) -> None:
+        """Insert task records (fields plus `Logs`) and section entries in one transaction."""
+        now = time.time()
+        with _Transaction(self, self._connection(), len(tasks) + len(entries)) as db:
+            for record in tasks:
+                fields = {name: value for name, value in record.items() if name not in ("TaskID", "Logs")}
+                self._set_fields(db, now, record["TaskID"], fields)
+                for message in record.get("Logs", []):
+                    db.execute(_INSERT_LOG, (record["TaskID"], message, now))
+            for entry in entries:
+                db.execute(_INSERT_ENTRY, entry)
+
+    def count_by_status(self) -> Dict[Optional[str], int]:
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            try:
+                db.close()
+            except sqlite3.ProgrammingError:
+                # Opened by another thread; it is released with that thread
+                pass
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connections_lock:
+            connections = len(self._connections)
+        return {
+            'path': self.path,
+            'tasks': sum(self.count_by_status().values()),
+            'transactions': self.transactions,
+            'connections': connections,
+            'commits': self.commit_stats.stats()
+        }
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT on one connection, rolled back if the block raises."""
+
+    def __init__(self, store: SqliteTaskStore, db: sqlite3.Connection, mutations: int = 1):
+        self.store = store
+        self.db = db
+        self.mutations = mutations
+
+    def __enter__(self) -> sqlite3.Connection:
+        # Take the write lock up front so concurrent writers queue on busy_timeout instead of deadlocking
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.db.execute("COMMIT")
+            self.store.transactions += 1
+            self.store.commit_stats.record(self.mutations)
+        else:
+            self.db.execute("ROLLBACK")
+
+class JournalTaskStore(TaskStore):
+    """Task history as an append-only JSON-lines journal, served from an in-memory view.
+
+    Every change is one event appended to the active journal segment in
+    `directory` and applied to the view; reads never touch disk. Several
+    mutations passed to `apply` together are journaled as one batch event,
+    which replay applies whole or not at all. Events
+    reach the OS on every append, but fsync runs in a background thread at
+    most every `sync_interval` seconds, so one fsync covers every event
+    since the last. After `snapshot_every` events the view is written to
+    snapshot.json and a new segment is started; segments the snapshot
+    covers are deleted, which bounds replay at startup to one snapshot plus
+    at most `snapshot_every` events. A torn last line from a crash is
+    dropped on replay.
+
+    The view lives in one process, so a journal can only be open in one
+    process at a time; a second process gets a RuntimeError instead of
+    writing a journal the first one never reads. Use the sqlite backend or
+    a shared xml store to run several workers.
+    """
+
+    SNAPSHOT = "snapshot.json"
+    LOCK = "LOCK"
+
+    def __init__(self, directory: str, sync_interval: float = 0.05, snapshot_every: int = 10000):
+        super().__init__()
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.snapshot_every = max(1, snapshot_every)
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._sections: Dict[str, List[List[Optional[str]]]] = {}
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._synced_seq = 0
+        self._unsynced_mutations = 0
+        self.fsyncs = 0
+        self.snapshots = 0
+        self.replayed_events = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = self._lock_directory()
+        started = time.monotonic()
+        self._replay()
+        self.replay_seconds = round(time.monotonic() - started, 6)
+        self._file = open(self._segment_path(self._seq + 1), "ab")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_loop, name="task-journal-sync", daemon=True)
+        self._syncer.start()
+
+    def _lock_directory(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        fd = os.open(os.path.join(self.directory, self.LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # A POSIX record lock belongs to the process: reopening in the same process is allowed
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(f"Task journal {self.directory} is open in another process")
+        return fd
+
+    # Replay
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"journal-{first_seq:012d}.jsonl")
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".jsonl"):
+                segments.append((int(name[len("journal-"):-len(".jsonl")]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _replay(self) -> None:
+        snapshot_path = os.path.join(self.directory, self.SNAPSHOT)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as file:
+                snapshot = json.load(file)
+            self._tasks = snapshot["tasks"]
+            self._sections = snapshot["sections"]
+            self._seq = self._snapshot_seq = snapshot["seq"]
+        segments = self._segments()
+        for index, (_, path) in enumerate(segments):
+            last = index == len(segments) - 1
+            offset = 0
+            with open(path, "rb") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        if not last:
+                            raise
+                        event = None
+                    if event is None:
+                        # A write cut short by a crash; later appends must not follow the fragment
+                        with open(path, "r+b") as torn:
+                            torn.truncate(offset)
+                        break
+                    if not line.endswith(b"\n"):
+                        # Complete but missing its newline: keep it and terminate the line
+                        with open(path, "ab") as unterminated:
+                            unterminated.write(b"\n")
+                    offset += len(line)
+                    if event["seq"] > self._seq:
+                        self._apply(event)
+                        self._seq = event["seq"]
+                        self.replayed_events += 1
+        self._synced_seq = self._seq
+
+    # View
+
+    def _task(self, task_id: str) -> Dict[str, Any]:
+        task = self._tasks.setdefault(task_id, {"fields": {"TaskID": task_id}, "logs": []})
+        task["version"] = task.get("version", 0) + 1
+        return task
+
+    def _version(self, task_id: str) -> int:
+        task = self._tasks.get(task_id)
+        return task.get("version", 0) if task is not None else 0
+
+    def _apply(self, event: Dict[str, Any]) -> bool:
+        op = event["op"]
+        if op == "set":
+            task = self._task(event["task"])
+            for name, value in event["fields"].items():
+                if value is None:
+                    task["fields"].pop(name, None)
+                else:
+                    task["fields"][name] = value
+        elif op == "log":
+            if event["task"] not in self._tasks:
+                return False
+            self._task(event["task"])["logs"].append(event["text"])
+        elif op == "entry":
+            self._sections.setdefault(event["section"], []).append([event["tag"], event["text"], event["timestamp"]])
+        elif op == "results":
+            for task_id, status, result in event["results"]:
+                task = self._task(task_id)
+                task["fields"]["Status"] = status
+                task["fields"]["Result"] = result
+        elif op == "batch":
+            for batched in event["events"]:
+                self._apply(batched)
+        return True
+
+    def _record(self, events: List[Dict[str, Any]]) -> None:
+        """Append events to the journal as one line; call with _lock held and the events applied."""
+        self._seq += 1
+        event = events[0] if len(events) == 1 else {"op": "batch", "events": events}
+        event["seq"] = self._seq
+        self._file.write(json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n")
+        # Into the OS now, so a process crash loses nothing; fsync is batched by the syncer
+        self._file.flush()
+        self._unsynced_mutations += len(events)
+        self._wake.set()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            return {**task["fields"], "Logs": list(task["logs"])}
+
+    def has_task(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._tasks
+
+    def get_versioned(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        with self._lock:
+            return self.get_task(task_id), self._version(task_id)
+
+    @staticmethod
+    def _event(name: str, *args: Any) -> Dict[str, Any]:
+        if name == "set_fields":
+            task_id, fields = args
+            return {"op": "set", "task": task_id,
+                    "fields": {field: value for field, value in fields.items() if field != "TaskID"}}
+        if name == "append_log":
+            return {"op": "log", "task": args[0], "text": args[1]}
+        if name == "append_entry":
+            return dict(zip(("section", "tag", "text", "timestamp"), args), op="entry")
+        return {"op": "results", "results": [list(result) for result in args[0]]}
+
+    def apply(self, ops: List[Tuple[Any, ...]], sync: bool = False) -> List[Any]:
+        """Journal the mutations as one line, so replay applies all of them or none; `sync` fsyncs before returning."""
+        self._check(ops)
+        events: List[Dict[str, Any]] = []
+        results: List[Any] = []
+        with self._lock:
+            for name, *args in ops:
+                result = None
+                if name == "compare_and_set":
+                    task_id, expected_version, fields = args
+                    if self._version(task_id) != expected_version:
+                        results.append(False)
+                        continue
+                    # Journaled as the plain set it turned into, so replay does not decide again
+                    name, args, result = "set_fields", [task_id, fields], True
+                event = self._event(name, *args)
+                # Only a log for an unknown task is not applied; it is left out of the journal too
+                applied = self._apply(event)
+                if applied:
+                    events.append(event)
+                results.append(applied if name == "append_log" else result)
+            if events:
+                self._record(events)
+        if sync:
+            self.flush()
+        return results
+
+    # Durability
+
+    def _sync_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._stop.wait(self.sync_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if self._seq - self._snapshot_seq >= self.snapshot_every:
+                    self.snapshot()
+            except Exception as e:
+                print(f"Error syncing task journal in {self.directory}: {e}")
+
+    def flush(self) -> bool:
+        """fsync every event appended so far; returns True if there was anything to sync."""
+        with self._lock:
+            if self._synced_seq == self._seq:
+                return False
+            self._file.flush()
+            fd, seq = self._file.fileno(), self._seq
+            mutations, self._unsynced_mutations = self._unsynced_mutations, 0
+            # Appends continue while the fsync runs; they are covered by the next one
+            fd = os.dup(fd)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._synced_seq = max(self._synced_seq, seq)
+            self.fsyncs += 1
+        self.commit_stats.record(mutations)
+        return True
+
+    def snapshot(self) -> None:
+        """Write the view to snapshot.json and drop the journal segments it covers."""
+        with self._snapshot_lock:
+            with self._lock:
+                self.flush()
+                seq = self._seq
+                data = json.dumps({"seq": seq, "tasks": self._tasks, "sections": self._sections},
+                                  separators=(",", ":")).encode("utf-8")
+                # New events go to a fresh segment, so every older segment is covered by this snapshot
+                self._file.close()
+                self._file = open(self._segment_path(seq + 1), "ab")
+            _atomic_write(os.path.join(self.directory, self.SNAPSHOT), data)
+            for first_seq, path in self._segments():
+                if first_seq <= seq:
+                    os.unlink(path)
+            with self._lock:
+                self._snapshot_seq = seq
+                self.snapshots += 1
+
+    def close(self) -> None:
+        """Stop the syncer and snapshot, so the next start replays nothing."""
+        self._stop.set()
+        self._wake.set()
+        self._syncer.join(timeout=5)
+        self.snapshot()
+        with self._lock:
+            self._file.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'tasks': len(self._tasks),
+                'events': self._seq,
+                'unsynced_events': self._seq - self._synced_seq,
+                'events_since_snapshot': self._seq - self._snapshot_seq,
+                'fsyncs': self.fsyncs,
+                'snapshots': self.snapshots,
+                'replayed_events': self.replayed_events,
+                'replay_seconds': self.replay_seconds,
+                'commits': self.commit_stats.stats()
+            }
+
+class GroupCommitter:
+    """Merges mutations from concurrent callers into one durable commit.
+
+    `commit` blocks until its mutations are durable. Callers arriving within
+    `max_wait` seconds of each other share one `store.apply(..., sync=True)`,
+    so N concurrent requests cost one flush or fsync instead of N. If the
+    merged commit fails, each caller's mutations are retried on their own so
+    one bad request does not fail the others. A caller waits at most
+    `timeout` seconds and then gets a TimeoutError.
+    """
+
+    def __init__(self, store: TaskStore, max_wait: float = 0.002, max_batch_size: int = 256,
+                 timeout: Optional[float] = 30.0):
+        self.store = store
+        self._batcher = MicroBatcher(self._commit_many, max_batch_size=max_batch_size, max_wait=max_wait,
+                                     name="task-store-group-commit", result_timeout=timeout)
+
+    def _commit_many(self, batches: List[List[Tuple[Any, ...]]]) -> List[Any]:
+        try:
+            results = self.store.apply([op for ops in batches for op in ops], sync=True)
+        except Exception:
+            if len(batches) == 1:
+                raise
+            return [self._commit_one(ops) for ops in batches]
+        split = []
+        for ops in batches:
+            split.append(results[:len(ops)])
+            results = results[len(ops):]
+        return split
+
+    def _commit_one(self, ops: List[Tuple[Any, ...]]) -> Any:
+        try:
+            return self.store.apply(ops, sync=True)
+        except Exception as e:
+            return e
+
+    def commit(self, ops: List[Tuple[Any, ...]]) -> List[Any]:
+        """Apply mutations as part of the next group commit and return their results once durable."""
+        result = self._batcher.result(self._batcher.submit(list(ops)))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return self._batcher.stats()
+
+    def close(self) -> None:
+        self._batcher.close()
+
+def iter_xml_records(xml_path: str) -> Iterator[Tuple[str, Any]]:
+    """Stream ("task", record) and ("entry", (section, tag, text, timestamp)) items from a project XML file.
+
+    Uses iterparse and discards each element once read, so memory stays
+    flat however large the file is.
+    """
+    stack: List[ET.Element] = []
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if elem.tag == "Task":
+            record: Dict[str, Any] = {"Logs": []}
+            for child in elem:
+                if child.tag == "Log":
+                    record["Logs"].append(child.text)
+                else:
+                    record[child.tag] = child.text
+            if record.get("TaskID"):
+                yield "task", record
+        elif parent is not None and len(stack) == 2 and parent.tag in ("Errors", "Results"):
+            yield "entry", (parent.tag, elem.tag, elem.text, elem.findtext("Timestamp"))
+        else:
+            continue
+        elem.clear()
+        if parent is not None:
+            # Drop the finished element from its parent so the tree does not grow
+            parent.remove(elem)
+
+def migrate_xml(xml_path: str, store: SqliteTaskStore, batch_size: int = 1000) -> Dict[str, int]:
+    """Import a project XML file into a SQLite store in batches; returns how many tasks and entries moved."""
+    counts = {'tasks': 0, 'entries': 0}
+    tasks: List[Dict[str, Any]] = []
+    entries: List[Tuple[str, str, str, str]] = []
+    for kind, item in iter_xml_records(xml_path):
+        if kind == "task":
+            tasks.append(item)
+        else:
+            entries.append(item)
+        if len(tasks) + len(entries) >= batch_size:
+            store.import_records(tasks, entries)
+            counts['tasks'] += len(tasks)
+            counts['entries'] += len(entries)
+            tasks, entries = [], []
+    if tasks or entries:
+        store.import_records(tasks, entries)
+        counts['tasks'] += len(tasks)
+        counts['entries'] += len(entries)
+    return counts
+
+if __name__ == "__main__":
+    # python task_store.py migrate data/project_data.xml data/project_data.sqlite3
+    if len(sys.argv) != 4 or sys.argv[1] != "migrate":
+        print("usage: python task_store.py migrate <project_data.xml> <database.sqlite3>")
+        sys.exit(2)
+    started = time.monotonic()
+    sqlite_store = SqliteTaskStore(sys.argv[3])
+    migrated = migrate_xml(sys.argv[2], sqlite_store)
+    sqlite_store.close()
+    print(f"Migrated {migrated['tasks']} tasks and {migrated['entries']} entries "
+          f"in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,210 @@
+"""Tests for resumable bulk jobs."""
+
+import pytest
+import os
+import sys
+import json
+import asyncio
+import xml.etree.ElementTree as ET
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_jobs
+from bulk_jobs import BulkJob, LocalBatchBackend, OpenAIBatchBackend, read_items
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+async def echo(provider, prompt):
+    if "fail" in prompt:
+        raise Exception("Error calling OpenAI API: boom")
+    return f"{provider}: {prompt}"
+
+
+class FakeBackend:
+    """In-memory backend that finishes each batch on its second poll."""
+
+    def __init__(self):
+        self.submitted = []
+        self.polls = {}
+
+    def submit(self, items):
+        batch_id = f"batch-{len(self.submitted)}"
+        self.submitted.append((batch_id, items))
+        return batch_id
+
+    def poll(self, batch_id):
+        self.polls[batch_id] = self.polls.get(batch_id, 0) + 1
+        done = self.polls[batch_id] >= 2
+        return {"status": "completed" if done else "in_progress", "total": 1, "completed": int(done), "failed": 0}
+
+    def results(self, batch_id):
+        items = dict(self.submitted)[batch_id]
+        for item in items:
+            yield item["custom_id"], item["prompt"].upper(), None
+
+
+class TestReadItems:
+    """Test cases for JSONL input parsing."""
+
+    def test_requests_jsonl_format(self, tmp_path):
+        """Test that request_id/title/body lines become prompts."""
+        path = write_jsonl(tmp_path / "in.jsonl", [
+            {"request_id": "r1", "title": "Title", "body": "Body"},
+            {"prompt": "plain", "task_id": "t2"}
+        ])
+        items = read_items(path)
+
+        assert items[0] == {"custom_id": "r1", "task_id": "r1", "prompt": "Title\n\nBody"}
+        assert items[1]["custom_id"] == "line-2"
+        assert items[1]["task_id"] == "t2"
+
+    def test_duplicate_ids_are_rejected(self, tmp_path):
+        """Test that duplicate item ids fail fast."""
+        path = write_jsonl(tmp_path / "in.jsonl", [{"id": "a", "prompt": "x"}, {"id": "a", "prompt": "y"}])
+        with pytest.raises(ValueError, match="Duplicate"):
+            read_items(path)
+
+
+class TestBulkJob:
+    """Test cases for batching, polling, storing and resuming."""
+
+    def test_run_stores_results_in_batches(self, tmp_path):
+        """Test a job split into batches through to the task store."""
+        path = write_jsonl(tmp_path / "in.jsonl", [{"id": f"t{i}", "prompt": f"p{i}"} for i in range(5)])
+        backend = FakeBackend()
+        stored = []
+        job = BulkJob.create(path, "openai", job_id="job1", state_dir=str(tmp_path), max_batch_size=2,
+                             backend_impl=backend)
+        job.store = lambda rows: stored.extend(rows) or True
+
+        progress_reports = []
+        progress = job.run(poll_interval=0, on_progress=progress_reports.append)
+
+        assert len(backend.submitted) == 3
+        assert progress["done"] and progress["completed"] == 5
+        assert ("t0", "completed", "P0") in stored
+        assert progress_reports[0]["done"] is False
+
+    def test_resume_does_not_resubmit(self, tmp_path):
+        """Test that a crashed job resumes from its checkpoint."""
+        path = write_jsonl(tmp_path / "in.jsonl", [{"id": f"t{i}", "prompt": f"p{i}"} for i in range(4)])
+        backend = FakeBackend()
+        job = BulkJob.create(path, "openai", job_id="job2", state_dir=str(tmp_path), max_batch_size=2,
+                             backend_impl=backend)
+        job.store = lambda rows: True
+        job.step()  # submits both batches, first poll
+        assert len(backend.submitted) == 2
+
+        # Simulate a restart: a new process loads the same job id
+        resumed = BulkJob.create(path, "openai", job_id="job2", state_dir=str(tmp_path), backend_impl=backend)
+        resumed.store = lambda rows: True
+        progress = resumed.run(poll_interval=0)
+
+        assert len(backend.submitted) == 2
+        assert progress["completed"] == 4
+
+    def test_failed_store_is_retried_on_next_step(self, tmp_path):
+        """Test that a batch is not marked done when the store write fails."""
+        path = write_jsonl(tmp_path / "in.jsonl", [{"id": "t0", "prompt": "p0"}])
+        job = BulkJob.create(path, "openai", job_id="job3", state_dir=str(tmp_path), backend_impl=FakeBackend())
+        job.store = lambda rows: False
+        job.step()
+        with pytest.raises(Exception, match="Error storing results"):
+            job.step()
+        assert job.progress()["done"] is False
+
+    def test_results_written_to_xml_store(self, tmp_path):
+        """Test the default store writes task status and result into the XML file."""
+        xml_path = tmp_path / "project.xml"
+        path = write_jsonl(tmp_path / "in.jsonl", [{"id": "t0", "prompt": "p0"}])
+        with patch.dict(os.environ, {"XML_DATA_PATH": str(xml_path)}):
+            job = BulkJob.create(path, "openai", job_id="job4", state_dir=str(tmp_path), backend_impl=FakeBackend())
+            job.run(poll_interval=0)
+
+        task = ET.parse(xml_path).getroot().find(".//Task[TaskID='t0']")
+        assert task.findtext("Status") == "completed"
+        assert task.findtext("Result") == "P0"
+
+
+class TestLocalBatchBackend:
+    """Test cases for the local stand-in batch server."""
+
+    def wait_done(self, backend, batch_id):
+        for _ in range(200):
+            status = backend.poll(batch_id)
+            if status["status"] == "completed":
+                return status
+            asyncio.run(asyncio.sleep(0.01))
+        raise AssertionError("local batch did not finish")
+
+    def test_processes_items_with_per_item_errors(self, tmp_path):
+        """Test that the local backend answers every item and reports failures."""
+        backend = LocalBatchBackend("openai", str(tmp_path), concurrency=2, call=echo)
+        batch_id = backend.submit([
+            {"custom_id": "a", "prompt": "hello"},
+            {"custom_id": "b", "prompt": "please fail"}
+        ])
+        status = self.wait_done(backend, batch_id)
+
+        assert (status["completed"], status["failed"]) == (1, 1)
+        results = {custom_id: (response, error) for custom_id, response, error in backend.results(batch_id)}
+        assert results["a"] == ("openai: hello", None)
+        assert "boom" in results["b"][1]
+
+    def test_restart_skips_finished_items(self, tmp_path):
+        """Test that a restarted worker only processes items without output."""
+        calls = []
+
+        async def counting(provider, prompt):
+            calls.append(prompt)
+            return prompt
+
+        backend = LocalBatchBackend("openai", str(tmp_path), call=counting)
+        batch_dir = tmp_path / "local-crashed"
+        batch_dir.mkdir()
+        write_jsonl(batch_dir / "input.jsonl", [{"custom_id": "a", "prompt": "a"}, {"custom_id": "b", "prompt": "b"}])
+        # Output from before the crash, including a torn final line
+        (batch_dir / "output.jsonl").write_text(json.dumps({"custom_id": "a", "response": "a"}) + "\n{\"custom")
+
+        self.wait_done(backend, "local-crashed")
+        assert calls == ["b"]
+
+
+class TestOpenAIBatchBackend:
+    """Test cases for the OpenAI Batch API client."""
+
+    def test_results_parse_output_and_errors(self):
+        """Test parsing of successful and failed output lines."""
+        session = MagicMock()
+        session.get.side_effect = [
+            MagicMock(json=lambda: {"output_file_id": "file-out", "error_file_id": None}),
+            MagicMock(text="\n".join([
+                json.dumps({"custom_id": "a", "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": "answer"}}]}}}),
+                json.dumps({"custom_id": "b", "response": {"status_code": 400, "body": {
+                    "error": {"message": "bad"}}}})
+            ]))
+        ]
+        with patch("bulk_jobs.get_session", return_value=session):
+            results = list(OpenAIBatchBackend().results("batch_1"))
+
+        assert results[0] == ("a", "answer", None)
+        assert results[1][0] == "b" and "bad" in results[1][2]
+
+    def test_poll_maps_terminal_statuses(self):
+        """Test that expired batches count as finished."""
+        session = MagicMock()
+        session.get.return_value = MagicMock(json=lambda: {
+            "status": "expired", "request_counts": {"total": 3, "completed": 2, "failed": 0}
+        })
+        with patch("bulk_jobs.get_session", return_value=session):
+            status = OpenAIBatchBackend().poll("batch_1")
+
+        assert status["status"] == "failed"
+        assert status["completed"] == 2
@@ -0,0 +1,88 @@
+"""Parity tests for the optimized classifier backends."""
+
+import pytest
+import os
+import shutil
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from classifier_backends import build_inference_model, cached_onnx_model
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "task_classifier")
+
+TEXTS = [
+    "Create a new HTML page with interactive elements",
+    "Research HTML5 best practices and modern web standards",
+    "Fix the failing unit tests in the payment service",
+    "Compare OAuth2 providers and summarize pricing",
+    "Implement a REST endpoint that paginates task history",
+    "Find recent papers on retrieval augmented generation",
+    "Refactor the XML store",
+    "What are the tradeoffs of SQLite WAL mode?"
+]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return (AutoModelForSequenceClassification.from_pretrained(MODEL_DIR),
+            AutoTokenizer.from_pretrained(MODEL_DIR))
+
+
+def logits(inference_model, tokenizer):
+    inputs = tokenizer(TEXTS, return_tensors="pt", padding=True, truncation=True, max_length=512)
+    with torch.no_grad():
+        return inference_model(**inputs).logits
+
+
+def assert_logit_parity(reference, candidate, tolerance):
+    """Logits must stay within `tolerance` of the fp32 logit scale.
+
+    The bundled model's logit margins are far below any fixed label margin,
+    so comparing only confident labels would compare nothing; the tolerance
+    is relative to the largest fp32 logit so it scales with the model.
+    """
+    assert candidate.shape == reference.shape
+    assert torch.allclose(reference, candidate, rtol=0, atol=tolerance * reference.abs().max().item())
+
+
+class TestBackendParity:
+    """Test cases comparing each backend's logits to the fp32 torch model."""
+
+    def test_quantized_matches_torch(self, classifier):
+        model, tokenizer = classifier
+        reference = logits(model, tokenizer)
+        quantized = build_inference_model(
+            AutoModelForSequenceClassification.from_pretrained(MODEL_DIR), tokenizer, "quantized", MODEL_DIR
+        )
+        assert_logit_parity(reference, logits(quantized, tokenizer), tolerance=0.1)
+
+    def test_onnx_matches_torch(self, classifier, tmp_path):
+        pytest.importorskip("onnxruntime")
+        model, tokenizer = classifier
+        for name in os.listdir(MODEL_DIR):
+            if not name.endswith(".onnx"):
+                shutil.copy2(os.path.join(MODEL_DIR, name), tmp_path / name)
+        reference = logits(model, tokenizer)
+        onnx_model = build_inference_model(model, tokenizer, "onnx", str(tmp_path))
+        assert torch.allclose(reference, logits(onnx_model, tokenizer), atol=1e-4)
+        assert_logit_parity(reference, logits(
+            build_inference_model(model, tokenizer, "onnx-int8", str(tmp_path)), tokenizer
+        ), tolerance=0.1)
+
+    def test_onnx_export_is_cached(self, classifier, tmp_path):
+        pytest.importorskip("onnxruntime")
+        model, tokenizer = classifier
+        (tmp_path / "config.json").write_text("{}")
+        path = cached_onnx_model(model, tokenizer, str(tmp_path))
+        exported_at = os.path.getmtime(path)
+        assert cached_onnx_model(model, tokenizer, str(tmp_path)) == path
+        assert os.path.getmtime(path) == exported_at
+
+    def test_unknown_backend(self, classifier):
+        model, tokenizer = classifier
+        with pytest.raises(ValueError):
+            build_inference_model(model, tokenizer, "tensorrt", MODEL_DIR)
@@ -0,0 +1,104 @@
+"""Tests for classifier micro-batching."""
+
+import pytest
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier_batching import MicroBatcher
+
+
+class TestMicroBatcher:
+    """Test cases for grouping concurrent calls into batches."""
+
+    def test_concurrent_calls_share_a_batch(self):
+        """Test that calls arriving within max_wait run in one batch call."""
+        calls = []
+
+        def batch_fn(items):
+            calls.append(list(items))
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait=0.2)
+        futures = batcher.map(["a", "b", "c"])
+        assert [future.result(timeout=2) for future in futures] == ["A", "B", "C"]
+        assert calls == [["a", "b", "c"]]
+        batcher.close()
+
+    def test_max_batch_size(self):
+        """Test that batches are cut at max_batch_size."""
+        sizes = []
+
+        def batch_fn(items):
+            sizes.append(len(items))
+            return items
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait=0.05)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda n: batcher.submit(n).result(timeout=2), range(5)))
+        assert results == list(range(5))
+        assert max(sizes) <= 2
+        assert batcher.stats()["items"] == 5
+        batcher.close()
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failing batch fails each of its futures."""
+        release = threading.Event()
+
+        def batch_fn(items):
+            release.wait(2)
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(batch_fn, max_wait=0.05)
+        futures = batcher.map(["a", "b"])
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model failed"):
+                future.result(timeout=2)
+        batcher.close()
+
+    def test_system_exit_fails_the_batch_without_stopping_the_thread(self):
+        """Test that a BaseException from the batch function fails its futures and later batches still run."""
+        calls = []
+
+        def batch_fn(items):
+            calls.append(items)
+            if len(calls) == 1:
+                raise SystemExit("download failed")
+            return items
+
+        batcher = MicroBatcher(batch_fn, result_timeout=2)
+        with pytest.raises(RuntimeError, match="download failed"):
+            batcher.result(batcher.submit("a"))
+        assert batcher.result(batcher.submit("b")) == "b"
+        batcher.close()
+
+    def test_result_wait_is_bounded(self):
+        """Test that a caller stops waiting after result_timeout and its unstarted item is dropped."""
+        release = threading.Event()
+        seen = []
+
+        def batch_fn(items):
+            seen.extend(items)
+            release.wait(2)
+            return items
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=1, result_timeout=0.05)
+        first, second = batcher.submit("a"), batcher.submit("b")
+        with pytest.raises(TimeoutError):
+            batcher.result(first)
+        with pytest.raises(TimeoutError):
+            batcher.result(second)
+        release.set()
+        batcher.close()
+        assert seen == ["a"]
+
+    def test_closed_batcher_rejects_work(self):
+        batcher = MicroBatcher(lambda items: items)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit("a")
@@ -0,0 +1,77 @@
+"""Tests for memoized task classifications."""
+
+import pytest
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier_cache import ClassificationCache, normalize_description
+
+
+class CountingModel:
+    def __init__(self, category="coding"):
+        self.category = category
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [self.category] * len(texts)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    (tmp_path / "config.json").write_text("{}")
+    (tmp_path / "model.safetensors").write_bytes(b"v1")
+    return tmp_path
+
+
+class TestNormalization:
+    def test_case_and_surrounding_whitespace_match(self):
+        assert normalize_description("  Build a LOGIN page\n") == normalize_description("build a login page")
+
+    def test_differences_the_tokenizer_sees_keep_separate_keys(self):
+        base = normalize_description("build a login page")
+        assert normalize_description("build a login page.") != base
+        assert normalize_description("build a  login page") != base
+        assert normalize_description("build a ｌｏｇｉｎ page") != base
+
+
+class TestClassificationCache:
+    """Test cases for hits, persistence and invalidation."""
+
+    def test_hits_skip_the_model(self, model_dir):
+        model = CountingModel()
+        cache = ClassificationCache(str(model_dir))
+        assert cache.get_or_classify(["Build a page", "build a page "], model) == ["coding", "coding"]
+        assert cache.get_or_classify(["BUILD A PAGE"], model) == ["coding"]
+        assert model.calls == [["Build a page"]]
+        assert cache.stats()["hits"] == 1
+
+    def test_failures_are_not_cached(self, model_dir):
+        cache = ClassificationCache(str(model_dir))
+        assert cache.get_or_classify(["x"], lambda texts: [None]) == [None]
+        assert cache.get_or_classify(["x"], CountingModel("research")) == ["research"]
+
+    def test_persists_across_restarts(self, model_dir, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        ClassificationCache(str(model_dir), path=path).get_or_classify(["Survey ORMs"], CountingModel("research"))
+        model = CountingModel()
+        assert ClassificationCache(str(model_dir), path=path).get_or_classify(["Survey ORMs"], model) == ["research"]
+        assert model.calls == []
+
+    def test_model_change_invalidates(self, model_dir):
+        cache = ClassificationCache(str(model_dir), check_interval=0)
+        cache.get_or_classify(["Build a page"], CountingModel("coding"))
+        time.sleep(0.01)
+        (model_dir / "model.safetensors").write_bytes(b"v2-retrained")
+
+        model = CountingModel("research")
+        assert cache.get_or_classify(["Build a page"], model) == ["research"]
+        assert model.calls == [["Build a page"]]
+        assert cache.stats()["invalidations"] == 1
+
+    def test_disabled_by_config(self, model_dir):
+        assert ClassificationCache.from_config({"enabled": False}, str(model_dir)) is None
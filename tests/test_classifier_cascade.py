@@ -0,0 +1,76 @@
+"""Tests for the cheap first-stage classifier cascade."""
+
+import pytest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier_cascade import ClassifierCascade, HashedLinearModel, CODING, RESEARCH
+
+
+class FakeTransformer:
+    def __init__(self, category="research"):
+        self.category = category
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [self.category] * len(texts)
+
+
+class TestHashedLinearModel:
+    """Test cases for the linear stage."""
+
+    def test_learns_and_round_trips(self, tmp_path):
+        model = HashedLinearModel(n_features=1024)
+        model.fit([("write the parser", CODING), ("read about parsers", RESEARCH)])
+        assert model.predict("write the parser") > 0.5 > model.predict("read about parsers")
+
+        path = str(tmp_path / "weights.json")
+        model.save(path)
+        restored = HashedLinearModel(n_features=1024)
+        assert restored.load(path)
+        assert restored.predict("write the parser") == pytest.approx(model.predict("write the parser"))
+        assert not HashedLinearModel(n_features=2048).load(path)
+
+
+class TestClassifierCascade:
+    """Test cases for stage selection and metrics."""
+
+    def test_keyword_stage(self):
+        fallback = FakeTransformer()
+        cascade = ClassifierCascade(fallback)
+        result = cascade.classify("Implement the endpoint and fix the failing tests")
+        assert result == {"category": "coding", "stage": "keywords", "confidence": 1.0}
+        assert fallback.calls == []
+
+    def test_low_confidence_goes_to_transformer(self):
+        """Test the threshold and that transformer answers train the linear stage."""
+        fallback = FakeTransformer("research")
+        cascade = ClassifierCascade(fallback, threshold=0.999)
+        text = "Look into the quarterly numbers"
+        before = cascade.model.predict(text)
+
+        result = cascade.classify(text)
+        assert result["stage"] == "transformer"
+        assert result["category"] == "research"
+        assert fallback.calls == [[text]]
+        assert cascade.model.predict(text) < before
+
+    def test_batch_only_sends_uncertain_inputs(self):
+        fallback = FakeTransformer("coding")
+        cascade = ClassifierCascade(fallback, threshold=0.999, learn=False)
+        results = cascade.classify_many(["Research and compare vector databases", "Tidy up things"])
+        assert [result["stage"] for result in results] == ["keywords", "transformer"]
+        assert fallback.calls == [["Tidy up things"]]
+
+        stats = cascade.stats()
+        assert stats["total"] == 2
+        assert stats["stages"]["keywords"]["share"] == 0.5
+
+    def test_disabled_cascade_always_uses_transformer(self):
+        fallback = FakeTransformer("coding")
+        cascade = ClassifierCascade.from_config({"enabled": False}, fallback)
+        assert cascade.classify("Fix the bug in the function")["stage"] == "transformer"
@@ -0,0 +1,120 @@
+"""Tests for the LLM response cache."""
+
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import ResponseCache, make_cache_key, normalize_messages
+
+
+class TestCacheKey:
+    """Test cases for cache key construction."""
+
+    def test_normalized_messages_share_key(self):
+        """Test that whitespace-only differences map to the same key."""
+        first = make_cache_key("openai", "gpt", [{"role": "user", "content": "hello\r\n"}], {"temperature": 0})
+        second = make_cache_key("openai", "gpt", [{"role": "user", "content": "  hello"}], {"temperature": 0})
+        assert first == second
+
+    def test_key_depends_on_provider_model_and_params(self):
+        """Test that provider, model and sampling params are part of the key."""
+        messages = [{"role": "user", "content": "hello"}]
+        base = make_cache_key("openai", "gpt", messages, {"temperature": 0})
+        assert base != make_cache_key("deepseek", "gpt", messages, {"temperature": 0})
+        assert base != make_cache_key("openai", "other", messages, {"temperature": 0})
+        assert base != make_cache_key("openai", "gpt", messages, {"temperature": 0, "max_tokens": 5})
+
+    def test_normalize_messages_keeps_structure(self):
+        """Test that non-string content is passed through untouched."""
+        blocks = [{"type": "text", "text": "hi"}]
+        assert normalize_messages([{"role": "user", "content": blocks}]) == [{"role": "user", "content": blocks}]
+
+
+class TestResponseCache:
+    """Test cases for the two-tier response cache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test basic get/set with hit and miss accounting."""
+        cache = ResponseCache()
+        assert cache.get("k") is None
+        cache.set("k", "value")
+        assert cache.get("k") == "value"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.stats()["evictions"] == 1
+
+    def test_eviction_by_bytes(self):
+        """Test that the memory tier stays within its byte budget."""
+        cache = ResponseCache(max_bytes=10)
+        cache.set("a", "x" * 6)
+        cache.set("b", "y" * 6)
+
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] == 6
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = ResponseCache(ttl=10)
+        with patch('llm_cache.time.time', return_value=1000.0):
+            cache.set("k", "value")
+        with patch('llm_cache.time.time', return_value=1011.0):
+            assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_persistent_tier_survives_restart(self):
+        """Test that the SQLite tier serves entries to a fresh cache."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "cache", "llm.sqlite3")
+            ResponseCache(path=path).set("k", "persisted")
+
+            reopened = ResponseCache(path=path)
+            assert reopened.get("k") == "persisted"
+            assert reopened.stats()["disk_hits"] == 1
+            # Promoted into memory, so the next read is a memory hit
+            assert reopened.get("k") == "persisted"
+            assert reopened.stats()["hits"] == 1
+
+    def test_reopen_keeps_disk_entries(self):
+        """Test that a forked worker's fresh connection sees the same SQLite tier."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(path=os.path.join(temp_dir, "llm.sqlite3"))
+            cache.set("k", "v")
+            cache.reopen()
+            cache._entries.clear()
+            assert cache.get("k") == "v"
+            assert cache.stats()["disk_hits"] == 1
+
+    def test_persistent_tier_is_bounded(self):
+        """Test that the SQLite tier evicts the least recently used rows."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(path=os.path.join(temp_dir, "llm.sqlite3"), max_disk_entries=2)
+            for index, key in enumerate(["a", "b", "c"]):
+                with patch('llm_cache.time.time', return_value=1000.0 + index):
+                    cache.set(key, key)
+            assert cache.stats()["disk_entries"] == 2
+
+    def test_from_config(self):
+        """Test building a cache from the llm.cache settings."""
+        cache = ResponseCache.from_config({"max_entries": 3, "ttl_seconds": 5, "persist_path": ""})
+        assert cache.max_entries == 3
+        assert cache.ttl == 5
+        assert cache.stats()["persistent"] is False
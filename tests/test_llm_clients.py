@@ -0,0 +1,546 @@
+"""Tests for the pooled async LLM provider layer."""
+
+import pytest
+import os
+import sys
+import json
+import asyncio
+import httpx
+import requests
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_integration
+from llm_resilience import BreakerRegistry, CircuitOpenError
+from llm_integration import (
+    acall_openai, acall_anthropic, acall_deepseek, get_async_client, aclose_clients,
+    astream_openai, astream_anthropic, astream_deepseek
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    llm_integration.response_cache.clear()
+    # Fresh breakers per test and no real backoff sleeps
+    with patch.object(llm_integration, 'breakers', BreakerRegistry()), \
+            patch.object(llm_integration.retry_policy, 'base_delay', 0.0):
+        yield
+    llm_integration.response_cache.clear()
+
+
+def mock_client(handler):
+    """Build an AsyncClient that answers every request with `handler`."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def sync_response(status_code, body):
+    """Build a requests.Response as the pooled sync session would return it."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    response.url = llm_integration.ANTHROPIC_URL
+    return response
+
+
+def chat_completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+class TestLLMClients:
+    """Test cases for the async provider functions and client pool."""
+
+    @pytest.mark.asyncio
+    async def test_acall_openai_success(self):
+        """Test OpenAI response parsing."""
+        seen = {}
+
+        def handler(request):
+            seen["url"] = str(request.url)
+            return chat_completion("openai answer")
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            result = await acall_openai("Say this is a test!")
+
+        assert result == "openai answer"
+        assert seen["url"] == llm_integration.OPENAI_URL
+
+    @pytest.mark.asyncio
+    async def test_acall_anthropic_success(self):
+        """Test Anthropic messages response parsing."""
+        def handler(request):
+            return httpx.Response(200, json={"content": [
+                {"type": "text", "text": "Because "},
+                {"type": "text", "text": "of minerals."}
+            ]})
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            result = await acall_anthropic("Why is the ocean salty?")
+
+        assert result == "Because of minerals."
+
+    @pytest.mark.asyncio
+    async def test_acall_deepseek_http_error(self):
+        """Test that provider HTTP errors are wrapped."""
+        def handler(request):
+            return httpx.Response(503, json={"error": "unavailable"})
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            with pytest.raises(Exception, match="Error calling DeepSeek API"):
+                await acall_deepseek("Hello!")
+
+    @pytest.mark.asyncio
+    async def test_provider_error_carries_status(self):
+        """Test that HTTP failures keep the upstream status code."""
+        def handler(request):
+            return httpx.Response(429)
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            with pytest.raises(llm_integration.ProviderError) as excinfo:
+                await acall_openai("Hello!")
+
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.provider == "openai"
+
+    @pytest.mark.asyncio
+    async def test_calls_pass_through_provider_limiter(self):
+        """Test that upstream calls take a slot from the provider limiter."""
+        limiter = llm_integration.limiters.get("deepseek")
+        before = limiter.concurrency.limit
+
+        def handler(request):
+            return httpx.Response(503)
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            with pytest.raises(llm_integration.ProviderError):
+                await acall_deepseek("Hello!")
+
+        assert limiter.snapshot()["throttled"] >= 1
+        assert limiter.concurrency.limit <= before
+
+    def test_sync_calls_pass_through_provider_limiter(self):
+        """Test that the synchronous provider functions take the same limiter slot."""
+        limiter = llm_integration.limiters.get("openai")
+        before = limiter.snapshot()["throttled"]
+        error = llm_integration.ProviderError("Error calling OpenAI API: 429", "openai", 429)
+
+        with patch('llm_integration._post_chat_completion', side_effect=error), \
+                patch.object(llm_integration.retry_policy, 'max_attempts', 1):
+            with pytest.raises(llm_integration.ProviderError):
+                llm_integration.call_openai("Hello!", use_cache=False)
+
+        assert limiter.snapshot()["throttled"] == before + 1
+        assert limiter.snapshot()["in_flight"] == 0
+
+    def test_sync_anthropic_uses_pooled_session_and_messages_api(self):
+        """Test that call_anthropic posts the Messages payload through the shared session."""
+        session = MagicMock()
+        session.post.return_value = sync_response(200, {"content": [{"type": "text", "text": "Hi there"}]})
+
+        with patch('llm_integration.get_session', return_value=session) as mock_get_session:
+            assert llm_integration.call_anthropic("Hello!", use_cache=False, role="coder") == "Hi there"
+
+        mock_get_session.assert_called_with("anthropic")
+        url, = session.post.call_args.args
+        assert url == llm_integration.ANTHROPIC_URL
+        assert session.post.call_args.kwargs["json"] == llm_integration._anthropic_payload("Hello!", "coder")
+
+    def test_sync_anthropic_retries_server_errors(self):
+        """Test that a sync Anthropic 5xx is a retryable ProviderError that counts against the breaker."""
+        session = MagicMock()
+        session.post.side_effect = [
+            sync_response(529, {"type": "error", "error": {"type": "overloaded_error"}}),
+            sync_response(200, {"content": [{"type": "text", "text": "recovered"}]})
+        ]
+
+        with patch('llm_integration.get_session', return_value=session):
+            assert llm_integration.call_anthropic("Hello!", use_cache=False) == "recovered"
+
+        assert session.post.call_count == 2
+        breaker = llm_integration.breakers.get("anthropic").snapshot()
+        assert breaker["calls_in_window"] == 2
+        assert breaker["failure_rate"] == 0.5
+
+    def test_sync_anthropic_error_carries_status(self):
+        """Test that a sync Anthropic client error is raised as a ProviderError with its status."""
+        session = MagicMock()
+        session.post.return_value = sync_response(400, {"type": "error"})
+
+        with patch('llm_integration.get_session', return_value=session):
+            with pytest.raises(llm_integration.ProviderError) as raised:
+                llm_integration.call_anthropic("Hello!", use_cache=False)
+
+        assert raised.value.status_code == 400
+        assert session.post.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_get_async_client_is_reused(self):
+        """Test that a provider gets one long-lived client per event loop."""
+        first = get_async_client("openai")
+        second = get_async_client("openai")
+        assert first is second
+        assert get_async_client("deepseek") is not first
+
+        await aclose_clients()
+        assert first.is_closed
+        assert get_async_client("openai") is not first
+        await aclose_clients()
+
+    def test_clients_close_with_their_event_loop(self):
+        """Test that a new event loop gets its own client and the old loop's client is closed, not leaked."""
+        async def open_client():
+            return get_async_client("openai")
+
+        first = asyncio.run(open_client())
+        assert first.is_closed
+        second = asyncio.run(open_client())
+        assert second is not first and second.is_closed
+        # The finished first loop's entry was dropped when the second loop created its client
+        pooled = [client for client, _ in llm_integration._async_clients.values()]
+        assert first not in pooled and second in pooled
+
+    @pytest.mark.asyncio
+    async def test_get_async_client_uses_config(self):
+        """Test that pool limits and timeouts come from the llm.http config."""
+        settings = {"max_connections": 7, "connect_timeout": 2, "read_timeout": 9, "http2": False}
+        with patch.dict(llm_integration.config, {"llm": {"http": settings}}):
+            await aclose_clients()
+            client = get_async_client("anthropic")
+
+        assert client.timeout.connect == 2
+        assert client.timeout.read == 9
+        assert client.headers["anthropic-version"] == llm_integration.ANTHROPIC_VERSION
+        await aclose_clients()
+
+
+def sse_body(*events):
+    return "".join(f"data: {event}\n\n" for event in events).encode()
+
+
+class TestLLMStreaming:
+    """Test cases for the provider token streams."""
+
+    @pytest.mark.asyncio
+    async def test_astream_openai_yields_deltas(self):
+        """Test that OpenAI chunks are yielded as they are parsed."""
+        seen = {}
+
+        def handler(request):
+            seen["body"] = request.content
+            return httpx.Response(200, content=sse_body(
+                '{"choices": [{"delta": {"role": "assistant"}}]}',
+                '{"choices": [{"delta": {"content": "Hel"}}]}',
+                '{"choices": [{"delta": {"content": "lo"}}]}',
+                '[DONE]'
+            ))
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            chunks = [chunk async for chunk in astream_openai("hi")]
+
+        assert chunks == ["Hel", "lo"]
+        assert json.loads(seen["body"])["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_astream_anthropic_yields_text_deltas(self):
+        """Test that Anthropic content_block_delta events are yielded."""
+        def handler(request):
+            return httpx.Response(200, content=sse_body(
+                '{"type": "message_start"}',
+                '{"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Salt "}}',
+                '{"type": "content_block_delta", "delta": {"type": "text_delta", "text": "water"}}',
+                '{"type": "message_stop"}'
+            ))
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            chunks = [chunk async for chunk in astream_anthropic("hi")]
+
+        assert chunks == ["Salt ", "water"]
+
+    @pytest.mark.asyncio
+    async def test_astream_deepseek_http_error(self):
+        """Test that streaming HTTP errors are wrapped."""
+        def handler(request):
+            return httpx.Response(429)
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            with pytest.raises(Exception, match="Error calling DeepSeek API"):
+                [chunk async for chunk in astream_deepseek("hi")]
+
+
+class TestLLMResponseCaching:
+    """Test cases for response caching in the provider functions."""
+
+    @pytest.mark.asyncio
+    async def test_deterministic_call_is_cached(self):
+        """Test that temperature 0 Anthropic calls are served from the cache."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"content": [{"type": "text", "text": "cached"}]})
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            assert await acall_anthropic("same prompt") == "cached"
+            assert await acall_anthropic("same prompt ") == "cached"
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_sampled_call_is_not_cached_by_default(self):
+        """Test that temperature 0.7 OpenAI calls always go upstream."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return chat_completion("fresh")
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            await acall_openai("same prompt")
+            await acall_openai("same prompt")
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_use_cache_false_bypasses(self):
+        """Test that callers can bypass the cache."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"content": [{"type": "text", "text": "x"}]})
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            await acall_anthropic("same prompt")
+            await acall_anthropic("same prompt", use_cache=False)
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_completed_stream_is_cached(self):
+        """Test that a fully streamed answer is replayed from the cache."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, content=sse_body(
+                '{"type": "content_block_delta", "delta": {"text": "a"}}',
+                '{"type": "content_block_delta", "delta": {"text": "b"}}',
+                '{"type": "message_stop"}'
+            ))
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            first = [chunk async for chunk in astream_anthropic("stream me")]
+            second = [chunk async for chunk in astream_anthropic("stream me")]
+
+        assert first == ["a", "b"]
+        assert second == ["ab"]
+        assert len(calls) == 1
+
+
+class TestLLMCoalescing:
+    """Test cases for coalescing identical in-flight provider calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_calls_share_upstream(self):
+        """Test that a burst of identical prompts makes one upstream request."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return chat_completion("shared")
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            results = await asyncio.gather(*[acall_openai("burst prompt") for _ in range(4)])
+
+        assert results == ["shared"] * 4
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_coalescing_can_be_disabled(self):
+        """Test the llm.coalesce.enabled switch."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return chat_completion("separate")
+
+        with patch.dict(llm_integration.config, {"llm": {"coalesce": {"enabled": False}}}):
+            with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+                await asyncio.gather(*[acall_openai("burst prompt") for _ in range(3)])
+
+        assert len(calls) == 3
+
+
+class TestLLMRetries:
+    """Test cases for retries and per-provider circuit breakers."""
+
+    @pytest.mark.asyncio
+    async def test_retryable_status_is_retried(self):
+        """Test that a 503 followed by a success returns the success."""
+        statuses = [503, 200]
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            status = statuses.pop(0)
+            return chat_completion("recovered") if status == 200 else httpx.Response(status)
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            result = await acall_openai("flaky")
+
+        assert result == "recovered"
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_client_error_is_not_retried(self):
+        """Test that a 400 fails on the first attempt."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400)
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            with pytest.raises(llm_integration.ProviderError):
+                await acall_openai("bad request")
+
+        assert len(calls) == 1
+        assert llm_integration.breakers.get("openai").snapshot()["calls_in_window"] == 0
+
+    @pytest.mark.asyncio
+    async def test_attempt_timeout_is_retried(self):
+        """Test that a hung attempt is cut off and retried."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return chat_completion("second try")
+
+        with patch.object(llm_integration.retry_policy, 'attempt_timeout', 0.05):
+            with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+                result = await acall_deepseek("slow")
+
+        assert result == "second try"
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_fast(self):
+        """Test that repeated failures open the breaker and later calls skip the provider."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(500)
+
+        registry = BreakerRegistry({"min_calls": 3, "window": 3, "open_seconds": 60})
+        with patch.object(llm_integration, 'breakers', registry):
+            with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+                with pytest.raises(llm_integration.ProviderError):
+                    await acall_anthropic("first", use_cache=False)
+                attempts = len(calls)
+                with pytest.raises(CircuitOpenError):
+                    await acall_anthropic("second", use_cache=False)
+
+        assert attempts == 3
+        assert len(calls) == attempts
+        assert registry.is_open("anthropic")
+
+    @pytest.mark.asyncio
+    async def test_stream_retries_before_first_chunk(self):
+        """Test that a stream failing before any output is retried."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(502)
+            return httpx.Response(200, content=sse_body(
+                json.dumps({"choices": [{"delta": {"content": "ok"}}]}), "[DONE]"
+            ))
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            chunks = [chunk async for chunk in astream_openai("stream")]
+
+        assert chunks == ["ok"]
+        assert len(calls) == 2
+
+
+class TestRolePrompts:
+    """Test cases for role system prefixes and provider prompt caching."""
+
+    @pytest.fixture(autouse=True)
+    def roles(self):
+        llm_integration.prefix_stats.clear()
+        roles = {"pm": {"name": "Project Manager", "description": "Coordinates requirements"}}
+        with patch.dict(llm_integration.config, {"roles": roles}):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_anthropic_role_prefix_is_cache_controlled(self):
+        """Test that the role text goes in a cache_control system block and usage is tracked."""
+        seen = {}
+
+        def handler(request):
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, json={
+                "content": [{"type": "text", "text": "plan"}],
+                "usage": {"input_tokens": 12, "cache_read_input_tokens": 1024, "cache_creation_input_tokens": 0}
+            })
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            await acall_anthropic("Plan the sprint", role="pm")
+
+        system = seen["body"]["system"]
+        assert system[0]["cache_control"] == {"type": "ephemeral"}
+        assert system[0]["text"].startswith("You are the Project Manager")
+        stats = llm_integration.prefix_stats.snapshot()["anthropic:pm"]
+        assert stats["prefix_hits"] == 1
+        assert stats["cached_tokens"] == 1024
+
+    @pytest.mark.asyncio
+    async def test_openai_system_message_comes_first(self):
+        """Test that the stable prefix precedes the user prompt."""
+        seen = {}
+
+        def handler(request):
+            seen["body"] = json.loads(request.content)
+            return chat_completion("ok")
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            await acall_openai("Plan the sprint", role="pm")
+
+        assert [message["role"] for message in seen["body"]["messages"]] == ["system", "user"]
+
+    def test_deepseek_default_system_prompt_unchanged(self):
+        """Test that calls without a role keep the generic system message."""
+        payload = llm_integration.provider_payload("deepseek", "hi")
+        assert payload["messages"][0] == {"role": "system", "content": "You are a helpful assistant."}
+
+    def test_role_changes_cache_key(self):
+        """Test that different roles never share a cached completion."""
+        with_role = llm_integration._request_key("anthropic", llm_integration.provider_payload("anthropic", "hi", "pm"))
+        without_role = llm_integration._request_key("anthropic", llm_integration.provider_payload("anthropic", "hi"))
+        assert with_role != without_role
+
+    @pytest.mark.asyncio
+    async def test_stream_records_ttft_and_usage(self):
+        """Test that Anthropic streams record message_start usage and TTFT."""
+        def handler(request):
+            return httpx.Response(200, content=sse_body(
+                json.dumps({"type": "message_start", "message": {"usage": {
+                    "input_tokens": 5, "cache_read_input_tokens": 2048}}}),
+                json.dumps({"type": "content_block_delta", "delta": {"text": "Hi"}}),
+                json.dumps({"type": "message_stop"})
+            ))
+
+        with patch('llm_integration.get_async_client', return_value=mock_client(handler)):
+            chunks = [chunk async for chunk in astream_anthropic("stream please", role="pm")]
+
+        assert chunks == ["Hi"]
+        stats = llm_integration.prefix_stats.snapshot()["anthropic:pm"]
+        assert stats["avg_ttft_hit"] is not None
@@ -0,0 +1,195 @@
+"""Tests for provider rate limiting and adaptive concurrency."""
+
+import pytest
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_limits import TokenBucket, AIMDLimiter, ProviderLimiter, LimiterRegistry
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestTokenBucket:
+    """Test cases for the token bucket."""
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_for_refill(self):
+        """Test that an empty bucket delays the next caller until it refills."""
+        bucket = TokenBucket(rate_per_minute=1200, capacity=1)  # 20 tokens/s
+        await bucket.acquire()
+        started = time.monotonic()
+        await bucket.acquire()
+        assert time.monotonic() - started >= 0.04
+
+    @pytest.mark.asyncio
+    async def test_oversized_request_is_clamped(self):
+        """Test that a request larger than the bucket does not wait forever."""
+        bucket = TokenBucket(rate_per_minute=60000, capacity=10)
+        await asyncio.wait_for(bucket.acquire(50), timeout=1)
+        assert bucket.available() < 10
+
+    def test_sync_and_async_callers_share_tokens(self):
+        """Test that a blocking acquire draws on the tokens async callers use."""
+        bucket = TokenBucket(rate_per_minute=1200, capacity=1)  # 20 tokens/s
+        bucket.acquire_sync()
+        started = time.monotonic()
+        asyncio.run(bucket.acquire())
+        assert time.monotonic() - started >= 0.04
+
+
+class TestAIMDLimiter:
+    """Test cases for additive-increase/multiplicative-decrease concurrency."""
+
+    @pytest.mark.asyncio
+    async def test_overload_halves_limit_once_per_cooldown(self):
+        """Test multiplicative decrease with a cooldown between decreases."""
+        limiter = AIMDLimiter(initial=8, cooldown=60)
+        for _ in range(3):
+            await limiter.acquire()
+        for _ in range(3):
+            await limiter.release(True)
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_success_increases_limit_up_to_max(self):
+        """Test additive increase capped at the maximum."""
+        limiter = AIMDLimiter(initial=2, max_limit=3)
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(False)
+        assert limiter.limit == 3
+
+    @pytest.mark.asyncio
+    async def test_no_signal_leaves_limit_unchanged(self):
+        """Test that client errors neither grow nor shrink the limit."""
+        limiter = AIMDLimiter(initial=4)
+        await limiter.acquire()
+        await limiter.release(None)
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_acquire_blocks_at_limit(self):
+        """Test that callers queue once the limit is reached."""
+        limiter = AIMDLimiter(initial=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        assert limiter.waiting == 1
+
+        await limiter.release(False)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert limiter.in_flight == 1
+
+
+class TestProviderLimiter:
+    """Test cases for the combined per-provider limiter."""
+
+    @pytest.mark.asyncio
+    async def test_429_backs_off_concurrency(self):
+        """Test that an overload status shrinks the concurrency limit."""
+        limiter = ProviderLimiter(initial_concurrency=8)
+        with pytest.raises(StatusError):
+            async with limiter.slot():
+                raise StatusError(429)
+
+        snapshot = limiter.snapshot()
+        assert snapshot["concurrency_limit"] == 4
+        assert snapshot["throttled"] == 1
+        assert snapshot["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_client_error_does_not_back_off(self):
+        """Test that a 400 is not treated as an overload signal."""
+        limiter = ProviderLimiter(initial_concurrency=8)
+        with pytest.raises(StatusError):
+            async with limiter.slot():
+                raise StatusError(400)
+        assert limiter.snapshot()["concurrency_limit"] == 8
+
+    @pytest.mark.asyncio
+    async def test_queue_depth_is_reported(self):
+        """Test that callers waiting for a slot show up as queue depth."""
+        limiter = ProviderLimiter(initial_concurrency=1, max_concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(hold()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert limiter.snapshot()["in_flight"] == 1
+        assert limiter.snapshot()["queue_depth"] == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert limiter.snapshot()["queue_depth"] == 0
+
+    def test_sync_slot_backs_off_on_429(self):
+        """Test that the blocking slot feeds overloads back like the async one."""
+        limiter = ProviderLimiter(initial_concurrency=8)
+        with pytest.raises(StatusError):
+            with limiter.slot_sync():
+                raise StatusError(429)
+
+        snapshot = limiter.snapshot()
+        assert snapshot["concurrency_limit"] == 4
+        assert snapshot["throttled"] == 1
+        assert snapshot["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sync_release_wakes_async_waiter(self):
+        """Test that a slot held by a thread blocks async callers until the thread releases it."""
+        limiter = ProviderLimiter(initial_concurrency=1, max_concurrency=1)
+        entered, release = threading.Event(), threading.Event()
+
+        def hold():
+            with limiter.slot_sync():
+                entered.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        entered.wait()
+        waiter = asyncio.ensure_future(limiter.concurrency.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        release.set()
+        await asyncio.wait_for(waiter, timeout=1)
+        thread.join()
+        assert limiter.snapshot()["in_flight"] == 1
+
+
+class TestLimiterRegistry:
+    """Test cases for config-driven limiter construction."""
+
+    def test_provider_settings_override_default(self):
+        """Test that provider sections override the default section."""
+        registry = LimiterRegistry({
+            "default": {"requests_per_minute": 500, "max_concurrency": 64},
+            "anthropic": {"requests_per_minute": 50}
+        })
+        anthropic = registry.get("anthropic").snapshot()
+        openai = registry.get("openai").snapshot()
+
+        assert anthropic["requests_per_minute"] == 50
+        assert openai["requests_per_minute"] == 500
+        assert set(registry.snapshot()) == {"anthropic", "openai"}
+
+    def test_limits_are_optional(self):
+        """Test that a provider without limits only gets concurrency control."""
+        snapshot = LimiterRegistry().get("openai").snapshot()
+        assert snapshot["requests_per_minute"] is None
+        assert snapshot["tokens_per_minute"] is None
@@ -0,0 +1,71 @@
+"""Tests for role prompt prefixes and prompt-cache accounting."""
+
+import pytest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_prompts import role_prefix, normalize_usage, PrefixStats, DEFAULT_SYSTEM_PROMPT
+
+ROLES = {
+    "pm": {"name": "Project Manager", "description": "Coordinates project requirements"},
+    "coder": {"name": "Developer", "description": "Writes code", "system_prompt": "  You write Python.  "}
+}
+
+
+class TestRolePrefix:
+    """Test cases for role system text."""
+
+    def test_persona_from_name_and_description(self):
+        """Test the persona built from the role config."""
+        assert role_prefix("pm", ROLES) == (
+            "You are the Project Manager in the ChipCliff Collaborative Framework. Coordinates project requirements."
+        )
+
+    def test_system_prompt_override(self):
+        """Test that an explicit system_prompt is used verbatim."""
+        assert role_prefix("coder", ROLES) == "You write Python."
+
+    def test_no_role_and_unknown_role(self):
+        """Test the default prompt and rejection of unknown roles."""
+        assert role_prefix(None, ROLES) == DEFAULT_SYSTEM_PROMPT
+        with pytest.raises(ValueError, match="Unknown role"):
+            role_prefix("designer", ROLES)
+
+
+class TestNormalizeUsage:
+    """Test cases for provider usage blocks."""
+
+    def test_openai_cached_tokens(self):
+        usage = {"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens": 1536}}
+        assert normalize_usage("openai", usage) == {"input_tokens": 2000, "cached_tokens": 1536, "cache_write_tokens": 0}
+
+    def test_deepseek_cache_hit_tokens(self):
+        usage = {"prompt_tokens": 100, "prompt_cache_hit_tokens": 64, "prompt_cache_miss_tokens": 36}
+        assert normalize_usage("deepseek", usage)["cached_tokens"] == 64
+
+    def test_anthropic_input_includes_cache_reads_and_writes(self):
+        usage = {"input_tokens": 20, "cache_read_input_tokens": 1000, "cache_creation_input_tokens": 0}
+        assert normalize_usage("anthropic", usage) == {"input_tokens": 1020, "cached_tokens": 1000, "cache_write_tokens": 0}
+
+
+class TestPrefixStats:
+    """Test cases for prefix hit accounting."""
+
+    def test_hit_ratio_and_ttft_split(self):
+        """Test hit ratio, cached token share and hit/miss TTFT averages."""
+        stats = PrefixStats()
+        stats.record("anthropic", "pm", {"input_tokens": 1100, "cached_tokens": 0, "cache_write_tokens": 1000}, ttft=0.8)
+        stats.record("anthropic", "pm", {"input_tokens": 1100, "cached_tokens": 1000, "cache_write_tokens": 0}, ttft=0.3)
+        stats.record("anthropic", None, {"input_tokens": 10, "cached_tokens": 0, "cache_write_tokens": 0})
+
+        snapshot = stats.snapshot()
+        pm = snapshot["anthropic:pm"]
+        assert pm["calls"] == 2
+        assert pm["hit_ratio"] == 0.5
+        assert pm["cached_token_ratio"] == pytest.approx(1000 / 2200)
+        assert (pm["avg_ttft_hit"], pm["avg_ttft_miss"]) == (0.3, 0.8)
+        assert pm["avg_latency_hit"] is None
+        assert snapshot["anthropic:default"]["prefix_hits"] == 0
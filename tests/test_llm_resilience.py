@@ -0,0 +1,160 @@
+"""Tests for retry backoff and circuit breakers."""
+
+import pytest
+import os
+import sys
+import time
+import asyncio
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_resilience import RetryPolicy, CircuitBreaker, BreakerRegistry, CircuitOpenError, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def flaky(*outcomes):
+    """Build an async function that raises or returns each outcome in turn."""
+    calls = []
+
+    async def fn():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return fn, calls
+
+
+class TestIsRetryable:
+    """Test cases for retry classification."""
+
+    def test_classification(self):
+        """Test which failures are worth another attempt."""
+        assert is_retryable(StatusError(429))
+        assert is_retryable(StatusError(503))
+        assert is_retryable(StatusError(None))
+        assert is_retryable(asyncio.TimeoutError())
+        assert not is_retryable(StatusError(400))
+        assert not is_retryable(StatusError(401))
+        assert not is_retryable(ValueError("bad"))
+        assert not is_retryable(CircuitOpenError("openai", 5))
+
+
+class TestRetryPolicy:
+    """Test cases for jittered exponential backoff."""
+
+    def test_delay_is_capped_full_jitter(self):
+        """Test that delays stay within [0, min(max_delay, base * 2**attempt)]."""
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.5)
+        for attempt in range(8):
+            assert 0 <= policy.delay(attempt) <= min(0.5, 0.1 * 2 ** attempt)
+
+    def test_from_config(self):
+        """Test building a policy from the llm.retry section."""
+        policy = RetryPolicy.from_config({"max_attempts": 5, "base_delay_ms": 100, "attempt_timeout": 10})
+        assert policy.max_attempts == 5
+        assert policy.base_delay == 0.1
+        assert policy.attempt_timeout == 10.0
+
+    @pytest.mark.asyncio
+    async def test_retries_until_success(self):
+        """Test that retryable failures are retried."""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        fn, calls = flaky(StatusError(503), StatusError(429), "ok")
+        assert await policy.run(fn) == "ok"
+        assert len(calls) == 3
+        assert policy.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        """Test that the last error surfaces once attempts run out."""
+        policy = RetryPolicy(max_attempts=2, base_delay=0)
+        fn, calls = flaky(StatusError(503), StatusError(502), "never")
+        with pytest.raises(StatusError, match="502"):
+            await policy.run(fn)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_fails_immediately(self):
+        """Test that a 400 is not retried."""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        fn, calls = flaky(StatusError(400), "never")
+        with pytest.raises(StatusError):
+            await policy.run(fn)
+        assert len(calls) == 1
+
+    def test_run_sync(self):
+        """Test the blocking variant."""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        outcomes = [StatusError(500), "ok"]
+
+        def fn():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert policy.run_sync(fn) == "ok"
+
+
+class TestCircuitBreaker:
+    """Test cases for the closed/open/half-open state machine."""
+
+    def test_opens_at_failure_threshold(self):
+        """Test that the breaker opens once enough calls fail."""
+        breaker = CircuitBreaker(window=4, min_calls=4, failure_threshold=0.5)
+        for ok in [True, False, True]:
+            breaker.record(ok)
+        assert breaker.state == "closed"
+        breaker.record(False)
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_unknown_outcomes_are_ignored(self):
+        """Test that client errors do not count towards opening the breaker."""
+        breaker = CircuitBreaker(min_calls=1)
+        breaker.record(None)
+        assert breaker.state == "closed"
+        assert breaker.snapshot()["calls_in_window"] == 0
+
+    def test_half_open_probe_closes_on_success(self):
+        """Test recovery through a successful half-open probe."""
+        breaker = CircuitBreaker(min_calls=1, open_seconds=30)
+        breaker.record(False)
+        with patch('llm_resilience.time.monotonic', return_value=time.monotonic() + 31):
+            assert breaker.allow()
+            assert breaker.state == "half_open"
+            # Only one probe at a time
+            assert not breaker.allow()
+            breaker.record(True)
+        assert breaker.state == "closed"
+
+    def test_half_open_probe_failure_reopens(self):
+        """Test that a failed probe reopens the breaker."""
+        breaker = CircuitBreaker(min_calls=1, open_seconds=30)
+        breaker.record(False)
+        with patch('llm_resilience.time.monotonic', return_value=time.monotonic() + 31):
+            assert breaker.allow()
+            breaker.record(False)
+        assert breaker.state == "open"
+        assert breaker.snapshot()["times_opened"] == 2
+
+
+class TestBreakerRegistry:
+    """Test cases for per-provider breakers."""
+
+    def test_breakers_are_per_provider(self):
+        """Test that one provider's failures do not open another's breaker."""
+        registry = BreakerRegistry({"min_calls": 1})
+        registry.get("openai").record(False)
+        assert registry.is_open("openai")
+        assert not registry.is_open("anthropic")
+        assert set(registry.snapshot()) == {"openai"}
@@ -0,0 +1,196 @@
+"""Tests for the latency-aware provider router."""
+
+import pytest
+import os
+import sys
+import asyncio
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_router import LatencyRouter, ProviderStats
+
+
+def provider(answer, delay=0.0, error=None, calls=None):
+    """Build a fake async provider function."""
+    async def call(prompt, **kwargs):
+        if calls is not None:
+            calls.append(answer)
+        await asyncio.sleep(delay)
+        if error:
+            raise Exception(error)
+        return answer
+    return call
+
+
+def stream(chunks, first_delay=0.0, error=None, closed=None):
+    """Build a fake streaming provider that waits `first_delay` before its first chunk."""
+    async def open_stream(prompt, **kwargs):
+        try:
+            await asyncio.sleep(first_delay)
+            for chunk in chunks:
+                yield chunk
+            if error:
+                raise Exception(error)
+        finally:
+            if closed is not None:
+                closed.append(chunks)
+    return open_stream
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestProviderStats:
+    """Test cases for rolling provider statistics."""
+
+    def test_percentiles_and_error_rate(self):
+        """Test p50/p95 over successes and error rate over all samples."""
+        stats = ProviderStats(window=100)
+        for latency in range(1, 11):
+            stats.record(latency / 10, True)
+        stats.record(5.0, False)
+
+        assert stats.percentile(0.5) == pytest.approx(0.5)
+        assert stats.percentile(0.95) == pytest.approx(1.0)
+        assert stats.error_rate == pytest.approx(1 / 11)
+
+    def test_window_is_rolling(self):
+        """Test that old samples fall out of the window."""
+        stats = ProviderStats(window=3)
+        for ok in [False, True, True, True]:
+            stats.record(0.1, ok)
+        assert stats.error_rate == 0.0
+
+
+class TestLatencyRouter:
+    """Test cases for provider ranking, failover and hedging."""
+
+    def test_cold_start_prefers_default_provider(self):
+        """Test that the configured default provider wins before any data."""
+        router = LatencyRouter(default_provider="anthropic")
+        assert router.rank(["deepseek", "openai", "anthropic"])[0] == "anthropic"
+
+    def test_rank_by_penalized_p95(self):
+        """Test that slow or failing providers rank lower."""
+        router = LatencyRouter(min_samples=2, error_penalty=4.0)
+        for _ in range(4):
+            router.observe("fast", 0.1, True)
+            router.observe("slow", 1.0, True)
+        router.observe("flaky", 0.05, True)
+        router.observe("flaky", 0.05, False)
+
+        assert router.rank(["slow", "fast", "flaky"]) == ["fast", "flaky", "slow"]
+
+    def test_from_config(self):
+        """Test building a router from the llm config section."""
+        router = LatencyRouter.from_config({
+            "default_provider": "openai",
+            "router": {"hedge": True, "hedge_delay_ms": 250, "window": 10}
+        })
+        assert router.default_provider == "openai"
+        assert router.hedge is True
+        assert router.hedge_delay == 0.25
+
+    @pytest.mark.asyncio
+    async def test_route_uses_best_provider(self):
+        """Test that a request goes only to the top-ranked provider."""
+        router = LatencyRouter(default_provider="b")
+        calls = []
+        name, answer = await router.route(
+            {"a": provider("A", calls=calls), "b": provider("B", calls=calls)}, "hi"
+        )
+
+        assert (name, answer) == ("b", "B")
+        assert calls == ["B"]
+        assert router.snapshot()["providers"]["b"]["samples"] == 1
+
+    @pytest.mark.asyncio
+    async def test_route_fails_over_on_error(self):
+        """Test that an erroring provider fails over to the next one."""
+        router = LatencyRouter(default_provider="a")
+        name, answer = await router.route({"a": provider("A", error="down"), "b": provider("B")}, "hi")
+
+        assert (name, answer) == ("b", "B")
+        assert router.snapshot()["providers"]["a"]["error_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_route_raises_when_all_fail(self):
+        """Test that the last error surfaces when every provider fails."""
+        router = LatencyRouter()
+        with pytest.raises(Exception, match="also down"):
+            await router.route({"a": provider("A", error="down"), "b": provider("B", error="also down")}, "hi")
+
+    @pytest.mark.asyncio
+    async def test_hedge_fires_for_slow_primary(self):
+        """Test that a backup request wins when the primary is slow."""
+        router = LatencyRouter(default_provider="slow", hedge=True, hedge_delay=0.01)
+        name, answer = await router.route({"slow": provider("S", delay=0.5), "quick": provider("Q")}, "hi")
+
+        assert (name, answer) == ("quick", "Q")
+        snapshot = router.snapshot()
+        assert snapshot["hedges_fired"] == 1
+        assert snapshot["hedges_won"] == 1
+        # The cancelled loser is not counted against the slow provider
+        assert "slow" not in snapshot["providers"]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_is_fast(self):
+        """Test that no backup is sent when the primary answers in time."""
+        router = LatencyRouter(default_provider="a", hedge=True, hedge_delay=0.2)
+        calls = []
+        await router.route({"a": provider("A", calls=calls), "b": provider("B", calls=calls)}, "hi")
+
+        assert calls == ["A"]
+        assert router.snapshot()["hedges_fired"] == 0
+
+    @pytest.mark.asyncio
+    async def test_route_stream_observes_time_to_first_token_at_the_end(self):
+        """Test that a stream's first-chunk wait is recorded once it has been read."""
+        router = LatencyRouter(default_provider="a")
+        name, chunks = await router.route_stream({"a": stream(["x", "y"], first_delay=0.02)}, "hi")
+
+        assert name == "a"
+        assert "a" not in router.snapshot()["providers"]
+        assert await collect(chunks) == ["x", "y"]
+        stats = router.snapshot()["providers"]["a"]
+        assert stats["samples"] == 1 and stats["error_rate"] == 0.0
+        assert 0.02 <= stats["p50"] < 0.5
+
+    @pytest.mark.asyncio
+    async def test_route_stream_records_mid_stream_failure(self):
+        """Test that a provider that fails after its first chunk is observed as a failure."""
+        router = LatencyRouter()
+        _, chunks = await router.route_stream({"a": stream(["x"], error="reset")}, "hi")
+        with pytest.raises(Exception, match="reset"):
+            await collect(chunks)
+        assert router.snapshot()["providers"]["a"]["error_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_route_stream_fails_over_before_first_chunk(self):
+        """Test that a stream failing before any chunk fails over to the next provider."""
+        router = LatencyRouter(default_provider="a")
+        name, chunks = await router.route_stream({"a": stream([], error="down"), "b": stream(["B"])}, "hi")
+
+        assert name == "b"
+        assert await collect(chunks) == ["B"]
+        assert router.snapshot()["providers"]["a"]["error_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_route_stream_hedges_slow_first_chunk(self):
+        """Test that a slow first chunk triggers a hedge and the losing stream is closed."""
+        router = LatencyRouter(default_provider="slow", hedge=True, hedge_delay=0.01)
+        closed = []
+        name, chunks = await router.route_stream(
+            {"slow": stream(["S"], first_delay=0.5, closed=closed), "quick": stream(["Q"])}, "hi"
+        )
+
+        assert name == "quick"
+        assert await collect(chunks) == ["Q"]
+        # The cancelled loser closes its stream on its next turn of the loop
+        await asyncio.sleep(0.01)
+        assert closed == [["S"]]
+        snapshot = router.snapshot()
+        assert snapshot["hedges_won"] == 1
+        assert "slow" not in snapshot["providers"]
@@ -0,0 +1,171 @@
+"""Tests for single-flight request coalescing."""
+
+import pytest
+import os
+import sys
+import asyncio
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_singleflight import SingleFlight
+
+
+class TestSingleFlightCalls:
+    """Test cases for coalesced awaitable calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        """Test that identical concurrent calls run the function once."""
+        flight = SingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*[flight.do("k", upstream) for _ in range(5)])
+
+        assert results == ["answer"] * 5
+        assert len(calls) == 1
+        assert flight.stats()["followers"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_coalesced(self):
+        """Test that a finished call is not reused."""
+        flight = SingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            return len(calls)
+
+        assert await flight.do("k", upstream) == 1
+        assert await flight.do("k", upstream) == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared(self):
+        """Test that every waiter sees the upstream error."""
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise ValueError("provider down")
+
+        results = await asyncio.gather(*[flight.do("k", upstream) for _ in range(3)], return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Test that the shared call survives one caller going away."""
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("k", upstream))
+        second = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "answer"
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_leaving_cancels_upstream(self):
+        """Test that the upstream call is cancelled once nobody waits for it."""
+        flight = SingleFlight()
+        cancelled = []
+
+        async def upstream():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        waiter = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+
+        assert cancelled == [True]
+
+
+class TestSingleFlightStreams:
+    """Test cases for coalesced streams."""
+
+    @staticmethod
+    def make_stream(opened, closed, chunks=("a", "b", "c")):
+        async def upstream():
+            opened.append(1)
+            try:
+                for chunk in chunks:
+                    await asyncio.sleep(0.005)
+                    yield chunk
+            finally:
+                closed.append(1)
+        return upstream
+
+    @pytest.mark.asyncio
+    async def test_subscribers_share_one_stream(self):
+        """Test that concurrent subscribers all receive every chunk."""
+        flight = SingleFlight()
+        opened, closed = [], []
+        factory = self.make_stream(opened, closed)
+
+        async def consume():
+            return [chunk async for chunk in flight.stream("k", factory)]
+
+        results = await asyncio.gather(consume(), consume(), consume())
+
+        assert results == [["a", "b", "c"]] * 3
+        assert len(opened) == 1
+        assert len(closed) == 1
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber_replays_buffered_chunks(self):
+        """Test that a subscriber joining mid-stream gets the earlier chunks."""
+        flight = SingleFlight()
+        opened, closed = [], []
+        factory = self.make_stream(opened, closed)
+
+        first = flight.stream("k", factory)
+        assert await first.__anext__() == "a"
+        late = [chunk async for chunk in flight.stream("k", factory)]
+        rest = [chunk async for chunk in first]
+
+        assert late == ["a", "b", "c"]
+        assert rest == ["b", "c"]
+        assert len(opened) == 1
+
+    @pytest.mark.asyncio
+    async def test_last_subscriber_leaving_closes_upstream(self):
+        """Test that abandoning the only subscription stops the upstream stream."""
+        flight = SingleFlight()
+        opened, closed = [], []
+        factory = self.make_stream(opened, closed, chunks=("a",) * 100)
+
+        stream = flight.stream("k", factory)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+
+        assert closed == [1]
+        assert flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_errors_reach_subscribers(self):
+        """Test that an upstream failure is raised in every subscriber."""
+        flight = SingleFlight()
+
+        async def upstream():
+            yield "a"
+            raise RuntimeError("reset")
+
+        with pytest.raises(RuntimeError, match="reset"):
+            [chunk async for chunk in flight.stream("k", upstream)]
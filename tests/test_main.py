@@ -0,0 +1,411 @@
+"""Tests for the FastAPI application routes."""
+
+import pytest
+import os
+import sys
+import json
+import asyncio
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from llm_resilience import BreakerRegistry, CircuitOpenError
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+class TestChatEndpoint:
+    """Test cases for /chat/{model_name}."""
+
+    def test_chat_awaits_provider(self, client):
+        """Test that the chat route awaits the async provider call."""
+        async def fake_provider(prompt, use_cache=True):
+            return f"echo: {prompt}"
+
+        with patch.dict(main.models_config, {"openai": fake_provider}):
+            response = client.post("/chat/openai", json={"prompt": "hello"})
+
+        assert response.status_code == 200
+        assert response.json() == {"response": "echo: hello", "model": "openai", "status": "success"}
+
+    def test_chat_cache_bypass_headers(self, client):
+        """Test that bypass headers disable the response cache for the call."""
+        seen = []
+
+        async def fake_provider(prompt, use_cache=True):
+            seen.append(use_cache)
+            return "ok"
+
+        with patch.dict(main.models_config, {"openai": fake_provider}):
+            client.post("/chat/openai", json={"prompt": "hello"})
+            client.post("/chat/openai", json={"prompt": "hello"}, headers={"Cache-Control": "no-cache"})
+            client.post("/chat/openai", json={"prompt": "hello"}, headers={"X-Cache-Bypass": "1"})
+
+        assert seen == [True, False, False]
+
+    def test_metrics_reports_cache_counters(self, client):
+        """Test that /metrics exposes response cache counters."""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert {"hits", "misses", "hit_ratio"} <= set(response.json()["llm_cache"])
+
+    def test_chat_unknown_model(self, client):
+        """Test 404 for a model that is not configured."""
+        response = client.post("/chat/unknown", json={"prompt": "hello"})
+        assert response.status_code == 404
+
+    def test_chat_provider_error(self, client):
+        """Test that provider failures surface as 500 responses."""
+        async def failing_provider(prompt, use_cache=True):
+            raise Exception("Error calling OpenAI API: boom")
+
+        with patch.dict(main.models_config, {"openai": failing_provider}):
+            response = client.post("/chat/openai", json={"prompt": "hello"})
+
+        assert response.status_code == 500
+        assert "boom" in response.json()["detail"]
+
+    def test_chat_circuit_open_is_503(self, client):
+        """Test that a provider with an open breaker answers 503 with Retry-After."""
+        async def rejected_provider(prompt, use_cache=True):
+            raise CircuitOpenError("openai", 12.3)
+
+        with patch.dict(main.models_config, {"openai": rejected_provider}):
+            response = client.post("/chat/openai", json={"prompt": "hello"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "12"
+
+    def test_chat_passes_role(self, client):
+        """Test that a configured role is forwarded to the provider call."""
+        seen = {}
+
+        async def fake_provider(prompt, use_cache=True, role=None):
+            seen["role"] = role
+            return "ok"
+
+        with patch.dict(main.models_config, {"openai": fake_provider}), \
+             patch.dict(main.config, {"roles": {"coder": {"name": "Developer"}}}):
+            response = client.post("/chat/openai", json={"prompt": "hello", "role": "coder"})
+
+        assert response.status_code == 200
+        assert seen["role"] == "coder"
+
+    def test_chat_unknown_role(self, client):
+        """Test 400 for a role that is not configured."""
+        async def fake_provider(prompt, use_cache=True, role=None):
+            return "ok"
+
+        with patch.dict(main.models_config, {"openai": fake_provider}):
+            response = client.post("/chat/openai", json={"prompt": "hello", "role": "astronaut"})
+        assert response.status_code == 400
+
+
+class TestHealth:
+    """Test cases for /health."""
+
+    def test_health_reports_breakers(self, client):
+        """Test that an open breaker marks the service as degraded."""
+        registry = BreakerRegistry({"min_calls": 1, "open_seconds": 60})
+        registry.get("openai").record(False)
+        registry.get("anthropic").record(True)
+
+        with patch.object(main, "breakers", registry):
+            body = client.get("/health").json()
+
+        assert body["status"] == "degraded"
+        assert body["circuit_breakers"]["openai"]["state"] == "open"
+        assert body["circuit_breakers"]["anthropic"]["state"] == "closed"
+
+    def test_health_is_healthy_without_failures(self, client):
+        """Test the healthy status when no breaker has tripped."""
+        with patch.object(main, "breakers", BreakerRegistry()):
+            assert client.get("/health").json()["status"] == "healthy"
+
+    def test_liveness(self, client):
+        assert client.get("/health/live").json() == {"status": "alive"}
+
+    def test_readiness_waits_for_warm_classifier(self, client):
+        """Test that readiness is 503 until the classifier is warm."""
+        state = {"loaded": False, "warm": False, "backend": "torch", "load_seconds": None}
+        with patch.object(main, "classifier_state", return_value=state), \
+             patch.object(main, "_warm_up_enabled", return_value=True):
+            assert client.get("/health/ready").status_code == 503
+            state.update(loaded=True, warm=True)
+            assert client.get("/health/ready").json()["status"] == "ready"
+
+    def test_health_reports_classifier_cache_hit_ratio(self, client):
+        cache = MagicMock()
+        cache.stats.return_value = {"hit_ratio": 0.75}
+        with patch.object(main, "get_classifier_cache", lambda create=True: cache):
+            assert client.get("/health").json()["classifier_cache_hit_ratio"] == 0.75
+
+
+class TestChatAuto:
+    """Test cases for the latency-routed /chat/auto endpoint."""
+
+    def test_chat_auto_routes_to_a_provider(self, client):
+        """Test that /chat/auto answers from a configured provider."""
+        async def fake_provider(prompt, use_cache=True):
+            return "routed"
+
+        with patch.dict(main.models_config, {"openai": fake_provider}, clear=True):
+            response = client.post("/chat/auto", json={"prompt": "hello"})
+
+        assert response.status_code == 200
+        assert response.json() == {"response": "routed", "model": "openai", "status": "success"}
+
+    def test_chat_auto_fails_over(self, client):
+        """Test that /chat/auto falls back when the first provider errors."""
+        async def failing_provider(prompt, use_cache=True):
+            raise Exception("down")
+
+        async def healthy_provider(prompt, use_cache=True):
+            return "fallback"
+
+        with patch.dict(main.models_config, {"anthropic": failing_provider, "openai": healthy_provider}, clear=True), \
+             patch.object(main.router, "default_provider", "anthropic"), \
+             patch.object(main.router, "stats", {}):
+            response = client.post("/chat/auto", json={"prompt": "hello"})
+
+        assert response.json()["model"] == "openai"
+
+    def test_chat_auto_skips_open_breakers(self, client):
+        """Test that /chat/auto does not route to a provider whose breaker is open."""
+        calls = []
+
+        async def open_provider(prompt, use_cache=True):
+            calls.append("anthropic")
+            return "should not be called"
+
+        async def healthy_provider(prompt, use_cache=True):
+            return "healthy"
+
+        registry = BreakerRegistry({"min_calls": 1, "open_seconds": 60})
+        registry.get("anthropic").record(False)
+        with patch.dict(main.models_config, {"anthropic": open_provider, "openai": healthy_provider}, clear=True), \
+             patch.object(main, "breakers", registry), \
+             patch.object(main.router, "default_provider", "anthropic"), \
+             patch.object(main.router, "stats", {}):
+            response = client.post("/chat/auto", json={"prompt": "hello"})
+
+        assert response.json()["model"] == "openai"
+        assert calls == []
+
+    def test_chat_auto_stream_fails_over_and_feeds_the_router(self, client):
+        """Test that streamed /chat/auto fails over before the first chunk and records both outcomes."""
+        async def failing_stream(prompt, use_cache=True):
+            raise Exception("down")
+            yield
+
+        async def healthy_stream(prompt, use_cache=True):
+            for chunk in ["Hel", "lo"]:
+                yield chunk
+
+        with patch.dict(main.stream_models_config, {"anthropic": failing_stream, "openai": healthy_stream}, clear=True), \
+             patch.object(main.router, "default_provider", "anthropic"), \
+             patch.object(main.router, "stats", {}):
+            response = client.post("/chat/auto", json={"prompt": "hello", "stream": "ndjson"})
+            providers = main.router.snapshot()["providers"]
+
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [event.get("delta") for event in events[:2]] == ["Hel", "lo"]
+        assert events[-1] == {"event": "done", "model": "openai", "status": "success"}
+        assert providers["anthropic"]["error_rate"] == 1.0
+        assert providers["openai"]["samples"] == 1 and providers["openai"]["error_rate"] == 0.0
+
+    def test_metrics_reports_router_stats(self, client):
+        """Test that /metrics exposes per-provider routing stats."""
+        assert "providers" in client.get("/metrics").json()["llm_router"]
+
+
+class TestChatStreaming:
+    """Test cases for streamed /chat responses."""
+
+    @staticmethod
+    def fake_stream(closed):
+        async def stream(prompt, use_cache=True):
+            try:
+                for chunk in ["Hel", "lo"]:
+                    yield chunk
+            finally:
+                closed.append(True)
+        return stream
+
+    def test_chat_stream_sse(self, client):
+        """Test Server-Sent Events framing of provider chunks."""
+        closed = []
+        with patch.dict(main.stream_models_config, {"openai": self.fake_stream(closed)}):
+            response = client.post("/chat/openai", json={"prompt": "hi", "stream": "sse"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frames = [frame for frame in response.text.split("\n\n") if frame]
+        assert frames[0] == 'event: delta\ndata: {"delta": "Hel", "model": "openai"}'
+        assert frames[-1].startswith("event: done")
+        assert closed == [True]
+
+    def test_chat_stream_ndjson(self, client):
+        """Test chunked NDJSON framing of provider chunks."""
+        closed = []
+        with patch.dict(main.stream_models_config, {"openai": self.fake_stream(closed)}):
+            response = client.post("/chat/openai", json={"prompt": "hi", "stream": "ndjson"})
+
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [event.get("delta") for event in events[:2]] == ["Hel", "lo"]
+        assert events[-1]["event"] == "done"
+
+    def test_chat_stream_error_event(self, client):
+        """Test that provider failures mid-stream end with an error event."""
+        async def failing_stream(prompt, use_cache=True):
+            yield "partial"
+            raise Exception("Error calling OpenAI API: reset")
+
+        with patch.dict(main.stream_models_config, {"openai": failing_stream}):
+            response = client.post("/chat/openai", json={"prompt": "hi", "stream": "ndjson"})
+
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert events[0]["delta"] == "partial"
+        assert events[-1]["event"] == "error"
+        assert "reset" in events[-1]["detail"]
+
+    def test_chat_stream_invalid_format(self, client):
+        """Test that unknown stream formats are rejected."""
+        response = client.post("/chat/openai", json={"prompt": "hi", "stream": "xml"})
+        assert response.status_code == 422
+
+
+class TestChatBatch:
+    """Test cases for the concurrent /chat/batch endpoint."""
+
+    @staticmethod
+    def delayed_provider(delays, active=None, peak=None):
+        async def provider(prompt, use_cache=True):
+            if active is not None:
+                active.append(prompt)
+                peak.append(len(active))
+            await asyncio.sleep(delays.get(prompt, 0))
+            if active is not None:
+                active.remove(prompt)
+            if prompt == "fail":
+                raise Exception("Error calling OpenAI API: boom")
+            return prompt.upper()
+        return provider
+
+    def test_batch_returns_results_in_order(self, client):
+        """Test ordered results with per-item errors that do not fail the batch."""
+        provider = self.delayed_provider({"slow": 0.05})
+        with patch.dict(main.models_config, {"openai": provider}):
+            response = client.post("/chat/batch", json={"items": [
+                {"prompt": "slow", "model": "openai"},
+                {"prompt": "fail", "model": "openai"},
+                {"prompt": "fast", "model": "openai"},
+                {"prompt": "x", "model": "missing"}
+            ]})
+
+        body = response.json()
+        assert response.status_code == 200
+        assert [result["index"] for result in body["results"]] == [0, 1, 2, 3]
+        assert body["results"][0]["response"] == "SLOW"
+        assert body["results"][1]["status"] == "error"
+        assert "not found" in body["results"][3]["detail"]
+        assert (body["succeeded"], body["failed"]) == (2, 2)
+
+    def test_batch_bounds_concurrency(self, client):
+        """Test that no more than max_concurrency prompts run at once."""
+        active, peak = [], []
+        provider = self.delayed_provider({f"p{i}": 0.01 for i in range(6)}, active, peak)
+        with patch.dict(main.models_config, {"openai": provider}):
+            client.post("/chat/batch", json={
+                "items": [{"prompt": f"p{i}", "model": "openai"} for i in range(6)],
+                "max_concurrency": 2
+            })
+
+        assert max(peak) == 2
+
+    def test_batch_streams_items_as_they_finish(self, client):
+        """Test NDJSON item events in completion order followed by ordered results."""
+        provider = self.delayed_provider({"slow": 0.1})
+        with patch.dict(main.models_config, {"openai": provider}):
+            response = client.post("/chat/batch", json={"stream": "ndjson", "items": [
+                {"prompt": "slow", "model": "openai"},
+                {"prompt": "fast", "model": "openai"}
+            ]})
+
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [event["index"] for event in events[:2]] == [1, 0]
+        assert events[-1]["event"] == "done"
+        assert [result["response"] for result in events[-1]["results"]] == ["SLOW", "FAST"]
+
+    def test_batch_rejects_oversized_batches(self, client):
+        """Test the llm.batch.max_items limit."""
+        with patch.object(main, "_batch_settings", return_value={"max_items": 2}):
+            response = client.post("/chat/batch", json={"items": [{"prompt": "p"}] * 3})
+        assert response.status_code == 413
+
+
+class TestTaskEndpoints:
+    """Test cases for the asynchronous /task pipeline."""
+
+    def test_task_returns_202_with_status_url(self, client):
+        """Test that /task queues work and answers immediately."""
+        pipeline = MagicMock()
+        pipeline.submit.return_value = "task-123"
+        with patch.object(main, "task_pipeline", pipeline):
+            response = client.post("/task", json={"description": "Build a page"})
+
+        assert response.status_code == 202
+        assert response.json()["status_url"] == "/tasks/task-123/status"
+        pipeline.submit.assert_called_once_with("Build a page", None, 0)
+
+    def test_task_priority_is_validated(self, client):
+        """Test that priorities are passed through and bounded."""
+        pipeline = MagicMock()
+        pipeline.submit.return_value = "task-123"
+        with patch.object(main, "task_pipeline", pipeline):
+            assert client.post("/task", json={"description": "Build", "priority": 7}).json()["priority"] == 7
+            assert client.post("/task", json={"description": "Build", "priority": 42}).status_code == 422
+        pipeline.submit.assert_called_once_with("Build", None, 7)
+
+    def test_task_queue_full_is_503(self, client):
+        """Test backpressure when the pipeline is full."""
+        pipeline = MagicMock()
+        pipeline.submit.side_effect = main.QueueFullError("Task queue is full (100 pending)")
+        with patch.object(main, "task_pipeline", pipeline):
+            response = client.post("/task", json={"description": "Build a page"})
+        assert response.status_code == 503
+
+    def test_task_status_reads_store(self, client):
+        """Test that the status route returns the stored state."""
+        record = {"Status": "running", "Category": "coding", "QueuedAt": "2024-01-01T10:00:00",
+                  "StartedAt": "2024-01-01T10:00:01", "Logs": []}
+        with patch.object(main, "get_task_record", return_value=record):
+            body = client.get("/tasks/t1/status").json()
+
+        assert body["status"] == "running"
+        assert body["timings"]["queue_seconds"] == 1.0
+
+    def test_task_status_unknown(self, client):
+        with patch.object(main, "get_task_record", return_value=None):
+            assert client.get("/tasks/missing/status").status_code == 404
+
+    def test_task_graph_runs_plan(self, client):
+        """Test that /tasks/graph decomposes the task and runs its nodes."""
+        nodes = [{"id": "n1", "description": "Research", "category": "research", "depends_on": []}]
+        executor = MagicMock()
+        executor.run.return_value = {"n1": {"id": "n1", "status": "completed", "output": "notes"}}
+        with patch.object(main, "plan_task", return_value=nodes), \
+                patch.object(main, "graph_executor", executor):
+            body = client.post("/tasks/graph", json={"description": "Research"}).json()
+            plan = client.post("/tasks/graph", json={"description": "Research", "plan_only": True}).json()
+
+        assert body["status"] == "completed"
+        assert body["results"]["n1"]["output"] == "notes"
+        assert plan == {"nodes": nodes}
+        executor.run.assert_called_once_with(nodes)
@@ -2,19 +2,30 @@
 
 import pytest
 import os
+import subprocess
 import sys
 from unittest.mock import patch, MagicMock
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pm_algorithm import classify_task, assign_task, update_status
+import torch
+import pm_algorithm
+from pm_algorithm import classify_task, classify_tasks, assign_task, update_status
+
+
+@pytest.fixture
+def transformer_only():
+    """Skip the cheap cascade stages and the result cache so classification reaches the (mocked) model."""
+    with patch.object(pm_algorithm.get_classifier_cascade(), "enabled", False), \
+         patch.object(pm_algorithm, "classifier_cache", None):
+        yield
 
 
 class TestPMAlgorithm:
     """Test cases for PM algorithm functions."""
 
-    def test_classify_task_coding(self):
+    def test_classify_task_coding(self, transformer_only):
         """Test task classification for coding tasks."""
         coding_task = "Create a new HTML page with interactive elements"
         with patch('pm_algorithm.model') as mock_model, \
@@ -27,11 +38,11 @@ class TestPMAlgorithm:
             mock_model.return_value = mock_outputs
             
             with patch('torch.no_grad'):
-                with patch('torch.argmax', return_value=MagicMock(item=lambda: 0)):
+                with patch('torch.argmax', return_value=torch.tensor([0])):
                     result = classify_task(coding_task)
                     assert result == "coding"
 
-    def test_classify_task_research(self):
+    def test_classify_task_research(self, transformer_only):
         """Test task classification for research tasks."""
         research_task = "Research HTML5 best practices and modern web standards"
         with patch('pm_algorithm.model') as mock_model, \
@@ -44,11 +55,11 @@ class TestPMAlgorithm:
             mock_model.return_value = mock_outputs
             
             with patch('torch.no_grad'):
-                with patch('torch.argmax', return_value=MagicMock(item=lambda: 1)):
+                with patch('torch.argmax', return_value=torch.tensor([1])):
                     result = classify_task(research_task)
                     assert result == "research"
 
-    def test_classify_task_error_handling(self):
+    def test_classify_task_error_handling(self, transformer_only):
         """Test error handling in task classification."""
         with patch('pm_algorithm.tokenizer', side_effect=Exception("Tokenizer error")):
             with patch('pm_algorithm.log_error') as mock_log_error:
@@ -56,6 +67,74 @@ class TestPMAlgorithm:
                 assert result is None
                 mock_log_error.assert_called_once()
 
+    def test_classify_tasks_batches_inputs(self, transformer_only):
+        """Test that the bulk API pads and classifies its inputs in one forward pass."""
+        with patch('pm_algorithm.model') as mock_model, \
+             patch('pm_algorithm.tokenizer') as mock_tokenizer:
+            
+            mock_tokenizer.return_value = {"input_ids": [[1, 2, 3], [1, 2, 0]], "attention_mask": [[1, 1, 1], [1, 1, 0]]}
+            mock_model.return_value = MagicMock(logits=torch.tensor([[0.9, 0.1], [0.1, 0.9]]))
+            
+            result = classify_tasks(["Build a page", "Research caching"])
+            assert result == ["coding", "research"]
+            mock_tokenizer.assert_called_once()
+            assert mock_tokenizer.call_args.kwargs["padding"] is True
+
+    def test_import_is_lazy(self):
+        """Test that importing the module loads neither torch nor the model."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys, pm_algorithm; print('torch' in sys.modules, pm_algorithm.classifier_state()['loaded'], "
+                "pm_algorithm.get_classifier_cache(create=False), pm_algorithm.get_classifier_cascade(create=False))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True).stdout
+        assert output.split() == ["False", "False", "None", "None"]
+
+    def test_failed_model_download_fails_classification_without_hanging(self, transformer_only):
+        """Test that a SystemExit from the model download is an ordinary classification failure."""
+        with patch.object(pm_algorithm, "model", None), \
+             patch.object(pm_algorithm, "tokenizer", None), \
+             patch('pm_algorithm.load_model_and_tokenizer', side_effect=SystemExit("offline")), \
+             patch('pm_algorithm.log_error') as mock_log_error:
+            assert classify_tasks(["Build a page"]) == [None]
+            # The batcher thread survived, so later calls are answered too
+            assert classify_tasks(["Build a page"]) == [None]
+        assert "offline" in mock_log_error.call_args.args[0]
+
+    def test_any_forward_pass_makes_the_classifier_warm(self, transformer_only):
+        """Test that readiness recovers when a request loads the model after a failed warm-up."""
+        with patch('pm_algorithm.model') as mock_model, \
+             patch('pm_algorithm.tokenizer') as mock_tokenizer, \
+             patch.object(pm_algorithm, "_warm", False):
+            mock_tokenizer.return_value = {"input_ids": [[1, 2, 3]], "attention_mask": [[1, 1, 1]]}
+            mock_model.return_value = MagicMock(logits=torch.tensor([[0.9, 0.1]]))
+            assert pm_algorithm.predict_categories(["Build a page"]) == ["coding"]
+            assert pm_algorithm.classifier_state()['warm'] is True
+
+    def test_preload_skips_fork_unsafe_backends(self):
+        """Test that ONNX backends are not loaded in a pre-fork parent."""
+        with patch.object(pm_algorithm, "classifier_backend", "onnx"), \
+             patch('pm_algorithm._ensure_model') as mock_ensure, \
+             patch('pm_algorithm.log_error') as mock_log_error:
+            pm_algorithm.preload_classifier()
+        mock_ensure.assert_not_called()
+        # The task store must not be opened in the pre-fork parent
+        mock_log_error.assert_not_called()
+
+    def test_obvious_tasks_skip_the_model(self):
+        """Test that the cascade answers keyword-obvious descriptions without the model."""
+        with patch('pm_algorithm.tokenizer') as mock_tokenizer:
+            result = pm_algorithm.classify_task_detailed("Fix the bug in the login endpoint and add unit tests")
+        assert result["category"] == "coding"
+        assert result["stage"] == "keywords"
+        mock_tokenizer.assert_not_called()
+
+    @patch('pm_algorithm.classify_task')
+    def test_plan_task_splits_research_then_coding(self, mock_classify):
+        """Test that the PM plans dependent subtasks with its classifier."""
+        mock_classify.side_effect = ["research", "coding"]
+        nodes = pm_algorithm.plan_task("Survey OAuth providers, then implement the login endpoint")
+        assert [node["category"] for node in nodes] == ["research", "coding"]
+        assert nodes[1]["depends_on"] == ["n1"]
+
     @patch('pm_algorithm.generate_code')
     @patch('pm_algorithm.send_feedback')
     @patch('pm_algorithm.update_status')
@@ -90,6 +169,18 @@ class TestPMAlgorithm:
         mock_update_status.assert_called_once()
         mock_log_success.assert_called_once()
 
+    @patch('pm_algorithm.update_status')
+    @patch('pm_algorithm.log_success')
+    def test_assign_task_executes_outside_transaction(self, mock_log_success, mock_update_status):
+        """Test that errors logged during execution are not buffered with the final status."""
+        import xml_utils
+        buffered = []
+        with patch('pm_algorithm.execute_task',
+                   side_effect=lambda *args: buffered.append(getattr(xml_utils._transaction, "ops", None))):
+            assert assign_task("research", "Research web frameworks") is not None
+        assert buffered == [None]
+        mock_update_status.assert_called_once()
+
     def test_assign_task_unknown_category(self):
         """Test error handling for unknown task category."""
         with patch('pm_algorithm.log_error') as mock_log_error:
@@ -0,0 +1,183 @@
+"""Tests for task graph decomposition and execution."""
+
+import pytest
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import ResponseCache
+from task_graph import decompose, topological_order, node_input, TaskGraphExecutor, GraphError
+
+
+def keyword_classify(text):
+    return "coding" if any(word in text.lower() for word in ("implement", "write", "build")) else "research"
+
+
+class TestDecompose:
+    """Test cases for splitting a description into dependent subtasks."""
+
+    def test_single_task(self):
+        """Test that a plain description becomes one node without dependencies."""
+        nodes = decompose("Implement a login form", keyword_classify)
+        assert nodes == [{"id": "n1", "description": "Implement a login form",
+                          "category": "coding", "depends_on": []}]
+
+    def test_then_creates_sequential_stages(self):
+        """Test that each stage depends on the one before it."""
+        nodes = decompose("Research OAuth providers, then implement the login flow", keyword_classify)
+        assert [node["category"] for node in nodes] == ["research", "coding"]
+        assert nodes[1]["depends_on"] == ["n1"]
+
+    def test_sentences_in_a_stage_run_in_parallel(self):
+        """Test that independent sentences share the previous stage as dependencies only."""
+        nodes = decompose("Compare caching libraries. Survey rate limiting papers.\n"
+                          "Write the cache layer", keyword_classify)
+        assert [node["depends_on"] for node in nodes] == [[], [], ["n1", "n2"]]
+
+    def test_coding_waits_for_research_in_same_stage(self):
+        """Test that coding nodes depend on research nodes of their own stage."""
+        nodes = decompose("Find the API rate limits. Write a client for the API.", keyword_classify)
+        assert nodes[1]["depends_on"] == ["n1"]
+
+    def test_numbered_list_and_detailed_classifier(self):
+        """Test list markers are stripped and dict classifier results are accepted."""
+        nodes = decompose("1. Research options\n2. Build prototype",
+                          lambda text: {"category": keyword_classify(text), "stage": "keywords"})
+        assert [node["description"] for node in nodes] == ["Research options", "Build prototype"]
+        assert nodes[1]["category"] == "coding"
+
+
+class TestTopologicalOrder:
+    """Test cases for graph validation."""
+
+    def test_order(self):
+        """Test that dependencies come before their dependents."""
+        nodes = [{"id": "b", "depends_on": ["a"]}, {"id": "a", "depends_on": []}]
+        assert topological_order(nodes) == ["a", "b"]
+
+    def test_cycle(self):
+        """Test that cycles are rejected."""
+        nodes = [{"id": "a", "depends_on": ["b"]}, {"id": "b", "depends_on": ["a"]}]
+        with pytest.raises(GraphError):
+            topological_order(nodes)
+
+    def test_unknown_dependency(self):
+        """Test that edges to missing nodes are rejected."""
+        with pytest.raises(GraphError):
+            topological_order([{"id": "a", "depends_on": ["missing"]}])
+
+
+class TestTaskGraphExecutor:
+    """Test cases for running task graphs."""
+
+    def graph(self):
+        return [
+            {"id": "n1", "description": "Research A", "category": "research", "depends_on": []},
+            {"id": "n2", "description": "Research B", "category": "research", "depends_on": []},
+            {"id": "n3", "description": "Implement C", "category": "coding", "depends_on": ["n1", "n2"]}
+        ]
+
+    def test_results_pass_along_edges(self):
+        """Test that a node receives the outputs of its dependencies."""
+        inputs = {}
+
+        def execute(category, text):
+            inputs[text.split("\n")[0]] = text
+            return {"output": "out:" + text.split("\n")[0]}
+
+        results = TaskGraphExecutor(execute).run(self.graph())
+        assert all(result["status"] == "completed" for result in results.values())
+        assert "out:Research A" in inputs["Implement C"]
+        assert "out:Research B" in inputs["Implement C"]
+
+    def test_independent_nodes_run_concurrently(self):
+        """Test that ready nodes run at the same time."""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def execute(category, text):
+            if category == "research":
+                barrier.wait()
+            return {"output": text}
+
+        results = TaskGraphExecutor(execute, max_workers=4).run(self.graph())
+        assert results["n3"]["status"] == "completed"
+
+    def test_role_limit(self):
+        """Test that at most the role's worker count runs at once."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def execute(category, text):
+            with lock:
+                running.append(text)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(text)
+            return {"output": text}
+
+        nodes = [{"id": f"n{i}", "description": f"Research {i}", "category": "research", "depends_on": []}
+                 for i in range(4)]
+        TaskGraphExecutor(execute, max_workers=4, role_limits={"researcher": 1}).run(nodes)
+        assert max(peak) == 1
+
+    def test_failure_skips_dependents(self):
+        """Test that nodes downstream of a failure are skipped."""
+        def execute(category, text):
+            if text.startswith("Research A"):
+                raise RuntimeError("search failed")
+            return {"output": text}
+
+        results = TaskGraphExecutor(execute).run(self.graph())
+        assert results["n1"]["status"] == "failed"
+        assert results["n2"]["status"] == "completed"
+        assert results["n3"]["status"] == "skipped"
+
+    def test_rerun_only_executes_changed_nodes(self):
+        """Test that cached nodes are reused and changes propagate downstream."""
+        calls = []
+
+        def execute(category, text):
+            calls.append(text.split("\n")[0])
+            return {"output": text.split("\n")[0]}
+
+        executor = TaskGraphExecutor(execute, cache=ResponseCache(ttl=0))
+        executor.run(self.graph())
+        assert len(calls) == 3
+
+        calls.clear()
+        results = executor.run(self.graph())
+        assert calls == []
+        assert all(result["cached"] for result in results.values())
+
+        changed = self.graph()
+        changed[1]["description"] = "Research B again"
+        executor.run(changed)
+        assert sorted(calls) == ["Implement C", "Research B again"]
+
+    def test_from_config(self):
+        """Test role limits and cache settings from config."""
+        executor = TaskGraphExecutor.from_config(
+            {"max_workers": 2, "cache": {"enabled": False}}, lambda c, t: {},
+            {"coder": {"workers": 3}, "pm": {}}
+        )
+        assert executor.max_workers == 2
+        assert executor.role_limits == {"coder": 3}
+        assert executor.cache is None
+        assert executor.stats()["cache"] is None
+
+
+class TestNodeInput:
+    """Test cases for building a node's input."""
+
+    def test_upstream_output_is_truncated(self):
+        """Test that long upstream outputs are bounded."""
+        node = {"id": "n2", "description": "Use it", "depends_on": ["n1"]}
+        text = node_input(node, {"n1": {"category": "research", "output": "x" * 10000}})
+        assert text.startswith("Use it\n\nInput from n1 (research):")
+        assert len(text) < 2100
@@ -0,0 +1,189 @@
+"""Tests for the background task pipeline."""
+
+import pytest
+import os
+import sys
+import time
+import threading
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_pipeline import TaskPipeline, QueueFullError, task_status
+
+
+class MemoryStore:
+    """Dict-backed stand-in for xml_utils.update_task_fields."""
+
+    def __init__(self):
+        self.tasks = {}
+
+    def __call__(self, task_id, fields):
+        task = self.tasks.setdefault(task_id, {})
+        for name, value in fields.items():
+            if value is None:
+                task.pop(name, None)
+            else:
+                task[name] = value
+        return True
+
+
+def wait_for_status(store, task_id, statuses, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if store.tasks.get(task_id, {}).get("Status") in statuses:
+            return store.tasks[task_id]
+        time.sleep(0.01)
+    raise AssertionError(f"task {task_id} never reached {statuses}")
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    with patch('task_pipeline.log_success'), patch('task_pipeline.log_failure'):
+        yield
+
+
+class TestTaskPipeline:
+    """Test cases for queueing and running tasks."""
+
+    def test_submit_returns_before_work_runs(self):
+        """Test that submit records a queued task and returns immediately."""
+        release = threading.Event()
+        store = MemoryStore()
+
+        def slow_execute(category, description):
+            release.wait(2)
+            return {"output": "done"}
+
+        pipeline = TaskPipeline(lambda text: "research", slow_execute, workers=1, store=store)
+        task_id = pipeline.submit("Research caching")
+
+        assert store.tasks[task_id]["Description"] == "Research caching"
+        assert "QueuedAt" in store.tasks[task_id]
+        release.set()
+        record = wait_for_status(store, task_id, {"completed"})
+        assert record["Category"] == "research"
+        assert record["Result"] == "done"
+        pipeline.shutdown(wait=True)
+
+    def test_records_classifier_stage(self):
+        """Test that a classifier reporting its stage has it stored with the task."""
+        store = MemoryStore()
+        pipeline = TaskPipeline(lambda text: {"category": "coding", "stage": "keywords"},
+                                lambda c, d: {"output": "ok"}, workers=1, store=store)
+        record = wait_for_status(store, pipeline.submit("Fix the bug"), {"completed"})
+        pipeline.shutdown(wait=True)
+        assert record["ClassifierStage"] == "keywords"
+        assert task_status("t", record)["classifier_stage"] == "keywords"
+
+    def test_replayed_classification_keeps_the_running_role_job(self):
+        """Test that a pm job replayed after its lease expired does not reset or rerun the role job."""
+        release = threading.Event()
+        calls = []
+
+        def slow_execute(category, description):
+            calls.append(description)
+            release.wait(2)
+            return {"output": "done"}
+
+        store = MemoryStore()
+        pipeline = TaskPipeline(lambda text: "research", slow_execute, workers=1, store=store)
+        task_id = pipeline.submit("Research caching")
+        wait_until(lambda: calls)
+
+        pipeline._classify_job({"payload": {"task_id": task_id, "description": "Research caching"}, "priority": 0})
+        assert pipeline.queue.counts()["researcher"] == {"ready": 0, "leased": 1, "dead": 0}
+        release.set()
+        wait_for_status(store, task_id, {"completed"})
+        pipeline.shutdown(wait=True)
+        assert calls == ["Research caching"]
+
+    def test_failures_are_recorded(self):
+        """Test that classification and execution errors end in a failed state."""
+        store = MemoryStore()
+
+        def failing_execute(category, description):
+            raise ValueError("Unknown category: other")
+
+        pipeline = TaskPipeline(lambda text: "other", failing_execute, store=store)
+        unclassified = TaskPipeline(lambda text: None, failing_execute, store=store)
+        failed = pipeline.submit("a")
+        no_category = unclassified.submit("b")
+
+        assert "Unknown category" in wait_for_status(store, failed, {"failed"})["Error"]
+        assert wait_for_status(store, no_category, {"failed"})["Error"] == "Failed to classify task"
+        pipeline.shutdown(wait=True)
+        unclassified.shutdown(wait=True)
+        assert pipeline.stats()["failed"] == 1
+
+    def test_queue_limit(self):
+        """Test that submissions beyond max_pending are rejected."""
+        release = threading.Event()
+        pipeline = TaskPipeline(lambda text: "coding", lambda c, d: release.wait(2) and {},
+                                workers=1, max_pending=2, store=MemoryStore())
+        pipeline.submit("one")
+        pipeline.submit("two")
+        with pytest.raises(QueueFullError):
+            pipeline.submit("three")
+        release.set()
+        deadline = time.monotonic() + 2
+        while pipeline.stats()["completed"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pipeline.stats()["completed"] == 2
+        assert pipeline.stats()["queued"] == 0
+        pipeline.shutdown()
+
+    def test_tasks_route_to_role_pools_by_priority(self):
+        """Test that classified tasks run in their role's pool, highest priority first."""
+        store = MemoryStore()
+        order = []
+        gate = threading.Event()
+
+        def execute(category, description):
+            gate.wait(2)
+            order.append(description)
+            return {"output": category}
+
+        pipeline = TaskPipeline(lambda text: "research", execute, workers=1, store=store,
+                                roles={"researcher": {"workers": 1}})
+        pipeline.submit("first")
+        wait_until(lambda: pipeline.stats()["roles"]["researcher"]["running"] == 1)
+        low = pipeline.submit("low", priority=0)
+        high = pipeline.submit("high", priority=9)
+        wait_until(lambda: pipeline.queue.counts().get("researcher", {}).get("ready") == 2)
+        gate.set()
+        wait_for_status(store, low, {"completed"})
+
+        assert order == ["first", "high", "low"]
+        assert store.tasks[high]["Role"] == "researcher"
+        pipeline.shutdown(wait=True)
+        assert pipeline.stats()["roles"]["researcher"]["processed"] == 3
+
+
+class TestTaskStatus:
+    """Test cases for the status view of a stored task."""
+
+    def test_timings(self):
+        """Test queue and run durations computed from stored timestamps."""
+        status = task_status("t1", {
+            "Status": "completed", "Category": "coding",
+            "QueuedAt": "2024-01-01T10:00:00", "StartedAt": "2024-01-01T10:00:02",
+            "FinishedAt": "2024-01-01T10:00:12.500000", "Result": "<html></html>", "Logs": ["Success"]
+        })
+        assert status["timings"]["queue_seconds"] == 2.0
+        assert status["timings"]["run_seconds"] == 10.5
+        assert status["logs"] == ["Success"]
+
+    def test_unfinished_task_has_no_run_time(self):
+        status = task_status("t2", {"Status": "queued", "QueuedAt": "2024-01-01T10:00:00"})
+        assert status["timings"]["run_seconds"] is None
@@ -0,0 +1,463 @@
+"""Tests for the task store backends."""
+
+import pytest
+import multiprocessing
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import XmlTaskStore, SqliteTaskStore, JournalTaskStore, GroupCommitter, CommitStats
+from task_store import iter_xml_records, migrate_xml, fcntl
+
+
+@pytest.fixture
+def xml_path():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield os.path.join(temp_dir, "data", "project_data.xml")
+
+
+def read_task(path, task_id):
+    return ET.parse(path).getroot().find(f".//Task[TaskID='{task_id}']")
+
+
+class TestXmlTaskStore:
+    """Test cases for the indexed, write-behind XML store."""
+
+    def test_loads_existing_document(self, xml_path):
+        """Test that tasks already in the file are indexed."""
+        os.makedirs(os.path.dirname(xml_path))
+        with open(xml_path, "w", encoding="utf-8") as file:
+            file.write("<Projects><Task><TaskID>t1</TaskID><Status>done</Status><Log>Success</Log></Task></Projects>")
+
+        store = XmlTaskStore(xml_path)
+        assert store.get_task("t1") == {"TaskID": "t1", "Status": "done", "Logs": ["Success"]}
+        assert store.get_task("missing") is None
+
+    def test_changes_are_written_behind(self, xml_path):
+        """Test that writes reach the file within the flush interval, not on every call."""
+        store = XmlTaskStore(xml_path, flush_interval=0.1)
+        store.set_fields("t1", {"Status": "running"})
+        store.set_fields("t1", {"Status": "completed", "Result": "ok"})
+        assert not os.path.exists(xml_path)
+
+        deadline = time.monotonic() + 2
+        while not os.path.exists(xml_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert read_task(xml_path, "t1").findtext("Status") == "completed"
+        assert store.stats()["flushes"] == 1
+        store.close()
+
+    def test_write_through(self, xml_path):
+        """Test that a zero flush interval writes on every change."""
+        store = XmlTaskStore(xml_path, flush_interval=0)
+        store.set_fields("t1", {"Status": "queued"})
+        assert read_task(xml_path, "t1").findtext("Status") == "queued"
+
+    def test_flush_replaces_file_atomically(self, xml_path):
+        """Test that flushing leaves only the data file behind."""
+        store = XmlTaskStore(xml_path, flush_interval=60)
+        store.set_fields("t1", {"Status": "queued"})
+        assert store.flush() is True
+        assert store.flush() is False
+        assert os.listdir(os.path.dirname(xml_path)) == ["project_data.xml"]
+
+    def test_fields_logs_and_sections(self, xml_path):
+        """Test field removal, task logs and the Errors/Results sections."""
+        store = XmlTaskStore(xml_path, flush_interval=60)
+        store.set_fields("t1", {"Status": "failed", "Error": "boom"})
+        store.set_fields("t1", {"Error": None})
+        assert store.append_log("t1", "Failure: boom") is True
+        assert store.append_log("missing", "Success") is False
+        store.append_entry("Errors", "Error", "something broke", "2024-01-01T00:00:00")
+        store.store_task_results([("t2", "completed", "summary")])
+        store.close()
+
+        root = ET.parse(xml_path).getroot()
+        assert read_task(xml_path, "t1").find("Error") is None
+        assert read_task(xml_path, "t1").findtext("Log") == "Failure: boom"
+        assert root.find("Errors/Error").findtext("Timestamp") == "2024-01-01T00:00:00"
+        assert read_task(xml_path, "t2").findtext("Result") == "summary"
+        assert XmlTaskStore(xml_path).stats()["tasks"] == 2
+
+    def test_close_flushes_pending_changes(self, xml_path):
+        """Test that closing writes changes still waiting for the flusher."""
+        store = XmlTaskStore(xml_path, flush_interval=60)
+        store.set_fields("t1", {"Status": "queued"})
+        store.close()
+        assert read_task(xml_path, "t1").findtext("Status") == "queued"
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield os.path.join(temp_dir, "data", "project_data.sqlite3")
+
+
+class TestSqliteTaskStore:
+    """Test cases for the SQLite backend."""
+
+    def test_records_match_xml_store(self, db_path, xml_path):
+        """Test that both backends return the same records for the same calls."""
+        stores = [SqliteTaskStore(db_path), XmlTaskStore(xml_path, flush_interval=60)]
+        for store in stores:
+            store.set_fields("t1", {"Status": "failed", "Category": "coding", "Error": "boom"})
+            store.set_fields("t1", {"Error": None})
+            assert store.append_log("t1", "Failure: boom") is True
+            assert store.append_log("missing", "Success") is False
+            store.store_task_results([("t2", "completed", "summary")])
+        sqlite_store, xml_store = stores
+        for task_id in ("t1", "t2"):
+            assert sqlite_store.get_task(task_id) == xml_store.get_task(task_id)
+        assert sqlite_store.get_task("missing") is None
+        assert sqlite_store.count_by_status() == {"failed": 1, "completed": 1}
+
+    def test_wal_mode_and_entries(self, db_path):
+        """Test the journal mode and the Errors/Results entries table."""
+        store = SqliteTaskStore(db_path)
+        store.append_entry("Errors", "Error", "something broke", "2024-01-01T00:00:00")
+        store.close()
+
+        db = sqlite3.connect(db_path)
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("SELECT section, tag, message FROM entries").fetchall() == \
+            [("Errors", "Error", "something broke")]
+        db.close()
+
+    def test_concurrent_writers(self, db_path):
+        """Test that threads writing through their own connections lose nothing."""
+        store = SqliteTaskStore(db_path)
+        store.set_fields("t1", {"Status": "running"})
+
+        def write(worker):
+            for i in range(25):
+                store.set_fields(f"w{worker}-{i}", {"Status": "queued"})
+                store.append_log("t1", f"{worker}-{i}")
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(store.get_task("t1")["Logs"]) == 100
+        assert store.stats()["tasks"] == 101
+        assert store.stats()["connections"] == 5
+        store.close()
+
+
+class TestMigration:
+    """Test cases for streaming XML into SQLite."""
+
+    def write_xml(self, path, tasks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("<?xml version='1.0' encoding='utf-8'?>\n<Projects>")
+            for i in range(tasks):
+                file.write(f"<Task><TaskID>t{i}</TaskID><Status>completed</Status>"
+                           f"<Result>r{i}</Result><Log>Success</Log></Task>")
+            file.write("<Errors><Error>bad<Timestamp>2024-01-01T00:00:00</Timestamp></Error></Errors>")
+            file.write("<Results><Result>summary<Timestamp>2024-01-02T00:00:00</Timestamp></Result></Results>")
+            file.write("</Projects>")
+
+    def test_iter_xml_records(self, xml_path):
+        """Test that tasks and section entries are streamed in document order."""
+        self.write_xml(xml_path, 2)
+        items = list(iter_xml_records(xml_path))
+        assert items[0] == ("task", {"TaskID": "t0", "Status": "completed", "Result": "r0", "Logs": ["Success"]})
+        assert items[2:] == [("entry", ("Errors", "Error", "bad", "2024-01-01T00:00:00")),
+                             ("entry", ("Results", "Result", "summary", "2024-01-02T00:00:00"))]
+
+    def test_migrate_in_batches(self, xml_path, db_path):
+        """Test that a file larger than one batch is fully imported."""
+        self.write_xml(xml_path, 250)
+        store = SqliteTaskStore(db_path)
+        assert migrate_xml(xml_path, store, batch_size=100) == {"tasks": 250, "entries": 2}
+        assert store.get_task("t249") == {"TaskID": "t249", "Status": "completed", "Result": "r249",
+                                          "Logs": ["Success"]}
+        assert store.stats()["transactions"] == 3
+
+
+@pytest.fixture
+def journal_dir():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield os.path.join(temp_dir, "task_journal")
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("journal-"))
+
+
+class TestJournalTaskStore:
+    """Test cases for the append-only journal backend."""
+
+    def test_replay_restores_view(self, journal_dir):
+        """Test that a reopened journal serves the same records without a snapshot."""
+        store = JournalTaskStore(journal_dir, snapshot_every=1000)
+        store.set_fields("t1", {"Status": "failed", "Error": "boom"})
+        store.set_fields("t1", {"Error": None})
+        store.append_log("t1", "Failure: boom")
+        store.store_task_results([("t2", "completed", "summary")])
+        store.append_entry("Errors", "Error", "something broke", "2024-01-01T00:00:00")
+        expected = store.get_task("t1")
+        # Simulate a crash: no close(), so no snapshot
+        store._stop.set()
+
+        reopened = JournalTaskStore(journal_dir)
+        assert reopened.get_task("t1") == expected == {"TaskID": "t1", "Status": "failed",
+                                                        "Logs": ["Failure: boom"]}
+        assert reopened.get_task("t2")["Result"] == "summary"
+        assert reopened.stats()["replayed_events"] == 5
+        reopened.close()
+
+    def test_fsyncs_are_batched(self, journal_dir):
+        """Test that many appends share one fsync."""
+        store = JournalTaskStore(journal_dir, sync_interval=60)
+        for i in range(50):
+            store.set_fields(f"t{i}", {"Status": "queued"})
+        assert store.stats()["unsynced_events"] == 50
+        assert store.flush() is True
+        assert store.flush() is False
+        assert store.stats()["fsyncs"] == 1
+        store.close()
+
+    def test_snapshot_compacts_segments(self, journal_dir):
+        """Test that snapshots drop covered segments and bound replay."""
+        store = JournalTaskStore(journal_dir, snapshot_every=1000)
+        for i in range(20):
+            store.set_fields("t1", {"Status": f"step-{i}"})
+        store.snapshot()
+        store.append_log("t1", "Success")
+        assert segments(journal_dir) == ["journal-000000000021.jsonl"]
+        store._stop.set()
+
+        reopened = JournalTaskStore(journal_dir)
+        assert reopened.stats()["replayed_events"] == 1
+        assert reopened.get_task("t1") == {"TaskID": "t1", "Status": "step-19", "Logs": ["Success"]}
+        reopened.close()
+
+    def test_background_snapshot(self, journal_dir):
+        """Test that the syncer snapshots once snapshot_every events accumulate."""
+        store = JournalTaskStore(journal_dir, sync_interval=0.01, snapshot_every=10)
+        for i in range(10):
+            store.set_fields(f"t{i}", {"Status": "queued"})
+        deadline = time.monotonic() + 2
+        while store.stats()["snapshots"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.stats()["events_since_snapshot"] == 0
+        store.close()
+
+    def test_torn_tail_is_dropped(self, journal_dir):
+        """Test that a partial last line from a crash is discarded and truncated."""
+        store = JournalTaskStore(journal_dir)
+        store.set_fields("t1", {"Status": "queued"})
+        store._stop.set()
+        store.flush()
+        path = os.path.join(journal_dir, segments(journal_dir)[-1])
+        with open(path, "ab") as file:
+            file.write(b'{"op":"set","task":"t1","fiel')
+
+        reopened = JournalTaskStore(journal_dir)
+        assert reopened.get_task("t1")["Status"] == "queued"
+        reopened.set_fields("t1", {"Status": "running"})
+        reopened._stop.set()
+        reopened.flush()
+        assert JournalTaskStore(journal_dir).get_task("t1")["Status"] == "running"
+
+
+class TestBatchedWrites:
+    """Test cases for apply(), commit stats and group commit."""
+
+    OPS = [
+        ("set_fields", "t1", {"Status": "completed", "Result": "ok"}),
+        ("append_log", "t1", "Success"),
+        ("append_log", "missing", "Success"),
+        ("append_entry", "Results", "Result", "summary", "2024-01-01T00:00:00")
+    ]
+
+    @pytest.fixture(params=["xml", "sqlite", "journal"])
+    def store(self, request):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if request.param == "xml":
+                store = XmlTaskStore(os.path.join(temp_dir, "data.xml"), flush_interval=60)
+            elif request.param == "sqlite":
+                store = SqliteTaskStore(os.path.join(temp_dir, "data.sqlite3"))
+            else:
+                store = JournalTaskStore(os.path.join(temp_dir, "journal"), sync_interval=60)
+            yield store
+            store.close()
+
+    def test_apply_is_one_commit(self, store):
+        """Test that a batch of mutations is one durable commit with per-mutation results."""
+        assert store.apply(self.OPS, sync=True) == [None, True, False, None]
+        assert store.get_task("t1") == {"TaskID": "t1", "Status": "completed", "Result": "ok", "Logs": ["Success"]}
+        commits = store.stats()["commits"]
+        assert commits["commits"] == 1
+        assert commits["batch_sizes"] == {"<=4": 1}
+
+    def test_compare_and_set(self, store):
+        """Test that a write against a stale version is refused and versions count changes."""
+        assert store.get_versioned("t1") == (None, 0)
+        assert store.compare_and_set("t1", 0, {"Count": "1"}) is True
+        assert store.compare_and_set("t1", 0, {"Count": "9"}) is False
+        store.append_log("t1", "counted")
+        record, version = store.get_versioned("t1")
+        assert (record["Count"], version) == ("1", 2)
+        assert store.update_task("t1", lambda record: {"Count": str(int(record["Count"]) + 1)}) == {"Count": "2"}
+        assert store.get_versioned("t1")[1] == 3
+
+    def test_unknown_mutation_is_rejected(self, store):
+        """Test that nothing is applied when a batch names an unknown mutation."""
+        with pytest.raises(ValueError):
+            store.apply([("set_fields", "t1", {"Status": "queued"}), ("drop_table", "tasks")])
+        assert store.get_task("t1") is None
+
+    def test_journal_batch_replays_whole(self, journal_dir):
+        """Test that a batch is one journal line, replayed whole or dropped whole."""
+        for torn in (False, True):
+            directory = os.path.join(journal_dir, str(torn))
+            store = JournalTaskStore(directory)
+            store.apply(self.OPS, sync=True)
+            store._stop.set()
+            path = os.path.join(directory, segments(directory)[-1])
+            with open(path, "rb") as file:
+                lines = file.read().splitlines()
+            assert len(lines) == 1
+            if torn:
+                with open(path, "wb") as file:
+                    file.write(lines[0][:-20])
+
+            reopened = JournalTaskStore(directory)
+            assert reopened.get_task("t1") == (None if torn else store.get_task("t1"))
+            reopened.close()
+
+    def test_group_commit_merges_concurrent_callers(self, db_path):
+        """Test that concurrent commits share transactions and each caller gets its own results."""
+        store = SqliteTaskStore(db_path)
+        committer = GroupCommitter(store, max_wait=0.05)
+        barrier = threading.Barrier(8)
+        results = {}
+
+        def commit(worker):
+            barrier.wait()
+            results[worker] = committer.commit([("set_fields", f"t{worker}", {"Status": "queued"}),
+                                                ("append_log", f"t{worker}", "queued")])
+
+        threads = [threading.Thread(target=commit, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        committer.close()
+        assert all(result == [None, True] for result in results.values())
+        assert store.stats()["tasks"] == 8
+        assert store.stats()["commits"]["commits"] < 8
+        assert store.stats()["commits"]["mutations"] == 16
+
+    def test_group_commit_isolates_failures(self, db_path):
+        """Test that one caller's bad mutation does not fail the callers it was merged with."""
+        store = SqliteTaskStore(db_path)
+        committer = GroupCommitter(store)
+        assert committer._commit_many([[("set_fields", "t1", {"Status": "queued"})], [("bogus",)]])[0] == [None]
+        with pytest.raises(ValueError):
+            committer.commit([("bogus",)])
+        assert store.get_task("t1")["Status"] == "queued"
+        committer.close()
+
+    def test_group_commit_wait_is_bounded(self, db_path):
+        """Test that a caller gets a TimeoutError instead of blocking on a stuck commit."""
+        store = SqliteTaskStore(db_path)
+        release = threading.Event()
+        apply = store.apply
+        committer = GroupCommitter(store, timeout=0.05)
+        with patch.object(store, "apply", side_effect=lambda ops, sync: release.wait(2) and apply(ops, sync)):
+            with pytest.raises(TimeoutError):
+                committer.commit([("set_fields", "t1", {"Status": "queued"})])
+            release.set()
+            committer.close()
+        assert store.get_task("t1")["Status"] == "queued"
+
+    def test_commit_stats(self):
+        """Test the batch size histogram and rate."""
+        stats = CommitStats()
+        for size in (1, 1, 3, 300):
+            stats.record(size)
+        summary = stats.stats()
+        assert summary["batch_sizes"] == {"<=1": 2, "<=4": 1, "more": 1}
+        assert summary["mean_batch_size"] == 76.25
+        assert summary["largest_batch"] == 300
+        assert summary["commits_per_second"] > 0
+
+
+def hammer(backend, path, worker, count):
+    """Increment a shared counter and append logs from one process; module level so a process pool can run it."""
+    if backend == "xml":
+        store = XmlTaskStore(path, flush_interval=0.01, shared=True)
+    else:
+        store = SqliteTaskStore(path)
+    for i in range(count):
+        store.update_task("counter", lambda record: {"Count": str(int(record["Count"]) + 1 if record else 1)})
+        store.append_log("counter", f"{worker}-{i}")
+        store.set_fields(f"w{worker}-{i}", {"Status": "done"})
+    store.close()
+
+
+def open_journal(directory):
+    try:
+        JournalTaskStore(directory)
+    except RuntimeError as e:
+        return str(e)
+    return None
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs POSIX file locks")
+class TestMultiProcess:
+    """Test cases for stores shared between processes."""
+
+    def test_shared_xml_stores_see_each_other(self, xml_path):
+        """Test that two shared stores on one file keep both sets of changes."""
+        first = XmlTaskStore(xml_path, flush_interval=60, shared=True)
+        second = XmlTaskStore(xml_path, flush_interval=60, shared=True)
+        first.set_fields("t1", {"Status": "queued"})
+        second.set_fields("t2", {"Status": "queued"})
+        first.flush()
+        # second reloads first's document and replays its own unflushed change on top
+        second.flush()
+        assert first.get_task("t2")["Status"] == "queued"
+        assert read_task(xml_path, "t1").findtext("Status") == "queued"
+        assert second.compare_and_set("t1", 1, {"Status": "running"}) is True
+        assert first.compare_and_set("t1", 1, {"Status": "failed"}) is False
+        assert first.get_task("t1")["Status"] == "running"
+        assert second.stats()["file_lock"]["acquisitions"] == 2
+
+    @pytest.mark.parametrize("backend", ["xml", "sqlite"])
+    def test_no_lost_updates_across_processes(self, backend, xml_path, db_path):
+        """Test that a process pool hammering one store loses no increments, logs or tasks."""
+        path = xml_path if backend == "xml" else db_path
+        workers, count = 4, 25
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            for future in [pool.submit(hammer, backend, path, worker, count) for worker in range(workers)]:
+                future.result()
+
+        store = XmlTaskStore(path) if backend == "xml" else SqliteTaskStore(path)
+        record, version = store.get_versioned("counter")
+        assert record["Count"] == str(workers * count)
+        assert sorted(record["Logs"]) == sorted(f"{w}-{i}" for w in range(workers) for i in range(count))
+        assert version == 2 * workers * count
+        assert store.stats()["tasks"] == workers * count + 1
+
+    def test_journal_is_single_process(self, journal_dir):
+        """Test that a journal open in one process cannot be opened by another."""
+        store = JournalTaskStore(journal_dir)
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork")) as pool:
+            assert "open in another process" in pool.submit(open_journal, journal_dir).result()
+        store.close()
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork")) as pool:
+            assert pool.submit(open_journal, journal_dir).result() is None
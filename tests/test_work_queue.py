@@ -0,0 +1,129 @@
+"""Tests for the durable role work queue and its worker pools."""
+
+import os
+import sys
+import time
+import threading
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import WorkQueue, RoleWorkerPool, READY, LEASED, DEAD
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+class TestWorkQueue:
+    """Test cases for claiming, leasing and releasing jobs."""
+
+    def test_priority_then_fifo(self):
+        """Test that higher priorities are claimed first and ties keep arrival order."""
+        queue = WorkQueue()
+        queue.enqueue("coder", {"n": 1}, priority=0)
+        queue.enqueue("coder", {"n": 2}, priority=5)
+        queue.enqueue("coder", {"n": 3}, priority=5)
+        queue.enqueue("researcher", {"n": 4}, priority=9)
+
+        order = [queue.claim("coder", 30)["payload"]["n"] for _ in range(3)]
+        assert order == [2, 3, 1]
+        assert queue.claim("coder", 30) is None
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a job whose lease lapses becomes visible again."""
+        queue = WorkQueue()
+        queue.enqueue("coder", {"n": 1})
+        first = queue.claim("coder", 0.05)
+        assert queue.claim("coder", 0.05) is None
+
+        time.sleep(0.1)
+        second = queue.claim("coder", 30)
+        assert second["attempts"] == 2
+        assert not queue.ack(first)
+        assert queue.ack(second)
+        assert queue.pending() == 0
+
+    def test_release_until_dead(self):
+        """Test that failed jobs are retried until they run out of attempts."""
+        queue = WorkQueue()
+        queue.enqueue("researcher", {"n": 1})
+        assert queue.release(queue.claim("researcher", 30), "timeout", max_attempts=2) == READY
+        assert queue.release(queue.claim("researcher", 30), "timeout", max_attempts=2) == DEAD
+        assert queue.claim("researcher", 30) is None
+        assert queue.counts() == {"researcher": {READY: 0, LEASED: 0, DEAD: 1}}
+
+    def test_enqueue_keeps_an_existing_job(self):
+        """Test that re-enqueuing a leased job id leaves its lease and attempts alone."""
+        queue = WorkQueue()
+        queue.enqueue("coder", {"n": 1}, job_id="t1:coder")
+        job = queue.claim("coder", 30)
+
+        queue.enqueue("coder", {"n": 1}, job_id="t1:coder")
+        assert queue.claim("coder", 30) is None
+        assert queue.counts() == {"coder": {READY: 0, LEASED: 1, DEAD: 0}}
+        assert queue.ack(job)
+
+    def test_jobs_survive_restart(self, tmp_path):
+        """Test crash recovery from the SQLite file."""
+        path = str(tmp_path / "queue.sqlite3")
+        crashed = WorkQueue(path)
+        crashed.enqueue("coder", {"n": 1})
+        crashed.claim("coder", 0.05)
+        crashed.close()
+
+        time.sleep(0.1)
+        restarted = WorkQueue(path)
+        assert restarted.claim("coder", 30)["payload"] == {"n": 1}
+
+
+class TestRoleWorkerPool:
+    """Test cases for the per-role worker threads."""
+
+    def test_runs_and_retries_jobs(self):
+        """Test that handler errors are retried and reported once dead."""
+        queue = WorkQueue()
+        seen = []
+        failures = []
+
+        def handler(job):
+            seen.append(job["payload"]["n"])
+            if job["payload"]["n"] == 2:
+                raise ValueError("boom")
+
+        pool = RoleWorkerPool(queue, "coder", handler, workers=2, max_attempts=2, poll_interval=0.01,
+                              on_failure=lambda job, error, state: failures.append(state))
+        pool.start()
+        queue.enqueue("coder", {"n": 1})
+        queue.enqueue("coder", {"n": 2})
+        wait_until(lambda: failures == [READY, DEAD])
+        pool.shutdown(wait=True)
+
+        assert sorted(seen) == [1, 2, 2]
+        assert pool.stats()["processed"] == 1
+        assert pool.stats()["dead"] == 1
+
+    def test_heartbeat_keeps_long_jobs_leased(self):
+        """Test that a running job is not handed to another worker."""
+        queue = WorkQueue()
+        release = threading.Event()
+        runs = []
+
+        def handler(job):
+            runs.append(job["id"])
+            release.wait(2)
+
+        pool = RoleWorkerPool(queue, "researcher", handler, workers=2, visibility_timeout=0.15,
+                              poll_interval=0.01)
+        pool.start()
+        queue.enqueue("researcher", {"n": 1})
+        time.sleep(0.5)
+        release.set()
+        wait_until(lambda: queue.pending() == 0)
+        pool.shutdown(wait=True)
+        assert len(runs) == 1
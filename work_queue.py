@@ -0,0 +1,253 @@
+# work_queue.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Job states; finished jobs are deleted, jobs out of attempts are kept as dead
+READY = "ready"
+LEASED = "leased"
+DEAD = "dead"
+
+class WorkQueue:
+    """Durable priority queue of role jobs in a SQLite file.
+
+    `claim` leases the highest-priority ready job of a role for
+    `visibility_timeout` seconds. A job whose lease runs out without an
+    `ack` or `release` becomes claimable again, which is how work held by a
+    crashed process is recovered. Jobs that fail `max_attempts` times are
+    kept as dead instead of being retried forever. Use ":memory:" for a
+    queue that lives only as long as the process.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, role TEXT NOT NULL, priority INTEGER NOT NULL, payload TEXT NOT NULL, "
+            "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, visible_at REAL NOT NULL, "
+            "enqueued_at REAL NOT NULL, lease TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs(role, state, priority, enqueued_at)")
+        self._db.commit()
+
+    def enqueue(self, role: str, payload: Dict[str, Any], priority: int = 0,
+                job_id: Optional[str] = None) -> str:
+        """Add a job for `role`; higher priorities are claimed first, FIFO within a priority.
+
+        Enqueuing a `job_id` that is still queued is a no-op, so a replayed
+        producer cannot reset a job another worker holds.
+        """
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO jobs (id, role, priority, payload, state, attempts, visible_at, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (job_id, role, int(priority), json.dumps(payload), READY, now, now)
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self, role: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """Lease the next visible job of `role`, or return None if there is none.
+
+        Ready jobs and leased jobs whose lease has expired are both visible.
+        """
+        lease = uuid.uuid4().hex
+        with self._lock:
+            # Several processes (e.g. forked server workers) may share the file; the
+            # conditional UPDATE makes the claim atomic, and a lost race moves on to the next job
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT id, priority, payload, attempts FROM jobs "
+                    "WHERE role = ? AND state IN (?, ?) AND visible_at <= ? "
+                    "ORDER BY priority DESC, enqueued_at LIMIT 1",
+                    (role, READY, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, priority, payload, attempts = row
+                cursor = self._db.execute(
+                    "UPDATE jobs SET state = ?, attempts = ?, visible_at = ?, lease = ? "
+                    "WHERE id = ? AND state IN (?, ?) AND visible_at <= ? AND attempts = ?",
+                    (LEASED, attempts + 1, now + visibility_timeout, lease, job_id, READY, LEASED, now, attempts)
+                )
+                self._db.commit()
+                if cursor.rowcount == 1:
+                    break
+        return {
+            'id': job_id,
+            'role': role,
+            'priority': priority,
+            'payload': json.loads(payload),
+            'attempts': attempts + 1,
+            'lease': lease
+        }
+
+    def extend(self, job: Dict[str, Any], visibility_timeout: float) -> bool:
+        """Push a held lease out by `visibility_timeout`; False if the lease was lost."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET visible_at = ? WHERE id = ? AND lease = ?",
+                (time.time() + visibility_timeout, job['id'], job['lease'])
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def ack(self, job: Dict[str, Any]) -> bool:
+        """Remove a finished job; False if its lease had already expired and been taken."""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM jobs WHERE id = ? AND lease = ?", (job['id'], job['lease']))
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def release(self, job: Dict[str, Any], error: str, max_attempts: int = 1, delay: float = 0) -> str:
+        """Return a failed job to the queue, or mark it dead once it has used `max_attempts`.
+
+        Returns the job's new state.
+        """
+        state = DEAD if job['attempts'] >= max_attempts else READY
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, visible_at = ?, lease = NULL, error = ? WHERE id = ? AND lease = ?",
+                (state, time.time() + delay, error, job['id'], job['lease'])
+            )
+            self._db.commit()
+        return state
+
+    def pending(self) -> int:
+        """Jobs that are waiting or running, across all roles."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state != ?", (DEAD,)).fetchone()[0]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Job counts per role and state."""
+        with self._lock:
+            rows = self._db.execute("SELECT role, state, COUNT(*) FROM jobs GROUP BY role, state").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for role, state, count in rows:
+            counts.setdefault(role, {READY: 0, LEASED: 0, DEAD: 0})[state] = count
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+class RoleWorkerPool:
+    """Worker threads that claim and run one role's jobs from a WorkQueue.
+
+    `handler` gets the claimed job; returning acks it, raising releases it
+    for another attempt. While a job runs its lease is renewed every third
+    of the visibility timeout, so only a worker that stops running (a crash
+    or a hung process) lets the job become visible to others. `on_failure`
+    is called with the job, the error and the job's new state (READY when it
+    will be retried, DEAD once it has used up its attempts).
+    """
+
+    def __init__(self, queue: WorkQueue, role: str, handler: Callable[[Dict[str, Any]], None],
+                 workers: int = 1, visibility_timeout: float = 300, max_attempts: int = 1,
+                 retry_delay: float = 0, poll_interval: float = 1.0,
+                 on_failure: Optional[Callable[[Dict[str, Any], str, str], None]] = None):
+        self.queue = queue
+        self.role = role
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.on_failure = on_failure
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+        self._running: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.role}-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.role}-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued for this role."""
+        self._wake.set()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self.queue.claim(self.role, self.visibility_timeout)
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._running[job['id']] = job
+            try:
+                self.handler(job)
+                if not self.queue.ack(job):
+                    logger.warning(f"Lease on {self.role} job {job['id']} expired before it finished")
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                state = self.queue.release(job, str(e), self.max_attempts, self.retry_delay)
+                with self._lock:
+                    if state == DEAD:
+                        self.dead += 1
+                    else:
+                        self.retried += 1
+                if state == DEAD:
+                    logger.error(f"{self.role} job {job['id']} failed after {job['attempts']} attempts: {e}")
+                else:
+                    logger.warning(f"{self.role} job {job['id']} failed (attempt {job['attempts']}), retrying: {e}")
+                if self.on_failure:
+                    self.on_failure(job, str(e), state)
+            finally:
+                with self._lock:
+                    self._running.pop(job['id'], None)
+
+    def _heartbeat(self) -> None:
+        interval = max(self.visibility_timeout / 3, 0.05)
+        while not self._stop.wait(interval):
+            with self._lock:
+                running = list(self._running.values())
+            for job in running:
+                self.queue.extend(job, self.visibility_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': len(self._running),
+                'processed': self.processed,
+                'retried': self.retried,
+                'dead': self.dead
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop claiming jobs; with `wait`, block until running jobs finish."""
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
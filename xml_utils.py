@@ -1,16 +1,174 @@
 import xml.etree.ElementTree as ET
+import atexit
 import os
 import datetime
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Optional, List, Tuple, Dict, Any, Iterator, Callable
 from pathlib import Path
+from task_store import BACKENDS, TaskStore, XmlTaskStore, SqliteTaskStore, JournalTaskStore, GroupCommitter, fcntl
+
+# One store per backend and data file; the environment is read on every call
+_stores: Dict[Tuple[str, str], TaskStore] = {}
+_committers: Dict[Tuple[str, str], GroupCommitter] = {}
+_stores_lock = threading.Lock()
+_stores_pid = os.getpid()
+# Mutations buffered by the calling thread's open task_transaction()
+_transaction = threading.local()
 
 # Use configurable path instead of hardcoded
 def get_xml_file_path() -> str:
     """Get the XML file path from environment or use default."""
     return os.getenv('XML_DATA_PATH', 'data/project_data.xml')
 
+def get_store_backend() -> str:
+    """Storage backend for task records: `xml` (default), `sqlite` or `journal`."""
+    return os.getenv('TASK_STORE_BACKEND', 'xml').lower()
+
+def get_sqlite_file_path() -> str:
+    """Get the SQLite database path used by the `sqlite` backend."""
+    return os.getenv('SQLITE_DATA_PATH', 'data/project_data.sqlite3')
+
+def get_journal_dir() -> str:
+    """Get the directory of journal segments and snapshots used by the `journal` backend."""
+    return os.getenv('JOURNAL_DATA_PATH', 'data/task_journal')
+
+def get_flush_interval() -> float:
+    """Seconds a change may wait in memory before it is written; 0 writes through."""
+    return float(os.getenv('XML_FLUSH_INTERVAL', '0.5'))
+
+def get_multiprocess() -> bool:
+    """Whether the xml store coordinates with other processes (file lock and reload); on wherever flock exists."""
+    return fcntl is not None and os.getenv('TASK_STORE_MULTIPROCESS', 'true').lower() in ('1', 'true', 'yes')
+
+def get_group_commit() -> bool:
+    """Whether writes from concurrent requests are merged into shared durable commits."""
+    return os.getenv('TASK_STORE_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+
+def _store_path(backend: str) -> str:
+    return {"sqlite": get_sqlite_file_path, "journal": get_journal_dir}.get(backend, get_xml_file_path)()
+
+def get_task_store() -> TaskStore:
+    """The store for the configured backend and data file, opened on first use."""
+    backend = get_store_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown task store backend '{backend}'; expected one of {', '.join(BACKENDS)}")
+    path = _store_path(backend)
+    global _stores_pid
+    with _stores_lock:
+        if _stores_pid != os.getpid():
+            # Forked: the parent's stores and their threads stay with the parent
+            _stores.clear()
+            _committers.clear()
+            _stores_pid = os.getpid()
+        store = _stores.get((backend, path))
+        if store is None:
+            if backend == "sqlite":
+                store = SqliteTaskStore(path)
+            elif backend == "journal":
+                store = JournalTaskStore(path, sync_interval=float(os.getenv('JOURNAL_SYNC_INTERVAL', '0.05')))
+            else:
+                store = XmlTaskStore(path, get_flush_interval(), shared=get_multiprocess())
+            _stores[(backend, path)] = store
+        return store
+
+def get_group_committer() -> Optional[GroupCommitter]:
+    """The group committer of the current store, or None when group commit is off."""
+    if not get_group_commit():
+        return None
+    store = get_task_store()
+    backend = get_store_backend()
+    with _stores_lock:
+        key = (backend, _store_path(backend))
+        committer = _committers.get(key)
+        if committer is None:
+            max_wait = float(os.getenv('TASK_STORE_GROUP_COMMIT_WAIT_MS', '2')) / 1000
+            timeout = float(os.getenv('TASK_STORE_COMMIT_TIMEOUT', '30'))
+            committer = _committers[key] = GroupCommitter(store, max_wait=max_wait, timeout=timeout)
+        return committer
+
+def _commit(ops: List[Tuple[Any, ...]]) -> List[Any]:
+    """Apply mutations as one durable commit, shared with concurrent callers under group commit."""
+    committer = get_group_committer()
+    if committer is not None:
+        return committer.commit(ops)
+    return get_task_store().apply(ops, sync=True)
+
+def _mutate(name: str, *args: Any, durable: bool = False) -> Any:
+    """Apply one mutation, or buffer it if this thread has a task_transaction() open (returns None).
+
+    With `durable` the change is on disk when this returns, for writes a
+    caller checkpoints on (stored batch results). Without it the store may
+    write it behind: task status and fields can be, since the work queue
+    replays any task whose outcome was lost in a crash.
+    """
+    ops = getattr(_transaction, "ops", None)
+    if ops is not None:
+        ops.append((name, *args))
+        return None
+    if durable or get_group_commit():
+        return _commit([(name, *args)])[0]
+    return getattr(get_task_store(), name)(*args)
+
+@contextmanager
+def task_transaction() -> Iterator[None]:
+    """Group the store writes made in this block into one atomic, durable commit.
+
+    Writes inside the block are buffered and applied together when it
+    exits; if the block raises they are discarded. Nested blocks join the
+    outermost one. Results that depend on the store, such as whether a
+    task existed for a log entry, are not known until the commit.
+    """
+    if getattr(_transaction, "ops", None) is not None:
+        yield
+        return
+    _transaction.ops = []
+    try:
+        yield
+        ops = _transaction.ops
+    finally:
+        _transaction.ops = None
+    if ops:
+        _commit(ops)
+
+def task_store_stats() -> Dict[str, Any]:
+    """Stats of the current store, plus its group committer's batches when group commit is on."""
+    stats = get_task_store().stats()
+    committer = get_group_committer()
+    stats['group_commit'] = committer.stats() if committer is not None else None
+    return stats
+
+def flush_task_store() -> None:
+    """Write pending changes of every open store now."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+@atexit.register
+def close_task_stores() -> None:
+    """Flush and forget every open store, e.g. at shutdown."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        committers = list(_committers.values())
+        _stores.clear()
+        _committers.clear()
+    for committer in committers:
+        committer.close()
+    for store in stores:
+        try:
+            store.close()
+        except Exception as e:
+            print(f"Error closing task store {store.path}: {e}")
+
 def create_xml_schema() -> None:
-    """Create XML schema file if it doesn't exist."""
+    """Create XML schema file if it doesn't exist (or the database, with the sqlite backend)."""
+    backend = get_store_backend()
+    if backend != "xml":
+        get_task_store()
+        print(f"Task store ({backend}) ready at: {_store_path(backend)}")
+        return
+    
     xml_file_path = get_xml_file_path()
     
     # Create directory if it doesn't exist
@@ -24,83 +182,30 @@ def create_xml_schema() -> None:
     else:
         print(f"XML schema already exists at: {xml_file_path}")
 
-def _get_task_element(task_id: str) -> Optional[ET.Element]:
-    """Get task element by ID from XML file."""
-    xml_file_path = get_xml_file_path()
-    
-    if not os.path.exists(xml_file_path):
-        create_xml_schema()
-        return None
-    
-    try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        return root.find(f".//Task[TaskID='{task_id}']")
-    except ET.ParseError as e:
-        print(f"Error parsing XML file: {e}")
-        return None
-
 def update_task_status(task_id: str, status: str) -> None:
-    """Update task status in XML file."""
-    xml_file_path = get_xml_file_path()
-    
+    """Update task status, creating the task if it does not exist."""
     try:
-        if not os.path.exists(xml_file_path):
-            create_xml_schema()
-        
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        task = root.find(f".//Task[TaskID='{task_id}']")
-        
-        if task is not None:
-            status_elem = task.find("Status")
-            if status_elem is None:
-                status_elem = ET.SubElement(task, "Status")
-            status_elem.text = status
-            
-            tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        store = get_task_store()
+        if store.has_task(task_id):
+            _mutate("set_fields", task_id, {"Status": status})
             print(f"Task {task_id} status updated to {status}.")
         else:
-            # Create new task if it doesn't exist
             _create_task(task_id, status)
     except Exception as e:
         print(f"Error updating task status: {e}")
 
 def _create_task(task_id: str, status: str = "pending") -> None:
-    """Create a new task in XML file."""
-    xml_file_path = get_xml_file_path()
-    
+    """Create a new task."""
     try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        
-        task = ET.SubElement(root, "Task")
-        task_id_elem = ET.SubElement(task, "TaskID")
-        task_id_elem.text = task_id
-        status_elem = ET.SubElement(task, "Status")
-        status_elem.text = status
-        
-        tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        _mutate("set_fields", task_id, {"Status": status})
         print(f"New task {task_id} created with status {status}.")
     except Exception as e:
         print(f"Error creating task: {e}")
 
 def log_success(task_id: str) -> None:
     """Log success for a task."""
-    xml_file_path = get_xml_file_path()
-    
     try:
-        if not os.path.exists(xml_file_path):
-            create_xml_schema()
-        
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        task = root.find(f".//Task[TaskID='{task_id}']")
-        
-        if task is not None:
-            log = ET.SubElement(task, "Log")
-            log.text = "Success"
-            tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        if _mutate("append_log", task_id, "Success") is not False:
             print(f"Success logged for task {task_id}.")
         else:
             print(f"Task {task_id} not found for success logging.")
@@ -109,20 +214,8 @@ def log_success(task_id: str) -> None:
 
 def log_failure(task_id: str, errors: str) -> None:
     """Log failure for a task."""
-    xml_file_path = get_xml_file_path()
-    
     try:
-        if not os.path.exists(xml_file_path):
-            create_xml_schema()
-        
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        task = root.find(f".//Task[TaskID='{task_id}']")
-        
-        if task is not None:
-            log = ET.SubElement(task, "Log")
-            log.text = f"Failure: {errors}"
-            tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        if _mutate("append_log", task_id, f"Failure: {errors}") is not False:
             print(f"Failure logged for task {task_id} with errors: {errors}.")
         else:
             print(f"Task {task_id} not found for failure logging.")
@@ -131,50 +224,66 @@ def log_failure(task_id: str, errors: str) -> None:
 
 def log_error(message: str) -> None:
     """Log general error message."""
-    xml_file_path = get_xml_file_path()
-    
     try:
-        if not os.path.exists(xml_file_path):
-            create_xml_schema()
-        
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        errors = root.find("Errors")
-        if errors is None:
-            errors = ET.SubElement(root, "Errors")
-        error = ET.SubElement(errors, "Error")
-        error.text = message
-        
-        # Add timestamp
-        timestamp = ET.SubElement(error, "Timestamp")
-        timestamp.text = datetime.datetime.now().isoformat()
-        
-        tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        _mutate("append_entry", "Errors", "Error", message, datetime.datetime.now().isoformat())
         print(f"Error logged: {message}")
     except Exception as e:
         print(f"Error logging error message: {e}")
 
 def store_results(summary: str) -> None:
     """Store research results."""
-    xml_file_path = get_xml_file_path()
-    
     try:
-        if not os.path.exists(xml_file_path):
-            create_xml_schema()
-        
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        results = root.find("Results")
-        if results is None:
-            results = ET.SubElement(root, "Results")
-        result = ET.SubElement(results, "Result")
-        result.text = summary
-        
-        # Add timestamp
-        timestamp = ET.SubElement(result, "Timestamp")
-        timestamp.text = datetime.datetime.now().isoformat()
-        
-        tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        _mutate("append_entry", "Results", "Result", summary, datetime.datetime.now().isoformat())
         print(f"Results stored.")
     except Exception as e:
         print(f"Error storing results: {e}")
+
+def store_task_results(results: List[Tuple[str, str, str]]) -> bool:
+    """Store (task_id, status, result) tuples as one change.
+
+    Re-storing a task replaces its previous result, so a replayed batch is
+    harmless. The results are on disk when this returns True, so callers
+    can checkpoint on it. Returns False if the update failed.
+    """
+    try:
+        _mutate("store_task_results", results, durable=True)
+        print(f"Results stored for {len(results)} tasks.")
+        return True
+    except Exception as e:
+        print(f"Error storing task results: {e}")
+        return False
+
+def update_task_fields(task_id: str, fields: Dict[str, Optional[str]]) -> bool:
+    """Set child elements of a task (creating the task if needed); None removes a field.
+
+    Returns False if the update failed.
+    """
+    try:
+        _mutate("set_fields", task_id, fields)
+        return True
+    except Exception as e:
+        print(f"Error updating task {task_id}: {e}")
+        return False
+
+def modify_task_fields(task_id: str, change: Callable[[Optional[Dict[str, Any]]], Dict[str, Optional[str]]]) -> bool:
+    """Read-modify-write a task with compare-and-set, so concurrent workers cannot lose each other's updates.
+
+    `change` gets the current record (None if unknown) and returns the
+    fields to set; it is called again if another writer changed the task
+    first. Not buffered by task_transaction(). Returns False if the update
+    failed.
+    """
+    try:
+        get_task_store().update_task(task_id, change)
+        return True
+    except Exception as e:
+        print(f"Error updating task {task_id}: {e}")
+        return False
+
+def get_task_record(task_id: str) -> Optional[Dict[str, Any]]:
+    """Return a task's fields as a dict (log entries under `Logs`), or None if unknown."""
+    try:
+        return get_task_store().get_task(task_id)
+    except ET.ParseError as e:
+        print(f"Error parsing XML file: {e}")
+        return None